@@ -0,0 +1,85 @@
+"""
+Compare pooled chunk embeddings (averaged sentence-window embeddings from
+SemanticChunker) with re-encoding every chunk, on the sample contracts.
+
+Reports chunking+embedding time for both modes, the cosine similarity between
+pooled and exact chunk vectors, and how often retrieval for a set of typical
+lease questions returns the same top-k chunks.
+
+Usage:
+    python benchmarks/bench_chunk_embeddings.py --top-k 3
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from sentence_transformers import SentenceTransformer
+
+from rag.core.chunking import SemanticChunker
+from rag.ocr.pdfExtractor import PDFTextExtractor
+
+QUESTIONS = [
+    "When does the lease end?",
+    "What is the security deposit?",
+    "How much is the monthly rent?",
+    "Can the lease be terminated early?",
+    "Who is responsible for maintenance and repairs?",
+    "What happens if a payment is late?",
+    "Is subletting allowed?",
+    "What insurance is required?",
+    "How is the lease renewed?",
+    "What are the penalties for damage?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(project_root, "sample lease contracts"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    encoder = SentenceTransformer(args.model)
+    pooled_chunker = SemanticChunker(model=encoder, min_tokens=100, max_tokens=1024, chunk_embeddings="pooled")
+    exact_chunker = SemanticChunker(model=encoder, min_tokens=100, max_tokens=1024, chunk_embeddings="encode")
+    questions = encoder.encode(QUESTIONS, convert_to_numpy=True, normalize_embeddings=True)
+
+    print(f"{'file':<32} {'chunks':>6} {'exact s':>8} {'pooled s':>9} {'cos mean':>9} {'cos min':>8} "
+          f"{f'top{args.top_k} overlap':>13} {'top1 kept':>9}")
+    for pdf_path in sorted(Path(args.dir).glob("*.pdf")):
+        text = "\n".join(page["text"] for page in PDFTextExtractor(str(pdf_path)).iter_pages())
+
+        start = time.perf_counter()
+        chunks, exact = exact_chunker.chunk_text(text, return_embeddings=True)
+        exact_time = time.perf_counter() - start
+
+        # Clear the sentence split cache so both runs do the same work
+        SemanticChunker.split_sentences.cache_clear()
+        start = time.perf_counter()
+        pooled_chunks, pooled = pooled_chunker.chunk_text(text, return_embeddings=True)
+        pooled_time = time.perf_counter() - start
+        assert pooled_chunks == chunks
+
+        exact = exact / np.linalg.norm(exact, axis=1, keepdims=True)
+        cosines = np.sum(exact * pooled, axis=1)
+
+        k = min(args.top_k, len(chunks))
+        exact_top = np.argsort(-questions @ exact.T, axis=1)[:, :k]
+        pooled_top = np.argsort(-questions @ pooled.T, axis=1)[:, :k]
+        overlap = np.mean([len(set(e) & set(p)) / k for e, p in zip(exact_top, pooled_top)])
+        top1_kept = np.mean([e[0] in p for e, p in zip(exact_top, pooled_top)])
+
+        print(f"{pdf_path.name:<32} {len(chunks):>6} {exact_time:>8.2f} {pooled_time:>9.2f} "
+              f"{cosines.mean():>9.3f} {cosines.min():>8.3f} {overlap:>13.2f} {top1_kept:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
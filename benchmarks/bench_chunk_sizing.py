@@ -0,0 +1,150 @@
+"""
+Microbenchmark of SemanticChunker chunk sizing on 1,000-page inputs.
+
+Breakpoints are fixed up front so only the sizing work is timed: the old
+string-based grouping and merging (re-joining chunks and re-counting them
+with str.split) against the span arithmetic over prefix-summed token counts.
+Token counting itself is timed separately, with whitespace words and, when
+--model is given, the encoder's tokenizer.
+
+Usage:
+    python benchmarks/bench_chunk_sizing.py --pages 1000
+    python benchmarks/bench_chunk_sizing.py --pdf "sample lease contracts/Hertz.pdf" --model all-MiniLM-L6-v2
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from rag.core.chunking import SemanticChunker
+
+WORDS = ("lease tenant landlord shall pay the premises term notice default rent deposit "
+         "insurance repair assignment sublet renewal option indemnify agreement").split()
+
+
+class _WordCounter:
+    """Stands in for an encoder when no model is given; SemanticChunker then counts words"""
+
+
+def legacy_sizing(chunker, sentences, breakpoints):
+    """The string-based steps 6-8 of chunk_text before span arithmetic"""
+    groups = []
+    start = 0
+    for idx in breakpoints:
+        groups.append(sentences[start:idx + 1])
+        start = idx + 1
+    if start < len(sentences):
+        groups.append(sentences[start:])
+
+    final_chunks = []
+    for group in groups:
+        candidate = " ".join(group)
+        if len(candidate.split()) > chunker.max_tokens:
+            chunks, current, current_tokens = [], [], 0
+            for s in group:
+                token_count = len(s.split())
+                if current and current_tokens + token_count > chunker.max_tokens:
+                    chunks.append(" ".join(current))
+                    current, current_tokens = [s], token_count
+                else:
+                    current.append(s)
+                    current_tokens += token_count
+            if current:
+                chunks.append(" ".join(current))
+            final_chunks.extend(chunks)
+        else:
+            final_chunks.append(candidate)
+
+    merged = final_chunks[:1]
+    for chunk in final_chunks[1:]:
+        token_count = len(chunk.split())
+        if token_count < chunker.min_tokens and len(merged[-1].split()) + token_count <= chunker.max_tokens:
+            merged[-1] = merged[-1] + " " + chunk
+        else:
+            merged.append(chunk)
+    return merged
+
+
+def span_sizing(chunker, sentences, breakpoints, token_counts):
+    """Steps 6-8 of SemanticChunker._chunk_spans, then joining the final chunks once"""
+    cum_tokens = np.concatenate(([0], np.cumsum(token_counts)))
+    starts = [0] + [idx + 1 for idx in breakpoints]
+    ends = [idx + 1 for idx in breakpoints] + [len(sentences)]
+    spans = []
+    for start, end in zip(starts, ends):
+        if cum_tokens[end] - cum_tokens[start] > chunker.max_tokens:
+            spans.extend(chunker._split_span(start, end, cum_tokens))
+        else:
+            spans.append((start, end))
+    spans = chunker._merge_small_spans(spans, cum_tokens)
+    return [" ".join(sentences[start:end]) for start, end in spans]
+
+
+def synthetic_pages(pages, sentences_per_page, rng):
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 45))) + "."
+    return [" ".join(sentence() for _ in range(sentences_per_page)) for _ in range(pages)]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--sentences-per-page", type=int, default=40)
+    parser.add_argument("--pdf", help="Repeat this PDF's pages up to --pages instead of synthetic text")
+    parser.add_argument("--model", help="SentenceTransformer whose tokenizer is also timed")
+    parser.add_argument("--min-tokens", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=1024)
+    parser.add_argument("--breakpoint-rate", type=float, default=0.2,
+                        help="Share of sentence gaps used as breakpoints (chunk_text uses the 80th percentile)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    if args.pdf:
+        from rag.ocr.pdfExtractor import PDFTextExtractor
+        source = [page["text"] for page in PDFTextExtractor(args.pdf).iter_pages()]
+        pages = [source[i % len(source)] for i in range(args.pages)]
+    else:
+        pages = synthetic_pages(args.pages, args.sentences_per_page, rng)
+
+    chunker = SemanticChunker(_WordCounter(), min_tokens=args.min_tokens, max_tokens=args.max_tokens)
+    sentences = chunker.split_sentences("\n".join(pages))
+    breakpoints = sorted(rng.sample(range(len(sentences) - 1), int((len(sentences) - 1) * args.breakpoint_rate)))
+    print(f"{args.pages} pages, {len(sentences)} sentences, {len(breakpoints)} breakpoints")
+
+    words_s, word_counts = timed(lambda: chunker.count_tokens(sentences), args.repeat)
+    print(f"{'count tokens (words)':<28} {words_s * 1000:9.1f} ms")
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        model_chunker = SemanticChunker(SentenceTransformer(args.model), min_tokens=args.min_tokens,
+                                        max_tokens=args.max_tokens)
+        tok_s, tok_counts = timed(lambda: model_chunker.count_tokens(sentences), args.repeat)
+        print(f"{'count tokens (tokenizer)':<28} {tok_s * 1000:9.1f} ms  "
+              f"({tok_counts.sum() / word_counts.sum():.2f} tokens per word)")
+
+    legacy_s, legacy_chunks = timed(lambda: legacy_sizing(chunker, sentences, breakpoints), args.repeat)
+    span_s, span_chunks = timed(lambda: span_sizing(chunker, sentences, breakpoints, word_counts), args.repeat)
+    print(f"{'legacy string sizing':<28} {legacy_s * 1000:9.1f} ms  {len(legacy_chunks)} chunks")
+    print(f"{'prefix-sum span sizing':<28} {span_s * 1000:9.1f} ms  {len(span_chunks)} chunks  "
+          f"({legacy_s / span_s:.1f}x)")
+    print(f"same chunks with word counts: {legacy_chunks == span_chunks}")
+
+
+if __name__ == "__main__":
+    main()
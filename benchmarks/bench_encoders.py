@@ -0,0 +1,98 @@
+"""
+Compare the CPU embedding backends against the current float32
+SentenceTransformer on the sample contracts.
+
+Every contract is chunked once, then its sentences and chunks are encoded
+with each backend. Reports throughput (texts/s) for both, the cosine
+similarity of each backend's chunk vectors to the baseline, and how often
+retrieval for a set of typical lease questions returns the same top-k chunks.
+"baseline" is the plain model.encode call with fixed batches of 32;
+"torch" is the same weights behind length-sorted token-budget batching.
+
+Usage:
+    python benchmarks/bench_encoders.py --backends torch int8 onnx --top-k 3
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from sentence_transformers import SentenceTransformer
+
+from bench_chunk_embeddings import QUESTIONS
+from rag.core.chunking import SemanticChunker
+from rag.core.encoders import load_encoder
+from rag.ocr.pdfExtractor import PDFTextExtractor
+
+
+def timed_encode(encoder, texts):
+    start = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True)
+    return embeddings, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(project_root, "sample lease contracts"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--onnx-file", help="ONNX file in the model repo, e.g. onnx/model_qint8_avx512.onnx")
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline = SentenceTransformer(args.model, device="cpu")
+    chunker = SemanticChunker(model=baseline, min_tokens=100, max_tokens=1024)
+
+    docs = []
+    for pdf_path in sorted(Path(args.dir).glob("*.pdf")):
+        text = "\n".join(page["text"] for page in PDFTextExtractor(str(pdf_path)).iter_pages())
+        docs.append((chunker.split_sentences(text), chunker.chunk_text(text)))
+    sentences = [s for doc_sentences, _ in docs for s in doc_sentences]
+    print(f"{len(docs)} contracts, {len(sentences)} sentences, {sum(len(c) for _, c in docs)} chunks\n")
+
+    encoders = {"baseline": baseline}
+    for backend in args.backends:
+        try:
+            encoders[backend] = load_encoder(args.model, backend=backend, onnx_file=args.onnx_file)
+        except ImportError as e:
+            print(f"skipping {backend}: {e}")
+
+    reference = None
+    print(f"{'backend':<10} {'sent/s':>8} {'chunks/s':>9} {'cos mean':>9} {'cos min':>8} "
+          f"{f'top{args.top_k} overlap':>13} {'top1 kept':>9}")
+    for name, encoder in encoders.items():
+        _, sentence_time = timed_encode(encoder, sentences)
+        questions, _ = timed_encode(encoder, QUESTIONS)
+        chunk_embeddings, chunk_time = [], 0.0
+        for _, chunks in docs:
+            embeddings, elapsed = timed_encode(encoder, chunks)
+            chunk_embeddings.append(embeddings)
+            chunk_time += elapsed
+        total_chunks = sum(len(e) for e in chunk_embeddings)
+
+        if reference is None:
+            reference = (questions, chunk_embeddings)
+        ref_questions, ref_chunks = reference
+        cosines = np.concatenate([np.sum(e * r, axis=1) for e, r in zip(chunk_embeddings, ref_chunks)])
+
+        overlaps, kept = [], []
+        for embeddings, ref_embeddings in zip(chunk_embeddings, ref_chunks):
+            k = min(args.top_k, len(embeddings))
+            top = np.argsort(-questions @ embeddings.T, axis=1)[:, :k]
+            ref_top = np.argsort(-ref_questions @ ref_embeddings.T, axis=1)[:, :k]
+            overlaps.extend(len(set(t) & set(r)) / k for t, r in zip(top, ref_top))
+            kept.extend(r[0] in t for t, r in zip(top, ref_top))
+
+        print(f"{name:<10} {len(sentences) / sentence_time:>8.0f} {total_chunks / chunk_time:>9.1f} "
+              f"{cosines.mean():>9.4f} {cosines.min():>8.4f} {np.mean(overlaps):>13.2f} {np.mean(kept):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
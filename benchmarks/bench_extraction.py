@@ -0,0 +1,46 @@
+"""
+Benchmark PDFTextExtractor serial vs page-parallel extraction on the
+contracts in `sample lease contracts/`.
+
+Usage:
+    python benchmarks/bench_extraction.py --workers 1 2 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from rag.ocr.pdfExtractor import PDFTextExtractor
+
+
+def run(pdf_path: Path, workers: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        PDFTextExtractor(str(pdf_path), workers=workers).extract_text()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(project_root, "sample lease contracts"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.dir).glob("*.pdf"))
+    print(f"{'file':<40} {'pages':>5} " + " ".join(f"{f'w={w}':>10}" for w in args.workers))
+    for pdf_path in pdfs:
+        pages = len(PDFTextExtractor(str(pdf_path)).extract_text()["text"])
+        timings = [run(pdf_path, w, args.repeat) for w in args.workers]
+        print(f"{pdf_path.name:<40} {pages:>5} " + " ".join(f"{t:>9.2f}s" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compare dense, BM25 and hybrid retrieval on the sample contracts.
+
+Every contract is chunked once and indexed both ways (a temporary local
+vector index and a LexicalIndex). Two question sets are run against each:
+
+- exact-term questions generated from the contract itself ("What does the
+  contract say about Section 4.2?") for terms (clause numbers, amounts) that
+  occur in at most two chunks; a hit means one of those chunks is in the top k
+- the typical lease questions from bench_chunk_embeddings, which have no
+  ground truth; reported as top-k overlap of hybrid with dense
+
+Reports hit@k and mean latency per method, and how many questions the
+hybrid path answered from the lexical index alone.
+
+Usage:
+    python benchmarks/bench_lexical.py --top-k 3
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from sentence_transformers import SentenceTransformer
+
+from bench_chunk_embeddings import QUESTIONS
+from rag.core.chunking import SemanticChunker
+from rag.core.lexical_index import LexicalIndex, contains_term, exact_terms, normalize_text
+from rag.core.local_index import LocalIndex
+from rag.core.metadata import BuildMetaData
+from rag.core.vector_store import RetrievalChunks
+from rag.ocr.highlight_key_terms import load_stopwords
+from rag.ocr.pdfExtractor import PDFTextExtractor
+
+
+def term_questions(chunks, per_doc):
+    """(question, relevant chunk positions) for exact terms found in at most two chunks"""
+    normalized = [normalize_text(chunk) for chunk in chunks]
+    seen = set()
+    questions = []
+    for chunk in chunks:
+        for match in re.finditer(r"(?:Section|Schedule|Clause|Article|Exhibit)\s+\d[\w.]*|\$[\d,]+(?:\.\d\d)?", chunk):
+            question = f"What does the contract say about {match.group(0).rstrip('.,')}?"
+            terms = exact_terms(question)
+            if not terms or terms[0] in seen:
+                continue
+            seen.add(terms[0])
+            relevant = {i for i, text in enumerate(normalized) if all(contains_term(text, term) for term in terms)}
+            if 0 < len(relevant) <= 2:
+                questions.append((question, relevant))
+            if len(questions) == per_doc:
+                return questions
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(project_root, "sample lease contracts"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--questions-per-doc", type=int, default=10)
+    args = parser.parse_args()
+
+    encoder = SentenceTransformer(args.model)
+    chunker = SemanticChunker(model=encoder, min_tokens=100, max_tokens=1024, chunk_embeddings="pooled")
+    stopwords = load_stopwords("english")
+
+    with tempfile.TemporaryDirectory() as root:
+        vectors = LocalIndex(os.path.join(root, "vectors"), dim=encoder.get_sentence_embedding_dimension())
+        lexical = LexicalIndex(os.path.join(root, "lexical"), stopwords=stopwords)
+        dense = RetrievalChunks(encoder, top_k=args.top_k)
+        hybrid = RetrievalChunks(encoder, top_k=args.top_k, lexical=lexical)
+
+        hits = defaultdict(int)
+        seconds = defaultdict(list)
+        total = lexical_only = 0
+        overlap = []
+        for doc_id, pdf_path in enumerate(sorted(Path(args.dir).glob("*.pdf"))):
+            text = "\n".join(page["text"] for page in PDFTextExtractor(str(pdf_path)).iter_pages())
+            chunks, embeds = chunker.chunk_text(text, return_embeddings=True)
+            metadata = BuildMetaData(context_chars=400).build(chunks=chunks, doc_id=doc_id, doc_title=pdf_path.stem,
+                                                              lease_type="lease")
+            vectors.upsert(vectors=[(m["id"], embed.tolist(), m) for m, embed in zip(metadata, embeds)])
+            start = time.perf_counter()
+            lexical.add(doc_id, pdf_path.stem, chunks)
+            seconds["bm25 build"].append(time.perf_counter() - start)
+
+            for question, relevant in term_questions(chunks, args.questions_per_doc):
+                total += 1
+                results = {}
+                for name, retrieve in (("dense", lambda q: dense.retreive_chunks(q, vectors, doc_id)),
+                                       ("hybrid", lambda q: hybrid.retreive_chunks(q, vectors, doc_id))):
+                    start = time.perf_counter()
+                    results[name] = retrieve(question)
+                    seconds[name].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                lexical_hits, exact = lexical.search(doc_id, question, args.top_k)
+                seconds["bm25"].append(time.perf_counter() - start)
+                results["bm25"] = [chunks[i] for i, _ in lexical_hits]
+                lexical_only += hybrid._exact_only(exact)
+
+                for name, retrieved in results.items():
+                    hits[name] += any(chunks[i] in chunk for chunk in retrieved for i in relevant)
+
+            for question in QUESTIONS:
+                dense_chunks = dense.retreive_chunks(question, vectors, doc_id)
+                hybrid_chunks = hybrid.retreive_chunks(question, vectors, doc_id)
+                overlap.append(len(set(dense_chunks) & set(hybrid_chunks)) / max(len(dense_chunks), 1))
+
+    print(f"{total} exact-term questions, {lexical_only} answered from the lexical index alone\n")
+    print(f"{'method':<10} {f'hit@{args.top_k}':>8} {'mean ms':>9}")
+    for name in ("dense", "bm25", "hybrid"):
+        print(f"{name:<10} {hits[name] / max(total, 1):>8.2f} {np.mean(seconds[name]) * 1000:>9.2f}")
+    print(f"\nBM25 build per document: {np.mean(seconds['bm25 build']) * 1000:.1f} ms")
+    print(f"Typical questions, hybrid top-{args.top_k} overlap with dense: {np.mean(overlap):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Chat query latency of the two Pinecone index layouts as the number of
+stored contracts grows: "filtered" (every contract in one namespace, the
+query filtered on doc_id) and "namespaced" (one namespace per contract, see
+VECTOR_LAYOUT).
+
+A scratch index is filled with synthetic contracts of random unit vectors
+in growth steps; each contract is written in both layouts. After every step
+(once the index reports every vector), the same random queries (top-k,
+with metadata, like RetrievalChunks) are sent to random contracts in each
+layout. Reports p50/p95/mean per layout and step. The scratch index is
+deleted at the end unless --keep is given.
+
+Usage:
+    python benchmarks/bench_namespaces.py --steps 10 100 1000 --chunks 300
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from bench_vector_index import timed
+from rag.core.upserter import ParallelUpserter
+from rag.core.vector_store import NamespacedIndex, VectorStore, pc
+
+
+def add_documents(layouts, start, stop, chunks, dim, rng):
+    with ParallelUpserter(layouts["filtered"], max_workers=8) as filtered, \
+            ParallelUpserter(layouts["namespaced"], max_workers=8) as namespaced:
+        for d in range(start, stop):
+            doc_id = str(d)
+            values = rng.standard_normal((chunks, dim)).astype(np.float32)
+            values /= np.linalg.norm(values, axis=1, keepdims=True)
+            vectors = [(f"{doc_id}#{i}", values[i].tolist(), {"doc_id": doc_id, "id": f"{doc_id}#{i}", "content": "x" * 800})
+                       for i in range(chunks)]
+            filtered.add(vectors)
+            namespaced.add(vectors)
+        filtered.flush()
+        namespaced.flush()
+
+
+def wait_for_count(index, expected, timeout=600):
+    """Writes are eventually consistent; wait until the index reports them all"""
+    deadline = time.monotonic() + timeout
+    while index.describe_index_stats().total_vector_count < expected:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Index did not reach {expected} vectors")
+        time.sleep(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-name", default="covenant-ai-layout-bench", help="Scratch index (created if missing)")
+    parser.add_argument("--steps", nargs="+", type=int, default=[10, 100, 500], help="Contracts stored at each step")
+    parser.add_argument("--chunks", type=int, default=300, help="Chunks per contract")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch index")
+    args = parser.parse_args()
+    if args.index_name == "covenant-ai":
+        parser.error("the benchmark writes to and deletes its index; use a scratch index name")
+
+    rng = np.random.default_rng(0)
+    index = VectorStore(args.index_name, dims=args.dim).index()
+    layouts = {"filtered": index, "namespaced": NamespacedIndex(index)}
+
+    def query(layout):
+        def run(vector, doc_id):
+            return layouts[layout].query(vector=vector, top_k=args.top_k, include_metadata=True,
+                                         filter={"doc_id": {"$eq": doc_id}})
+        return run
+
+    print(f"{'contracts':>9} {'vectors':>9}  {'layout':<11} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    try:
+        stored = 0
+        for step in sorted(args.steps):
+            add_documents(layouts, stored, step, args.chunks, args.dim, rng)
+            stored = step
+            wait_for_count(index, 2 * stored * args.chunks)
+
+            vectors = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            calls = [(vector.tolist(), str(doc_id)) for vector, doc_id in zip(vectors, rng.integers(0, stored, args.queries))]
+            for layout in layouts:
+                query(layout)(*calls[0])  # warm-up
+                ms = timed(query(layout), calls)
+                print(f"{stored:>9} {stored * args.chunks:>9}  {layout:<11} {np.percentile(ms, 50):>9.2f} "
+                      f"{np.percentile(ms, 95):>9.2f} {ms.mean():>9.2f}")
+    finally:
+        if not args.keep:
+            pc.delete_index(args.index_name)
+
+
+if __name__ == "__main__":
+    main()
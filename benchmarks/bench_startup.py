@@ -0,0 +1,63 @@
+"""
+Break down web app startup cost per component.
+
+Each heavy dependency is imported in a fresh interpreter to time it on its
+own. Then src/app.py is imported (which should now do no model loading or
+network calls), and every lazy component is initialized in turn, the way
+/warmup does it.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --skip-network   # local components only
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+LIBRARIES = ["torch", "sentence_transformers", "google.generativeai", "supabase", "pinecone", "fitz", "pdfplumber",
+             "flask"]
+
+
+def import_seconds(module: str) -> float:
+    """Wall time to import a module in a fresh interpreter, minus interpreter startup"""
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+        return time.perf_counter() - start
+    return run(f"import {module}") - run("pass")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skip-network", action="store_true", help="Only initialize the local components")
+    args = parser.parse_args()
+
+    print(f"{'library import (fresh process)':<36} {'seconds':>8}")
+    for module in LIBRARIES:
+        try:
+            print(f"{module:<36} {import_seconds(module):>8.2f}")
+        except subprocess.CalledProcessError:
+            print(f"{module:<36} {'n/a':>8}")
+
+    start = time.perf_counter()
+    import src.app as app_module
+    print(f"\n{'import src.app':<36} {time.perf_counter() - start:>8.2f}")
+
+    components = app_module.LOCAL_COMPONENTS if args.skip_network else app_module.COMPONENTS
+    print(f"\n{'component':<36} {'seconds':>8}")
+    for component in components:
+        try:
+            component.get()
+            print(f"{component.name:<36} {component.load_seconds:>8.2f}")
+        except Exception as e:
+            print(f"{component.name:<36} {'failed':>8}  {e}")
+
+
+if __name__ == "__main__":
+    main()
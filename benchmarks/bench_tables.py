@@ -0,0 +1,58 @@
+"""
+Measure how many pages the ruling-line pre-screen keeps away from the
+pdfplumber table pass, how long the skipped pages would have cost, and
+check that the extracted TableData is unchanged.
+
+Usage:
+    python benchmarks/bench_tables.py
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import fitz
+import pdfplumber
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from rag.ocr.pdfExtractor import PDFTextExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(project_root, "sample lease contracts"))
+    args = parser.parse_args()
+
+    print(f"{'file':<32} {'pages':>5} {'skipped':>7} {'screen ms/pg':>12} "
+          f"{'plumber ms/pg (skipped)':>24} {'same tables':>11}")
+    for pdf_path in sorted(Path(args.dir).glob("*.pdf")):
+        extractor = PDFTextExtractor(str(pdf_path))
+        doc = fitz.open(pdf_path)
+        screen_time = skipped_time = 0.0
+        skipped = 0
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in doc:
+                start = time.perf_counter()
+                candidate = extractor._has_table_candidates(page)
+                screen_time += time.perf_counter() - start
+                if not candidate:
+                    start = time.perf_counter()
+                    extractor._extract_tables(pdf.pages[page.number])
+                    skipped_time += time.perf_counter() - start
+                    skipped += 1
+        pages = len(doc)
+        doc.close()
+
+        screened = PDFTextExtractor(str(pdf_path)).extract_text()["tables"]
+        full = PDFTextExtractor(str(pdf_path), table_prescreen=False).extract_text()["tables"]
+
+        print(f"{pdf_path.name:<32} {pages:>5} {skipped:>7} {1000 * screen_time / pages:>12.2f} "
+              f"{1000 * skipped_time / max(skipped, 1):>24.2f} {str(screened == full):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compare query latency of the local memory-mapped vector index against the
+Pinecone index that /chat queries today.
+
+Without --doc-ids, the local index is filled with synthetic documents of
+random unit vectors and only the local side is timed. With --doc-ids, each
+listed document is copied from Pinecone into a temporary local index, and
+the same random queries (filtered to one document, top-k, with metadata,
+like RetrievalChunks) are sent to both. Reports p50/p95/mean per backend
+for query, and for a fetch of 10 neighbour ids, plus the per-message index
+setup (build_vectordb + pc.Index) that /chat used to do before every query.
+
+Usage:
+    python benchmarks/bench_vector_index.py --docs 200 --chunks 300
+    python benchmarks/bench_vector_index.py --doc-ids 12 34 56 --queries 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from rag.core.local_index import LocalIndex
+
+
+def synthetic_documents(index, docs, chunks, dim, rng):
+    doc_ids = [str(d) for d in range(docs)]
+    for doc_id in doc_ids:
+        values = rng.standard_normal((chunks, dim)).astype(np.float32)
+        values /= np.linalg.norm(values, axis=1, keepdims=True)
+        index.upsert(vectors=[
+            (f"{doc_id}#{i}", values[i].tolist(), {"doc_id": doc_id, "id": f"{doc_id}#{i}", "content": "x" * 800})
+            for i in range(chunks)
+        ])
+    return doc_ids
+
+
+def copy_documents(remote, index, doc_ids):
+    from rag.core.vector_store import fetch_document_vectors
+
+    for doc_id in doc_ids:
+        vectors = list(fetch_document_vectors(remote, doc_id))
+        for i in range(0, len(vectors), 100):
+            index.upsert(vectors=vectors[i:i + 100])
+        print(f"copied {len(vectors)} vectors of document {doc_id}")
+
+
+def timed(fn, calls):
+    seconds = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        seconds.append(time.perf_counter() - start)
+    return np.array(seconds) * 1000
+
+
+def report(name, ms):
+    print(f"{name:<24} {np.percentile(ms, 50):>9.2f} {np.percentile(ms, 95):>9.2f} {ms.mean():>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doc-ids", nargs="+", help="Pinecone documents to copy and compare against")
+    parser.add_argument("--index-name", default="covenant-ai")
+    parser.add_argument("--docs", type=int, default=100, help="Synthetic documents (without --doc-ids)")
+    parser.add_argument("--chunks", type=int, default=300, help="Chunks per synthetic document")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as root:
+        local = LocalIndex(root, dim=args.dim)
+        start = time.perf_counter()
+        if args.doc_ids:
+            from rag.core.vector_store import VectorStore
+
+            remote = VectorStore(args.index_name, dims=args.dim).index()
+            doc_ids = args.doc_ids
+            copy_documents(remote, local, doc_ids)
+        else:
+            remote = None
+            doc_ids = synthetic_documents(local, args.docs, args.chunks, args.dim, rng)
+        print(f"loaded local index in {time.perf_counter() - start:.2f}s\n")
+
+        vectors = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        doc_choice = rng.choice(doc_ids, size=args.queries)
+        query_calls = [(vector.tolist(), doc_id) for vector, doc_id in zip(vectors, doc_choice)]
+        fetch_calls = [([f"{doc_id}#{i}" for i in range(10)],) for doc_id in doc_choice]
+
+        backends = [("local", local)] + ([("pinecone", remote)] if remote is not None else [])
+        print(f"{'ms':<24} {'p50':>9} {'p95':>9} {'mean':>9}")
+        for name, index in backends:
+            def query(vector, doc_id):
+                return index.query(vector=vector, top_k=args.top_k, include_metadata=True,
+                                   filter={"doc_id": {"$eq": doc_id}})
+
+            query(*query_calls[0])  # connection / first-map warm-up
+            report(f"{name} query", timed(query, query_calls))
+            report(f"{name} fetch (10 ids)", timed(lambda ids: index.fetch(ids=ids), fetch_calls))
+
+        if remote is not None:
+            from rag.core.vector_store import build_vectordb, pc
+
+            def setup():
+                build_vectordb(index_name=args.index_name, dims=args.dim)
+                pc.Index(args.index_name)
+
+            report("pinecone old setup", timed(setup, [()] * min(args.queries, 20)))
+
+            same = 0
+            for vector, doc_id in query_calls:
+                hits = [[m["id"] for m in index.query(vector=vector, top_k=args.top_k,
+                                                      filter={"doc_id": {"$eq": doc_id}})["matches"]]
+                        for index in (local, remote)]
+                same += hits[0] == hits[1]
+            print(f"\nidentical top-{args.top_k}: {same}/{len(query_calls)} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Report memory use of a running gunicorn master and its workers (Linux).
+
+RSS counts shared pages in full for every process, so it overstates the
+cost of N workers. PSS splits shared pages between the processes mapping
+them, and USS is what a process holds alone, i.e. what an extra worker
+actually costs. With preload_app the model weights should show up as
+shared, not as USS in every worker.
+
+Usage:
+    gunicorn -c gunicorn_config.py --pid /tmp/gunicorn.pid wsgi:application
+    python benchmarks/worker_memory.py --pidfile /tmp/gunicorn.pid
+"""
+
+import argparse
+import os
+
+
+def memory(pid: int) -> dict:
+    """RSS, PSS, USS and shared memory of a process in MiB, from smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": uss,
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def children(pid: int) -> list:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command may contain spaces; the parent pid follows the closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--pid", type=int, help="gunicorn master pid")
+    group.add_argument("--pidfile", help="File holding the gunicorn master pid")
+    args = parser.parse_args()
+
+    master = args.pid
+    if args.pidfile:
+        with open(args.pidfile) as f:
+            master = int(f.read().strip())
+
+    workers = children(master)
+    print(f"{'process':<16} {'pid':>7} {'RSS MiB':>9} {'PSS MiB':>9} {'USS MiB':>9} {'shared MiB':>11}")
+    total_pss = 0.0
+    for name, pid in [("master", master)] + [(f"worker {i}", pid) for i, pid in enumerate(workers, start=1)]:
+        stats = memory(pid)
+        total_pss += stats["pss"]
+        print(f"{name:<16} {pid:>7} {stats['rss']:>9.1f} {stats['pss']:>9.1f} {stats['uss']:>9.1f} "
+              f"{stats['shared']:>11.1f}")
+    print(f"\n{len(workers)} worker(s), {total_pss:.1f} MiB in total (sum of PSS)")
+
+
+if __name__ == "__main__":
+    main()
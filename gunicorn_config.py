@@ -1,6 +1,35 @@
+import gc
 import os
+import threading
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
-workers = 1
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
 threads = 2
-timeout = 120
\ No newline at end of file
+timeout = 120
+
+# Import src/app.py once in the master; workers are forked from it
+preload_app = True
+
+
+def when_ready(server):
+    from src.app import LOCAL_COMPONENTS, warm_up
+
+    # Load the embedding model and other local components before forking, so
+    # workers share those pages copy-on-write. Network clients stay lazy.
+    warm_up(LOCAL_COMPONENTS)
+
+    # Move everything loaded so far out of the garbage collector's reach, so
+    # collections in the workers don't write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+    from src.app import NETWORK_COMPONENTS, reinit_after_fork, warm_up
+
+    # Split the cores between workers instead of every worker using all of them
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // server.cfg.workers))
+    reinit_after_fork()
+    # Connect in the background; /readyz reports ready once this is done
+    threading.Thread(target=warm_up, args=(NETWORK_COMPONENTS,), daemon=True).start()
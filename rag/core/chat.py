@@ -1,5 +1,8 @@
 import os
+import threading
+from collections import deque
 import google.generativeai as genai
+import numpy as np
 from typing import List, Dict, Any
 import time
 
@@ -8,13 +11,40 @@ from .vector_store import RetrievalChunks
 
 HISTORY_LENGTH = 5 
 
+
+class ChatLatency:
+    """
+    Time-to-first-token and total time of the most recent streamed answers.
+    Time to first token includes retrieval, since that is what the user waits for.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples)
+
+    def record(self, first_token_seconds: float, total_seconds: float) -> None:
+        with self._lock:
+            self._samples.append((first_token_seconds, total_seconds))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = np.array(self._samples, dtype=np.float64).reshape(-1, 2) * 1000
+        if not len(samples):
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "first_token_ms": {"p50": float(np.percentile(samples[:, 0], 50)), "p95": float(np.percentile(samples[:, 0], 95))},
+            "total_ms": {"p50": float(np.percentile(samples[:, 1], 50)), "p95": float(np.percentile(samples[:, 1], 95))},
+        }
+
 class RAGChatbot:
-    def __init__(self, model, api_key: str):
+    def __init__(self, model, api_key: str, retrieval_cache=None, lexical_index=None, fetch_concurrency: int = 1):
         self.api_key = api_key
         self.model = self._init_model()
         self.conversation_history = []
         self.max_history = HISTORY_LENGTH
-        self.retrieve = RetrievalChunks(model)
+        self.retrieve = RetrievalChunks(model, cache=retrieval_cache, lexical=lexical_index,
+                                        fetch_concurrency=fetch_concurrency)
 
         
     def _init_model(self):
@@ -42,7 +72,15 @@ class RAGChatbot:
         """Generate the full prompt with context, history, and current query."""
         # Retrieve relevant context
         context_chunks = self.retrieve_context(query, index, doc_id)
-        
+        return self.build_prompt(query, context_chunks)
+
+    async def agenerate_prompt(self, query: str, index, doc_id) -> str:
+        """Async generate_prompt: retrieval does not block the event loop."""
+        context_chunks = await self.retrieve.aretreive_chunks(query, index, doc_id)
+        return self.build_prompt(query, context_chunks)
+
+    def build_prompt(self, query: str, context_chunks: List[str]) -> str:
+        """Build the full prompt from retrieved chunks, history, and the current query."""
         # Format context chunks
         context_text = "\n".join([f"Context {i+1}: {chunk}" for i, chunk in enumerate(context_chunks)])
         
@@ -79,25 +117,52 @@ Answer:
         if len(self.conversation_history) > self.max_history:
             self.conversation_history = self.conversation_history[-self.max_history:]
     
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text of one streamed Gemini chunk ("" for chunks without text parts, e.g. the final one)."""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+
     def generate_response_stream(self, query: str, index, doc_id):
-        """Generate a streaming response to the user query."""
+        """Generate a streaming response to the user query, yielding text as Gemini produces it."""
         prompt = self.generate_prompt(query, index, doc_id)
-        
-        response_stream = self.model.generate_content_async(
+
+        response_stream = self.model.generate_content(
             prompt,
-            generation_config={"temperature": 0.2}
+            generation_config={"temperature": 0.2},
+            stream=True
         )
 
         full_response = ""
         for chunk in response_stream:
-            full_response += chunk
-            yield chunk
-            full_response = full_response
-        
+            text = self._chunk_text(chunk)
+            if text:
+                full_response += text
+                yield text
+
         # Update conversation history with the complete response
         self.update_history(query, full_response)
 
-        return full_response
+    async def agenerate_response_stream(self, query: str, index, doc_id):
+        """Async generate_response_stream, for the async chat server."""
+        prompt = await self.agenerate_prompt(query, index, doc_id)
+
+        response_stream = await self.model.generate_content_async(
+            prompt,
+            generation_config={"temperature": 0.2},
+            stream=True
+        )
+
+        full_response = ""
+        async for chunk in response_stream:
+            text = self._chunk_text(chunk)
+            if text:
+                full_response += text
+                yield text
+
+        self.update_history(query, full_response)
         
     def generate_response(self, query: str, index, doc_id) -> str:
         """Generate a non-streaming response (for cases where streaming isn't needed)."""
@@ -118,6 +183,22 @@ Answer:
         self.update_history(query, response_text)
         
         return response_text
+
+    async def agenerate_response(self, query: str, index, doc_id) -> str:
+        """Async generate_response: retrieval runs in worker threads and Gemini is called through its async client."""
+        prompt = await self.agenerate_prompt(query, index, doc_id)
+
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config={"temperature": 0.2}
+        )
+
+        response_text = response.text
+
+        # Update conversation history
+        self.update_history(query, response_text)
+
+        return response_text
     
 #while True:
 #    user_input = input("\nYou: ")
@@ -127,6 +208,6 @@ Answer:
 #        break
 #    print("\nAssistant: ", end="")
 #
-#    async for text_chunk in chatbot.generate_response_stream(user_input, dooc_id):
+#    for text_chunk in chatbot.generate_response_stream(user_input, index, doc_id):
 #        print(text_chunk, end="", flush=True)
 #        time.sleep(0.01)
\ No newline at end of file
@@ -1,23 +1,56 @@
 import numpy as np 
 import re  
 from functools import lru_cache
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 import logging
 import time
 import sys
 
 
+# Half-open range [start, end) of sentence indices making up one chunk
+Span = Tuple[int, int]
+
+
 class SemanticChunker: 
-    def __init__(self, model, min_tokens: int = 100, max_tokens: int = 500, buffer_size: int = 1):
+    def __init__(self, model, min_tokens: int = 100, max_tokens: int = 500, buffer_size: int = 1,
+                 chunk_embeddings: str = "pooled"):
+        """
+        Args:
+            max_tokens: Largest chunk, in tokens. Capped at the encoder's
+                max_seq_length, past which it truncates what it embeds.
+            chunk_embeddings: How chunk embeddings are produced when requested.
+                "pooled" averages the sentence-window embeddings already computed
+                for breakpoint detection; "encode" encodes the final chunks.
+        """
+        if chunk_embeddings not in ("pooled", "encode"):
+            raise ValueError(f"Unknown chunk_embeddings mode: {chunk_embeddings}")
         self.model = model
+        self.chunk_embeddings = chunk_embeddings
         self.sentence_split_pattern = re.compile(r'(?<=[.?!])(?:\s+|\n)')
         self.batch_size = 16
         self.min_tokens = min_tokens
-        self.max_tokens = max_tokens
+        self._max_tokens = max_tokens
         self.buffer_size = buffer_size
 
+    @property
+    def max_tokens(self) -> int:
+        """
+        Effective chunk size limit: max_tokens, or less if the encoder reads
+        fewer tokens (max_seq_length includes the [CLS] and [SEP] tokens that
+        count_tokens leaves out)
+        """
+        max_seq_length = getattr(self.model, "max_seq_length", None)
+        if not max_seq_length:
+            return self._max_tokens
+        return min(self._max_tokens, max_seq_length - 2)
+
     @lru_cache(maxsize=1024)
     def split_sentences(self, text: str) -> List[str]:
+        return self._split_sentences(text)
+
+    def _split_sentences(self, text: str) -> List[str]:
+        # Uncached: chunk_stream splits every page once, and caching them would
+        # keep up to 1024 pages alive across documents
         return [s.strip() for s in self.sentence_split_pattern.split(text) if s.strip()]
 
     def combined_sentences_batch(self, sentences: List[str]) -> List[str]:
@@ -43,77 +76,72 @@ class SemanticChunker:
         # Convert to distances
         return 1 - similarities
     
-    def group_candidates(self, sentences: List[str], breakpoint_indices: List[int]) -> List[List[str]]:
-        """
-        Slice the list of sentences into groups based on breakpoints.
-        """
-        groups = []
-        start = 0
-        for idx in breakpoint_indices:
-            groups.append(sentences[start: idx + 1])
-            start = idx + 1
-        if start < len(sentences):
-            groups.append(sentences[start:])
-        return groups
-
-    def group_sentences(self, sentences: List[str]) -> List[str]:
-        """
-        Greedily group sentences so that each chunk's token count is within max_tokens.
-        """
-        chunks = []
-        current_chunk = []
-        current_tokens = 0
-        for s in sentences:
-            token_count = len(s.split())
-            if current_chunk and current_tokens + token_count > self.max_tokens:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [s]
-                current_tokens = token_count
-            else:
-                current_chunk.append(s)
-                current_tokens += token_count
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        return chunks
+    def count_tokens(self, sentences: List[str]) -> np.ndarray:
+        """
+        Token count of every sentence, using the encoder's own tokenizer when it
+        has one (special tokens excluded) and whitespace words otherwise.
+        """
+        if not sentences:
+            return np.zeros(0, dtype=np.int64)
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return np.fromiter((len(s.split()) for s in sentences), dtype=np.int64, count=len(sentences))
+        input_ids = tokenizer(list(sentences), add_special_tokens=False, return_attention_mask=False,
+                              return_token_type_ids=False)["input_ids"]
+        return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(sentences))
 
-    def merge_small_chunks(self, chunks: List[str]) -> List[str]:
+    def _split_span(self, start: int, end: int, cum_tokens: np.ndarray) -> List[Span]:
         """
-        Merge chunks that have too few tokens (i.e. below min_tokens) with the preceding chunk
-        if the merge does not exceed max_tokens.
+        Greedily split a span so each piece's token count is within max_tokens.
+        A sentence longer than max_tokens becomes a piece of its own.
         """
-        if not chunks:
-            return chunks
-        merged = [chunks[0]]
-        for chunk in chunks[1:]:
-            token_count = len(chunk.split())
-            prev_token_count = len(merged[-1].split())
-            if token_count < self.min_tokens and prev_token_count + token_count <= self.max_tokens:
-                merged[-1] = merged[-1] + " " + chunk
+        spans = []
+        while start < end:
+            # Furthest end whose prefix-sum difference still fits
+            stop = int(np.searchsorted(cum_tokens, cum_tokens[start] + self.max_tokens, side="right")) - 1
+            stop = min(max(stop, start + 1), end)
+            spans.append((start, stop))
+            start = stop
+        return spans
+
+    def _merge_small_spans(self, spans: List[Span], cum_tokens: np.ndarray) -> List[Span]:
+        """
+        Merge spans below min_tokens into the preceding span when the result stays
+        within max_tokens.
+        """
+        if not spans:
+            return spans
+        merged = [spans[0]]
+        for start, end in spans[1:]:
+            token_count = cum_tokens[end] - cum_tokens[start]
+            merged_start = merged[-1][0]
+            if token_count < self.min_tokens and cum_tokens[end] - cum_tokens[merged_start] <= self.max_tokens:
+                merged[-1] = (merged_start, end)
             else:
-                merged.append(chunk)
+                merged.append((start, end))
         return merged
-    
-    def chunk_text(self, text: str, percentile_threshold: float = 80) -> List[str]:
+
+    def _chunk_spans(self, single_sentences: List[str], percentile_threshold: float,
+                     token_counts: Optional[np.ndarray] = None) -> Tuple[List[Span], Optional[np.ndarray]]:
         """
-        Chunk text with optimized processing
+        Find chunk boundaries for an already split list of sentences
         Args:
-            text: Input text to chunk
-            percentile_threshold: Percentile threshold for chunk boundaries (default: 80)
+            single_sentences: Sentences in document order
+            percentile_threshold: Percentile threshold for chunk boundaries
+            token_counts: Precomputed count_tokens(single_sentences), if any
         Returns:
-            List of text chunks
+            Contiguous sentence spans covering every sentence, and the
+            sentence-window embeddings (None when no embedding was needed)
         """
-
-        # Split and combine sentences
-        single_sentences = self.split_sentences(text)
-        if len(single_sentences) <= 1:
-            return single_sentences
+        n = len(single_sentences)
+        if n <= 1:
+            return [(0, n)] if n else [], None
 
         #Step 2
         combined_sentences = self.combined_sentences_batch(single_sentences)
 
         #Step 3 
         # Get embeddings and calculate distances
-        #embeddings = self.get_embeddings_batch(combined_sentences)
         embeddings = self.get_embeddings(combined_sentences)
 
         #Step 4 
@@ -125,24 +153,108 @@ class SemanticChunker:
         indices_above_thresh = np.where(distances > threshold)[0].tolist()
         
         #Step 6
-        # Create chunks efficiently
+        # Slice the sentences into candidate spans at the breakpoints. Token
+        # counts are prefix-summed so any span's size is one subtraction.
+        if token_counts is None:
+            token_counts = self.count_tokens(single_sentences)
+        cum_tokens = np.concatenate(([0], np.cumsum(token_counts)))
+        starts = [0] + [idx + 1 for idx in indices_above_thresh]
+        ends = [idx + 1 for idx in indices_above_thresh] + [n]
 
-        candidate_groups = self.group_candidates(single_sentences, indices_above_thresh)
-
-        # Step 7: Process candidate chunks:
-        #         - If a candidate chunk exceeds max_tokens, split it further.
-        final_chunks = []
-        for group in candidate_groups:
-            group_text = " ".join(group)
-            if len(group_text.split()) > self.max_tokens:
-                final_chunks.extend(self.group_sentences(group))
+        # Step 7: Process candidate spans:
+        #         - If a candidate exceeds max_tokens, split it further.
+        final_spans = []
+        for start, end in zip(starts, ends):
+            if cum_tokens[end] - cum_tokens[start] > self.max_tokens:
+                final_spans.extend(self._split_span(start, end, cum_tokens))
             else:
-                final_chunks.append(group_text)
+                final_spans.append((start, end))
 
         # Step 8: Merge any chunks that are too small.
-        merged_chunks = self.merge_small_chunks(final_chunks)
-        
-        return merged_chunks
+        return self._merge_small_spans(final_spans, cum_tokens), embeddings
+
+    def _span_embeddings(self, chunks: List[str], spans: List[Span],
+                         window_embeddings: Optional[np.ndarray]) -> np.ndarray:
+        """Embeddings for the chunks built from the given spans"""
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.chunk_embeddings == "encode" or window_embeddings is None:
+            return self.get_embeddings(chunks)
+        # Spans are contiguous, so one reduceat sums each chunk's windows
+        pooled = np.add.reduceat(window_embeddings[spans[0][0]:spans[-1][1]],
+                                 [start - spans[0][0] for start, _ in spans], axis=0)
+        return pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+
+    def _emit(self, sentences: List[str], spans: List[Span], window_embeddings: Optional[np.ndarray],
+              return_embeddings: bool) -> Iterator[Union[str, Tuple[str, np.ndarray]]]:
+        chunks = [" ".join(sentences[start:end]) for start, end in spans]
+        if not return_embeddings:
+            yield from chunks
+            return
+        yield from zip(chunks, self._span_embeddings(chunks, spans, window_embeddings))
+
+    def chunk_text(self, text: str, percentile_threshold: float = 80,
+                   return_embeddings: bool = False) -> Union[List[str], Tuple[List[str], np.ndarray]]:
+        """
+        Chunk text with optimized processing
+        Args:
+            text: Input text to chunk
+            percentile_threshold: Percentile threshold for chunk boundaries (default: 80)
+            return_embeddings: Also return one embedding per chunk (see chunk_embeddings)
+        Returns:
+            List of text chunks, or (chunks, embeddings) when return_embeddings is set
+        """
+
+        # Split and combine sentences
+        single_sentences = self.split_sentences(text)
+        spans, window_embeddings = self._chunk_spans(single_sentences, percentile_threshold)
+        chunks = [" ".join(single_sentences[start:end]) for start, end in spans]
+        if return_embeddings:
+            return chunks, self._span_embeddings(chunks, spans, window_embeddings)
+        return chunks
+
+    def chunk_stream(self, texts: Iterable[str], percentile_threshold: float = 80,
+                     window_sentences: int = 512,
+                     return_embeddings: bool = False) -> Iterator[Union[str, Tuple[str, np.ndarray]]]:
+        """
+        Chunk a stream of texts (e.g. PDF pages) without joining them first
+        Args:
+            texts: Iterable of texts, treated as if joined with newlines
+            percentile_threshold: Percentile threshold for chunk boundaries (default: 80)
+            window_sentences: New sentences buffered before a window is chunked
+            return_embeddings: Yield (chunk, embedding) pairs instead of chunks
+        Yields:
+            Text chunks in document order
+        """
+        buffer: List[str] = []
+        # Token counts of the buffered sentences, each counted once
+        buffer_tokens = np.zeros(0, dtype=np.int64)
+        carried = 0
+        tail = ""
+        for text in texts:
+            sentences = self._split_sentences(f"{tail}\n{text}" if tail else text)
+            if not sentences:
+                continue
+            # The last sentence may continue in the next text
+            tail = sentences.pop()
+            buffer.extend(sentences)
+            buffer_tokens = np.concatenate((buffer_tokens, self.count_tokens(sentences)))
+
+            if len(buffer) - carried >= window_sentences:
+                # Breakpoints use the window's own percentile. The last chunk
+                # is carried over so no chunk ends at a window edge.
+                spans, window_embeddings = self._chunk_spans(buffer, percentile_threshold, buffer_tokens)
+                yield from self._emit(buffer, spans[:-1], window_embeddings, return_embeddings)
+                buffer = buffer[spans[-1][0]:]
+                buffer_tokens = buffer_tokens[spans[-1][0]:]
+                carried = len(buffer)
+
+        if tail:
+            buffer.append(tail)
+            buffer_tokens = np.concatenate((buffer_tokens, self.count_tokens([tail])))
+        if buffer:
+            spans, window_embeddings = self._chunk_spans(buffer, percentile_threshold, buffer_tokens)
+            yield from self._emit(buffer, spans, window_embeddings, return_embeddings)
 
 def read_text_file(file_path: str) -> str:
     """Reads a text file and returns its content as a string."""
@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+import zlib
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Sequence
+
+# Metadata fields kept locally instead of in the vector store. Everything
+# else (doc_id, id, lease_type, content_hash, neighbour ids) stays with the
+# vector, since it is used for filtering and re-indexing.
+TEXT_FIELDS = ("content", "title", "prechunk_context", "postchunk_context")
+
+
+class ContentStore:
+    """
+    Chunk texts keyed by vector id ("<doc_id>#<position>"), in a local SQLite
+    file shared by every process on the host. Each row holds the text fields
+    of one chunk as zlib-compressed JSON.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, data BLOB NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the store safe to share across threads
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def put_many(self, rows: Iterable[tuple]) -> None:
+        """Store (vector id, doc_id, text fields) rows"""
+        encoded = [(vector_id, str(doc_id), zlib.compress(json.dumps(fields).encode("utf-8")))
+                   for vector_id, doc_id, fields in rows]
+        if not encoded:
+            return
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO chunks (id, doc_id, data) VALUES (?, ?, ?)", encoded)
+            conn.execute("COMMIT")
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        with closing(self._connect()) as conn:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(ids), 500):
+                part = list(ids[start:start + 500])
+                placeholders = ",".join("?" * len(part))
+                for vector_id, data in conn.execute(f"SELECT id, data FROM chunks WHERE id IN ({placeholders})", part):
+                    found[vector_id] = json.loads(zlib.decompress(data))
+        return found
+
+    def delete_many(self, ids: Sequence[str]) -> None:
+        with closing(self._connect()) as conn:
+            for start in range(0, len(ids), 500):
+                part = list(ids[start:start + 500])
+                conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+
+
+class ContentStoreIndex:
+    """
+    Index wrapper that keeps chunk text out of the vector store. Upserts move
+    TEXT_FIELDS from the metadata into the ContentStore before the vectors
+    (now carrying only ids and filter fields) are sent on; query and fetch
+    results get those fields back from the store, so callers such as
+    RetrievalChunks and the re-indexer see the full metadata. Vectors
+    ingested before the switch still carry their text and are returned as is.
+    """
+
+    def __init__(self, index, store: ContentStore):
+        self._index = index
+        self.store = store
+
+    def upsert(self, vectors, **kwargs):
+        slim = []
+        rows = []
+        for vector_id, values, metadata in vectors:
+            metadata = dict(metadata)
+            fields = {key: metadata.pop(key) for key in TEXT_FIELDS if key in metadata}
+            rows.append((vector_id, metadata.get("doc_id", vector_id.rsplit("#", 1)[0]), fields))
+            slim.append((vector_id, values, metadata))
+        # Text first, so a vector is never visible without it
+        self.store.put_many(rows)
+        return self._index.upsert(vectors=slim, **kwargs)
+
+    def delete(self, ids: Sequence[str] = (), **kwargs):
+        result = self._index.delete(ids=ids, **kwargs)
+        self.store.delete_many(list(ids))
+        return result
+
+    def _hydrate(self, items: List[Dict[str, Any]]) -> None:
+        missing = [item["id"] for item in items if "content" not in (item.get("metadata") or {})]
+        if not missing:
+            return
+        texts = self.store.get_many(missing)
+        for item in items:
+            fields = texts.get(item["id"])
+            if fields and item.get("metadata") is not None:
+                item["metadata"].update(fields)
+
+    def query(self, *args, include_metadata: bool = False, **kwargs):
+        response = self._index.query(*args, include_metadata=include_metadata, **kwargs)
+        if include_metadata:
+            self._hydrate(response["matches"])
+        return response
+
+    def fetch(self, ids: Sequence[str], **kwargs):
+        response = self._index.fetch(ids=ids, **kwargs)
+        self._hydrate([{"id": vector_id, "metadata": vector["metadata"]}
+                       for vector_id, vector in response.vectors.items()])
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
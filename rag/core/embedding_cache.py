@@ -0,0 +1,309 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+SQLITE_MAX_PARAMS = 500
+# Marks a slot whose row is being rewritten; no key hashes to it in practice
+EMPTY_KEY = np.zeros(KEY_BYTES, dtype=np.uint8)
+# Disk hits are recorded in the index's last_used column in batches, once
+# this many are pending or the oldest has waited this long, rather than with
+# a write on every lookup
+RECENCY_BATCH = 256
+RECENCY_INTERVAL = 30.0
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by model name + text hash. Lookups go through an
+    in-process LRU first, then a disk store shared by every process on the
+    host: a memory-mapped float32 matrix with one row per slot, and a SQLite
+    index mapping keys to slots. When the store reaches its size limit the
+    least recently used slots are reused.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], model_name: str, dim: int,
+                 max_bytes: int = 512 * 1024 * 1024, memory_items: int = 4096):
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4 + KEY_BYTES))
+        self.memory_items = memory_items
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]", "_", model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = str(self.dir / "index.sqlite3")
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+        self.encoded = 0
+        # Keys read from disk since the last recency write -> time of use
+        self._touched: Dict[bytes, float] = {}
+        self._touched_flushed = time.time()
+
+        self._init_store()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _init_store(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key BLOB PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+            conn.execute("BEGIN IMMEDIATE")
+            meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+            if meta.get("dim", self.dim) != self.dim:
+                # A different embedding size cannot reuse the stored rows
+                conn.execute("DELETE FROM entries")
+                meta = {}
+            # Shrinking drops the rows that no longer fit
+            conn.execute("DELETE FROM entries WHERE slot >= ?", (self.capacity,))
+            next_slot = min(meta.get("next_slot", 0), self.capacity)
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [("dim", self.dim), ("next_slot", next_slot)],
+            )
+            conn.execute("COMMIT")
+
+        self._vectors = self._open_memmap(self.dir / "vectors.f32", np.float32, self.dim)
+        self._keys = self._open_memmap(self.dir / "keys.bin", np.uint8, KEY_BYTES)
+
+    def _open_memmap(self, path: Path, dtype, width: int) -> np.memmap:
+        size = self.capacity * width * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            # Sparse on most filesystems; only written rows take space
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(self.capacity, width))
+
+    def key(self, text: str, normalized: bool = False) -> bytes:
+        digest = hashlib.sha256(f"{self.model_name}\0{int(normalized)}\0{text}".encode("utf-8"))
+        return digest.digest()[:KEY_BYTES]
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        """Insert into the in-process LRU. Caller holds the lock."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _read_slot(self, key: bytes, slot: int) -> Optional[np.ndarray]:
+        """
+        Copy a row out of the store, unless another process has just reused
+        the slot. Writers clear a slot's key before touching its vector and set
+        the new key last, so if the key matches both before and after the copy,
+        the copy is that key's vector.
+        """
+        key_array = np.frombuffer(key, dtype=np.uint8)
+        if not np.array_equal(self._keys[slot], key_array):
+            return None
+        vector = np.array(self._vectors[slot])
+        if not np.array_equal(self._keys[slot], key_array):
+            return None
+        return vector
+
+    @staticmethod
+    def _slots(conn: sqlite3.Connection, keys) -> Dict[bytes, int]:
+        """Map the stored keys among keys to their slots"""
+        keys = list(keys)
+        slots = {}
+        for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+            batch = keys[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            slots.update(conn.execute(f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch))
+        return slots
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """Look keys up in memory, then on disk. Missing keys come back as None."""
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        on_disk = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    on_disk.append(i)
+
+        if on_disk:
+            found: Dict[bytes, np.ndarray] = {}
+            with closing(self._connect()) as conn:
+                for key, slot in self._slots(conn, {keys[i] for i in on_disk}).items():
+                    vector = self._read_slot(key, slot)
+                    if vector is not None:
+                        found[key] = vector
+
+            with self._lock:
+                for i in on_disk:
+                    vector = found.get(keys[i])
+                    if vector is None:
+                        self.misses += 1
+                        continue
+                    results[i] = vector
+                    self.disk_hits += 1
+                    self._remember(keys[i], vector)
+                touched = self._take_touched(found)
+            if touched:
+                with closing(self._connect()) as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                     [(used, key) for key, used in touched.items()])
+                    conn.execute("COMMIT")
+
+        return results
+
+    def _take_touched(self, keys=(), force: bool = False) -> Dict[bytes, float]:
+        """
+        Note keys as just used, and return the pending recency updates once
+        a batch is due (or force is set). Caller holds the lock.
+        """
+        now = time.time()
+        for key in keys:
+            self._touched[key] = now
+        if not self._touched or not (force or len(self._touched) >= RECENCY_BATCH
+                                     or now - self._touched_flushed >= RECENCY_INTERVAL):
+            return {}
+        touched, self._touched = self._touched, {}
+        self._touched_flushed = now
+        return touched
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        """Store new vectors, evicting the least recently used rows when full"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            touched = self._take_touched(force=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Pending recency updates go in first, so eviction sees them
+                conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in touched.items()])
+                # Another process may have stored some of these meanwhile
+                present = self._slots(conn, keys)
+                new = [(key, vector) for key, vector in zip(keys, vectors) if key not in present]
+                new = new[:self.capacity]
+                if not new:
+                    conn.execute("COMMIT")
+                    return
+
+                next_slot = conn.execute("SELECT value FROM meta WHERE name = 'next_slot'").fetchone()[0]
+                fresh = min(len(new), self.capacity - next_slot)
+                slots = list(range(next_slot, next_slot + fresh))
+                if fresh:
+                    conn.execute("UPDATE meta SET value = ? WHERE name = 'next_slot'", (next_slot + fresh,))
+                if len(slots) < len(new):
+                    evicted = conn.execute(
+                        "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (len(new) - len(slots),)
+                    ).fetchall()
+                    conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                    slots.extend(slot for _, slot in evicted)
+
+                now = time.time()
+                for (key, vector), slot in zip(new, slots):
+                    # Seqlock order for readers in other processes (see _read_slot)
+                    self._keys[slot] = EMPTY_KEY
+                    self._vectors[slot] = vector
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                conn.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, now) for (key, _), slot in zip(new, slots)],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def record_encode(self, count: int, seconds: float) -> None:
+        with self._lock:
+            self.encoded += count
+            self.encode_seconds += seconds
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and an estimate of the encoder time saved"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            per_text = self.encode_seconds / self.encoded if self.encoded else 0.0
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "encoded": self.encoded,
+                "encode_seconds": self.encode_seconds,
+                "estimated_seconds_saved": hits * per_text,
+                "memory_items": len(self._memory),
+                "capacity": self.capacity,
+            }
+
+
+class CachedEncoder:
+    """
+    Drop-in wrapper around a SentenceTransformer-style encoder that serves
+    repeated texts from an EmbeddingCache and only encodes the rest.
+    """
+
+    def __init__(self, model, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # tokenizer, get_sentence_embedding_dimension, ... come from the model
+        return getattr(self.model, name)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               convert_to_tensor: bool = False, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                     normalize_embeddings=normalize_embeddings, **kwargs)
+
+        keys = [self.cache.key(text, normalize_embeddings) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Encode each distinct missing text once
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            start = time.perf_counter()
+            encoded = self.model.encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True,
+                                        normalize_embeddings=normalize_embeddings, **kwargs)
+            self.cache.record_encode(len(missing), time.perf_counter() - start)
+            self.cache.put_many(list(missing.keys()), encoded)
+            fresh = dict(zip(missing.keys(), encoded))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        result = np.stack(vectors).astype(np.float32, copy=False)
+        if single:
+            result = result[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(result)
+        return result
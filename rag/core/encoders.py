@@ -0,0 +1,109 @@
+import logging
+from typing import List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+class Encoder:
+    """
+    SentenceTransformer-compatible encoder over a pluggable CPU backend.
+
+    Texts are sorted by token length and cut into batches under a token
+    budget (batch size x longest text in the batch), so short sentences go
+    through in large batches and long chunks in small ones, with little
+    padding in either.
+    """
+
+    def __init__(self, model, backend: str, max_batch_tokens: int = 8192, max_batch_size: int = 256):
+        self.model = model
+        self.backend = backend
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.tokenizer = model.tokenizer
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _token_lengths(self, texts: List[str]) -> np.ndarray:
+        input_ids = self.tokenizer(texts, truncation=True, max_length=self.model.max_seq_length,
+                                   return_attention_mask=False, return_token_type_ids=False)["input_ids"]
+        return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(texts))
+
+    def _batches(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Index batches over texts sorted longest first, each within the token budget"""
+        order = np.argsort(-lengths, kind="stable")
+        batches = []
+        start = 0
+        while start < len(order):
+            # The first text of a batch is its longest, so it sets the padded width
+            width = max(int(lengths[order[start]]), 1)
+            size = min(self.max_batch_size, max(1, self.max_batch_tokens // width))
+            batches.append(order[start:start + size])
+            start += size
+        return batches
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               convert_to_tensor: bool = False, normalize_embeddings: bool = False, **kwargs):
+        # batch_size is accepted for compatibility; the token budget sizes batches
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        kwargs.setdefault("show_progress_bar", False)
+
+        dim = self.get_sentence_embedding_dimension()
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        for batch in self._batches(self._token_lengths(texts)) if texts else []:
+            result[batch] = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                              convert_to_numpy=True,
+                                              normalize_embeddings=normalize_embeddings, **kwargs)
+
+        if single:
+            result = result[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(result)
+        return result
+
+
+def load_encoder(model_name: str, backend: str = "torch", max_batch_tokens: int = 8192,
+                 onnx_file: str = None) -> Encoder:
+    """
+    Load a sentence embedding model for CPU inference
+
+    Args:
+        model_name: SentenceTransformer model name or path
+        backend: "torch" (float32), "int8" (dynamically quantized Linear layers)
+            or "onnx" (ONNX Runtime, needs the onnxruntime package)
+        max_batch_tokens: Token budget per encoder batch
+        onnx_file: ONNX file inside the model repo, e.g. a pre-quantized
+            "onnx/model_qint8_avx512.onnx" (default: the float model)
+    Returns:
+        Encoder: Wrapped model
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The onnx embedding backend needs onnxruntime and sentence-transformers>=3.2: "
+                              "pip install -r requirements-onnx.txt") from e
+        model_kwargs = {"file_name": onnx_file} if onnx_file else None
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    else:
+        model = SentenceTransformer(model_name, device="cpu")
+        if backend == "int8":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    logger.info(f"Loaded {model_name} with the {backend} backend")
+    return Encoder(model, backend, max_batch_tokens=max_batch_tokens)
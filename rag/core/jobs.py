@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Persistent job queue backed by a local SQLite file. The web app enqueues
+    jobs and reads their status; a separate worker process claims and runs them.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    payload TEXT NOT NULL,
+                    data BLOB,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "data" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN data BLOB")
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the queue safe to share across threads
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], data: Optional[bytes] = None) -> int:
+        """
+        Add a job and return its id. Small binary inputs (e.g. an uploaded PDF)
+        can travel with the job as data instead of through a temp file.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, status, stage, payload, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, QUEUED, QUEUED, json.dumps(payload), data, now, now),
+            )
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically mark the oldest queued job as running and return it"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, "starting", time.time(), row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = self._to_dict(row)
+        job["status"], job["stage"] = RUNNING, "starting"
+        return job
+
+    def update_progress(self, job_id: int, stage: str, **progress) -> None:
+        """Record the current stage and its counters"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(progress), time.time(), job_id),
+            )
+
+    def complete(self, job_id: int, result: Optional[Dict[str, Any]] = None) -> None:
+        # The input data is no longer needed once the job has finished
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, result = ?, data = NULL, updated_at = ? WHERE id = ?",
+                (DONE, DONE, json.dumps(result or {}), time.time(), job_id),
+            )
+
+    def fail(self, job_id: int, error: str) -> None:
+        # Failed jobs are not retried, so their input data is dropped too
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, data = NULL, updated_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def heartbeat(self, job_id: int) -> None:
+        """Mark a running job as still alive; its worker calls this periodically"""
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def requeue_stale(self, stale_after: float) -> int:
+        """
+        Put running jobs back in the queue when nothing (heartbeat or progress)
+        has been recorded for them in stale_after seconds, i.e. their worker
+        died. Jobs of live workers are left alone.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, QUEUED, now, RUNNING, now - stale_after),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Return the job without its data, for status reads"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, stage, progress, payload, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """
+    Component created on first use, at most once even when several threads
+    ask for it at the same time. Attribute access and calls are forwarded to
+    the component, so a Lazy can stand in wherever the component is used.
+    A failed creation is retried on the next use.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> Any:
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self._loaded = True
+                logger.info(f"Initialized {self.name} in {self.load_seconds:.2f}s")
+        return self._value
+
+    def reset(self) -> None:
+        """Drop the component so the next use creates a new one"""
+        with self._lock:
+            self._value = None
+            self._loaded = False
+            self.load_seconds = None
+
+    def status(self) -> Dict[str, Any]:
+        return {"loaded": self._loaded, "load_seconds": self.load_seconds, "error": self.error}
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
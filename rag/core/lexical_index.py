@@ -0,0 +1,229 @@
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+# Words, clause numbers ("4.2.1"), amounts ("1,500.00") and ids ("B-12")
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,/-][a-z0-9]+)*")
+
+
+def tokenize(text: str, stopwords: Set[str] = frozenset()) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if re.fullmatch(r"[\d,.]+", token):
+            # "1,500" and "1500" are the same amount
+            token = token.replace(",", "")
+        if token not in stopwords:
+            tokens.append(token)
+    return tokens
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, single spaces, no currency signs or thousands separators"""
+    text = re.sub(r"(?<=\d),(?=\d{3})", "", text.lower().replace("$", ""))
+    return re.sub(r"\s+", " ", text)
+
+
+def exact_terms(query: str) -> List[str]:
+    """
+    Parts of a question that must appear verbatim in the answer chunk: quoted
+    phrases, and runs of words that contain a digit ("section 4.2" -> "4.2",
+    "$1,500", "B-12"). Capitalized words are not exact terms: "Tenant" may be
+    "Lessee" in the contract.
+    """
+    terms = [normalize_text(phrase).strip() for phrase in re.findall(r"\"([^\"]+)\"", query)]
+    unquoted = re.sub(r"\"[^\"]*\"", " ", query)
+    run: List[str] = []
+    for word in re.findall(r"\$?\w[\w.,/-]*", unquoted):
+        word = word.rstrip(".,")
+        if any(c.isdigit() for c in word):
+            run.append(word)
+        elif run:
+            terms.append(normalize_text(" ".join(run)))
+            run = []
+    if run:
+        terms.append(normalize_text(" ".join(run)))
+    return [term for term in terms if term]
+
+
+def contains_term(text: str, term: str) -> bool:
+    return re.search(rf"(?<!\w){re.escape(term)}(?!\w)", text) is not None
+
+
+class _Document:
+    """BM25 postings of one document, in the arrays they are stored as"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.version = path.stat().st_mtime_ns
+        with np.load(path) as stored:
+            self.terms = {term: i for i, term in enumerate(bytes(stored["terms"]).decode("utf-8").split("\n"))}
+            self.offsets = stored["offsets"]
+            self.postings = stored["postings"]
+            self.tfs = stored["tfs"].astype(np.float32)
+            self.lengths = stored["lengths"].astype(np.float32)
+            self.text = bytes(stored["text"]).decode("utf-8")
+            self.text_offsets = stored["text_offsets"]
+            self.title = bytes(stored["title"]).decode("utf-8")
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        self._normalized = None
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def chunk(self, i: int) -> str:
+        return self.text[self.text_offsets[i]:self.text_offsets[i + 1]]
+
+    def normalized(self, i: int) -> str:
+        if self._normalized is None:
+            self._normalized = [normalize_text(self.chunk(j)) for j in range(len(self))]
+        return self._normalized[i]
+
+
+class LexicalIndex:
+    """
+    Per-document BM25 index over the SemanticChunker chunks, built at ingest
+    and stored next to the other local indexes as one compressed .npz file per
+    document: the vocabulary, CSR postings (chunk, term frequency), chunk
+    lengths and the chunk texts.
+
+    Chunk positions match the vector ids ("<doc_id>#<position>"), so lexical
+    and vector results can be fused, and a lexical hit can be shown without
+    asking the vector store for its text.
+    """
+
+    def __init__(self, root_dir: Union[str, Path], stopwords: Iterable[str] = (), k1: float = 1.2,
+                 b: float = 0.75, max_loaded: int = 64):
+        self.root = Path(root_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stopwords = frozenset(stopwords)
+        self.k1 = k1
+        self.b = b
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[str, _Document]" = OrderedDict()
+
+    def _path(self, doc_id) -> Path:
+        safe = re.sub(r"[^\w.-]", "_", str(doc_id))
+        return self.root / f"{safe}.npz"
+
+    def add(self, doc_id, doc_title: str, chunks: Sequence[str]) -> None:
+        """Build (or replace) the index of one document from its chunks, in order"""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk, self.stopwords))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((i, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        flat = [posting for term in terms for posting in postings[term]]
+        text_offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        text_offsets[1:] = np.cumsum([len(chunk) for chunk in chunks])
+
+        path = self._path(doc_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                offsets=offsets,
+                postings=np.array([i for i, _ in flat], dtype=np.uint32),
+                tfs=np.array([min(tf, 65535) for _, tf in flat], dtype=np.uint16),
+                lengths=np.array(lengths, dtype=np.uint32),
+                text=np.frombuffer("".join(chunks).encode("utf-8"), dtype=np.uint8),
+                text_offsets=text_offsets,
+                title=np.frombuffer(str(doc_title).encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._loaded.pop(str(doc_id), None)
+
+    def copy(self, src_doc_id, dst_doc_id, dst_title: str) -> bool:
+        doc = self._document(src_doc_id)
+        if doc is None:
+            return False
+        self.add(dst_doc_id, dst_title, [doc.chunk(i) for i in range(len(doc))])
+        return True
+
+    def delete(self, doc_id) -> None:
+        self._path(doc_id).unlink(missing_ok=True)
+        with self._lock:
+            self._loaded.pop(str(doc_id), None)
+
+    def _document(self, doc_id) -> Optional[_Document]:
+        path = self._path(doc_id)
+        try:
+            version = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = str(doc_id)
+        with self._lock:
+            doc = self._loaded.get(key)
+            if doc is not None and doc.version == version:
+                self._loaded.move_to_end(key)
+                return doc
+        doc = _Document(path)
+        with self._lock:
+            self._loaded[key] = doc
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return doc
+
+    def scores(self, doc: _Document, query: str) -> np.ndarray:
+        scores = np.zeros(len(doc), dtype=np.float32)
+        n = len(doc)
+        for term in set(tokenize(query, self.stopwords)):
+            t = doc.terms.get(term)
+            if t is None:
+                continue
+            start, end = doc.offsets[t], doc.offsets[t + 1]
+            chunks, tfs = doc.postings[start:end], doc.tfs[start:end]
+            df = end - start
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc.lengths[chunks] / max(doc.avg_length, 1e-6))
+            scores[chunks] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def search(self, doc_id, query: str, top_k: int = 3) -> Tuple[List[Tuple[int, float]], List[int]]:
+        """
+        BM25 search within one document
+
+        Args:
+            doc_id: Contract id
+            query: User question
+            top_k: Number of chunks to return
+        Returns:
+            tuple: ([(chunk position, score), ...] best first, exact). exact
+                lists, best first, every chunk that contains all the exact
+                terms of the question (see exact_terms); empty when it names none.
+        """
+        doc = self._document(doc_id)
+        if doc is None or not len(doc):
+            return [], []
+        scores = self.scores(doc, query)
+        ranked = [int(i) for i in np.argsort(-scores, kind="stable") if scores[i] > 0]
+
+        exact = []
+        terms = exact_terms(query)
+        if terms:
+            exact = [i for i in ranked if all(contains_term(doc.normalized(i), term) for term in terms)]
+        return [(i, float(scores[i])) for i in ranked[:top_k]], exact
+
+    def chunk(self, doc_id, i: int) -> Optional[str]:
+        doc = self._document(doc_id)
+        if doc is None or not 0 <= i < len(doc):
+            return None
+        return doc.chunk(i)
+
+    def title(self, doc_id) -> Optional[str]:
+        doc = self._document(doc_id)
+        return doc.title if doc is not None else None
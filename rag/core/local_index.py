@@ -0,0 +1,358 @@
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+Vector = Tuple[str, Sequence[float], Dict[str, Any]]
+
+
+class FetchResponse:
+    """Mirrors the Pinecone fetch response: .vectors maps id -> {"id", "values", "metadata"}"""
+
+    def __init__(self, vectors: Dict[str, Dict[str, Any]]):
+        self.vectors = vectors
+
+
+class _Snapshot:
+    """One consistent, immutable view of a document: ids, metadata and matrix always of the same length"""
+
+    def __init__(self, version, ids: List[str], metadata: List[Dict[str, Any]], matrix: np.ndarray,
+                 norms: Optional[np.ndarray] = None):
+        self.version = version
+        self.ids = ids
+        self.metadata = metadata
+        self.rows = {vector_id: row for row, vector_id in enumerate(ids)}
+        self.matrix = matrix
+        if norms is None:
+            norms = np.linalg.norm(matrix, axis=1) if len(ids) else np.zeros(0, dtype=np.float32)
+        self.norms = norms
+
+
+class _Document:
+    """
+    One document's vectors on disk: a float32 matrix (vectors.<generation>.f32)
+    and one JSON line of id and metadata per row (metadata.<generation>.jsonl).
+    state.json names the current generation, its row count and metadata
+    length, and is replaced atomically after the data files are written, so
+    a reader only ever sees committed rows of one generation. New ids are
+    appended to the current generation's files; overwrites and deletes write
+    the next generation.
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot(None, [], [], np.zeros((0, dim), dtype=np.float32))
+
+    def _read_state(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self.path / "state.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load(self, state: Dict[str, int], current: _Snapshot) -> _Snapshot:
+        generation, rows, metadata_bytes = state["generation"], state["rows"], state["metadata_bytes"]
+        # Rows appended to the generation already loaded: read only the new metadata lines
+        start = current.version[2] if current.version and current.version[0] == generation \
+            and current.version[1] <= rows else 0
+        with open(self.path / f"metadata.{generation}.jsonl", "rb") as f:
+            f.seek(start)
+            entries = [json.loads(line) for line in f.read(metadata_bytes - start).splitlines()]
+        ids = [entry["id"] for entry in entries]
+        metadata = [entry["metadata"] for entry in entries]
+        if start:
+            ids = current.ids + ids
+            metadata = current.metadata + metadata
+        matrix = (np.memmap(self.path / f"vectors.{generation}.f32", dtype=np.float32, mode="r", shape=(rows, self.dim))
+                  if rows else np.zeros((0, self.dim), dtype=np.float32))
+        norms = np.concatenate([current.norms, np.linalg.norm(matrix[len(current.ids):], axis=1)]) if start else None
+        return _Snapshot((generation, rows, metadata_bytes), ids, metadata, matrix, norms)
+
+    def snapshot(self) -> _Snapshot:
+        """The current view, reloaded first if another process (or thread) has committed a write since"""
+        for _ in range(5):
+            state = self._read_state()
+            version = (state["generation"], state["rows"], state["metadata_bytes"]) if state else None
+            current = self._snapshot
+            if version == current.version:
+                return current
+            if state is None:
+                loaded = _Snapshot(None, [], [], np.zeros((0, self.dim), dtype=np.float32))
+            else:
+                try:
+                    loaded = self._load(state, current)
+                except FileNotFoundError:
+                    # A writer replaced the generation between reading state.json and its files
+                    continue
+            with self._lock:
+                self._snapshot = loaded
+            return loaded
+        raise RuntimeError(f"Could not read a consistent version of {self.path}")
+
+    def close(self) -> None:
+        """
+        Drop the loaded snapshot. Its memory map (and the file descriptor
+        behind it) is released once no in-flight query still holds it.
+        """
+        with self._lock:
+            self._snapshot = _Snapshot(None, [], [], np.zeros((0, self.dim), dtype=np.float32))
+
+    def _commit(self, generation: int, rows: int, metadata_bytes: int) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"generation": generation, "rows": rows, "metadata_bytes": metadata_bytes}, f)
+        os.replace(tmp_path, self.path / "state.json")
+
+    @staticmethod
+    def _lines(ids: Sequence[str], metadata: Sequence[Dict[str, Any]]) -> bytes:
+        return b"".join(json.dumps({"id": vector_id, "metadata": m}).encode("utf-8") + b"\n"
+                        for vector_id, m in zip(ids, metadata))
+
+    def append(self, ids: List[str], values: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        """Add rows for new ids to the current generation. Caller holds the document's file lock."""
+        state = self._read_state()
+        if state is None:
+            self.rewrite(ids, values, metadata)
+            return
+        generation = state["generation"]
+        vectors_path = self.path / f"vectors.{generation}.f32"
+        metadata_path = self.path / f"metadata.{generation}.jsonl"
+        lines = self._lines(ids, metadata)
+        # Drop anything a writer that died before committing left past the committed rows
+        with open(vectors_path, "r+b") as f:
+            f.truncate(state["rows"] * self.dim * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+        with open(metadata_path, "r+b") as f:
+            f.truncate(state["metadata_bytes"])
+            f.seek(0, os.SEEK_END)
+            f.write(lines)
+        self._commit(generation, state["rows"] + len(ids), state["metadata_bytes"] + len(lines))
+        self.snapshot()
+
+    def rewrite(self, ids: List[str], matrix: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        """Write all rows as the next generation. Caller holds the document's file lock."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        state = self._read_state()
+        previous = state["generation"] if state else 0
+        generation = previous + 1
+        lines = self._lines(ids, metadata)
+        with open(self.path / f"vectors.{generation}.f32", "wb") as f:
+            f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+        with open(self.path / f"metadata.{generation}.jsonl", "wb") as f:
+            f.write(lines)
+        self._commit(generation, len(ids), len(lines))
+        # Readers may still be loading the previous generation; anything older is unreachable.
+        # Memory-mapped files stay readable after they are unlinked.
+        for stale in self.path.glob("*.*"):
+            parts = stale.name.split(".")
+            if len(parts) == 3 and parts[0] in ("vectors", "metadata") and parts[1].isdigit() \
+                    and int(parts[1]) < previous:
+                stale.unlink(missing_ok=True)
+        self.snapshot()
+
+
+class LocalIndex:
+    """
+    Embedded vector index with the query/fetch/upsert/delete surface of a
+    Pinecone index, for deployments where every query is filtered to one
+    document. Each document is stored in its own directory as a contiguous
+    float32 matrix on a memory-mapped file plus a JSON-lines file of ids and
+    metadata (see _Document), and queries are an exact matrix-vector product
+    over one consistent snapshot of that document's rows. Writes take a
+    per-document file lock, so the web workers and the ingestion worker can
+    share one directory. At most max_open_documents documents stay loaded
+    (each holds a memory map and its file descriptor); the least recently
+    used one is closed to make room.
+    """
+
+    def __init__(self, root_dir: Union[str, Path], dim: int = 384,
+                 metric: str = "cosine", max_open_documents: int = 256):
+        if metric not in ("cosine", "dotproduct", "euclidean"):
+            raise ValueError(f"Unknown metric: {metric}")
+        self.root = Path(root_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.metric = metric
+        self.max_open_documents = max(1, max_open_documents)
+        self._lock = threading.Lock()
+        self._docs: "OrderedDict[str, _Document]" = OrderedDict()
+
+    @staticmethod
+    def _doc_key(vector_id: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        if metadata and "doc_id" in metadata:
+            return str(metadata["doc_id"])
+        # Chunk ids are "<doc_id>#<position>"
+        return vector_id.rsplit("#", 1)[0]
+
+    def _doc(self, doc_key: str) -> _Document:
+        evicted = []
+        with self._lock:
+            doc = self._docs.get(doc_key)
+            if doc is None:
+                safe = re.sub(r"[^\w.-]", "_", doc_key)
+                doc = self._docs[doc_key] = _Document(self.root / safe, self.dim)
+                while len(self._docs) > self.max_open_documents:
+                    evicted.append(self._docs.popitem(last=False)[1])
+            else:
+                self._docs.move_to_end(doc_key)
+        # Callers still using an evicted document keep a working handle; it
+        # is reloaded from disk if the document is opened again
+        for stale in evicted:
+            stale.close()
+        return doc
+
+    @contextmanager
+    def _locked(self, doc_key: str):
+        doc = self._doc(doc_key)
+        doc.path.mkdir(parents=True, exist_ok=True)
+        with open(doc.path / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield doc, doc.snapshot()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def upsert(self, vectors: Iterable[Union[Vector, Dict[str, Any]]], **kwargs) -> Dict[str, int]:
+        by_doc: Dict[str, Dict[str, Vector]] = {}
+        count = 0
+        for vector in vectors:
+            if isinstance(vector, dict):
+                vector = (vector["id"], vector["values"], vector.get("metadata") or {})
+            vector_id, values, metadata = vector
+            # The last write of an id within a batch wins
+            by_doc.setdefault(self._doc_key(vector_id, metadata), {})[vector_id] = (vector_id, values, metadata or {})
+            count += 1
+
+        for doc_key, doc_vectors in by_doc.items():
+            new_values = np.asarray([values for _, values, _ in doc_vectors.values()], dtype=np.float32)
+            if new_values.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {new_values.shape[1]} does not match index dimension {self.dim}")
+            with self._locked(doc_key) as (doc, snap):
+                ids = list(doc_vectors)
+                metadata = [vector_metadata for _, _, vector_metadata in doc_vectors.values()]
+                if not any(vector_id in snap.rows for vector_id in ids):
+                    # Ingestion: only new chunks, appended without rewriting the document
+                    doc.append(ids, new_values, metadata)
+                    continue
+                all_ids = list(snap.ids)
+                all_metadata = list(snap.metadata)
+                matrix = np.array(snap.matrix, dtype=np.float32)
+                appended = []
+                for (vector_id, vector_metadata), values in zip(zip(ids, metadata), new_values):
+                    row = snap.rows.get(vector_id)
+                    if row is None:
+                        all_ids.append(vector_id)
+                        all_metadata.append(vector_metadata)
+                        appended.append(values)
+                    else:
+                        matrix[row] = values
+                        all_metadata[row] = vector_metadata
+                if appended:
+                    matrix = np.vstack([matrix, np.asarray(appended, dtype=np.float32)])
+                doc.rewrite(all_ids, matrix, all_metadata)
+        return {"upserted_count": count}
+
+    def delete(self, ids: Sequence[str] = (), **kwargs) -> Dict:
+        by_doc: Dict[str, set] = {}
+        for vector_id in ids:
+            by_doc.setdefault(self._doc_key(vector_id), set()).add(vector_id)
+
+        for doc_key, doc_ids in by_doc.items():
+            with self._locked(doc_key) as (doc, snap):
+                keep = [row for row, vector_id in enumerate(snap.ids) if vector_id not in doc_ids]
+                if len(keep) == len(snap.ids):
+                    continue
+                doc.rewrite([snap.ids[row] for row in keep], np.asarray(snap.matrix)[keep],
+                            [snap.metadata[row] for row in keep])
+        return {}
+
+    def fetch(self, ids: Sequence[str], **kwargs) -> FetchResponse:
+        vectors = {}
+        snapshots: Dict[str, _Snapshot] = {}
+        for vector_id in ids:
+            doc_key = self._doc_key(vector_id)
+            if doc_key not in snapshots:
+                snapshots[doc_key] = self._doc(doc_key).snapshot()
+            snap = snapshots[doc_key]
+            row = snap.rows.get(vector_id)
+            if row is not None:
+                vectors[vector_id] = {"id": vector_id, "values": snap.matrix[row].tolist(),
+                                      "metadata": dict(snap.metadata[row])}
+        return FetchResponse(vectors)
+
+    @staticmethod
+    def _matches_filter(metadata: Dict[str, Any], conditions: Dict[str, Any]) -> bool:
+        for field, condition in conditions.items():
+            value = metadata.get(field)
+            if isinstance(condition, dict):
+                for op, expected in condition.items():
+                    if op == "$eq" and value != expected:
+                        return False
+                    if op == "$ne" and value == expected:
+                        return False
+                    if op == "$in" and value not in expected:
+                        return False
+                    if op == "$nin" and value in expected:
+                        return False
+            elif value != condition:
+                return False
+        return True
+
+    def _doc_keys(self, filter: Optional[Dict[str, Any]]) -> List[str]:
+        condition = (filter or {}).get("doc_id")
+        if isinstance(condition, dict) and "$eq" in condition:
+            return [str(condition["$eq"])]
+        if isinstance(condition, dict) and "$in" in condition:
+            return [str(doc_id) for doc_id in condition["$in"]]
+        if condition is not None and not isinstance(condition, dict):
+            return [str(condition)]
+        # No document filter: search every document
+        return [path.name for path in self.root.iterdir() if path.is_dir()]
+
+    def query(self, vector: Sequence[float], top_k: int = 10, include_metadata: bool = False,
+              include_values: bool = False, filter: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        q = np.asarray(vector, dtype=np.float32)
+        candidates = []
+        for doc_key in self._doc_keys(filter):
+            snap = self._doc(doc_key).snapshot()
+            if not snap.ids:
+                continue
+            matrix = np.asarray(snap.matrix)
+            if self.metric == "euclidean":
+                scores = -np.linalg.norm(matrix - q, axis=1)
+            else:
+                scores = matrix @ q
+                if self.metric == "cosine":
+                    scores = scores / np.maximum(snap.norms * np.linalg.norm(q), 1e-12)
+            rows = np.arange(len(snap.ids))
+            if filter and set(filter) - {"doc_id"}:
+                rest = {field: condition for field, condition in filter.items() if field != "doc_id"}
+                keep = [row for row in rows if self._matches_filter(snap.metadata[row], rest)]
+                rows, scores = rows[keep], scores[keep]
+            k = min(top_k, len(rows))
+            if k == 0:
+                continue
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates.extend((float(scores[i]), snap, int(rows[i])) for i in top)
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        matches = []
+        for score, snap, row in candidates[:top_k]:
+            match = {"id": snap.ids[row], "score": score}
+            if include_metadata:
+                match["metadata"] = dict(snap.metadata[row])
+            if include_values:
+                match["values"] = snap.matrix[row].tolist()
+            matches.append(match)
+        return {"matches": matches}
@@ -1,24 +1,50 @@
-from typing import List
+import hashlib
+from typing import Dict, List, Optional
+
+
+def content_hash(content: str) -> str:
+    """Hash identifying a chunk's text, used to diff revisions of a document"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
 
 class BuildMetaData:
-    def __init__(self):
-        pass
+    def __init__(self, context_chars: int = 0):
+        """
+        Args:
+            context_chars: When set, each chunk also stores the last / first
+                context_chars characters of its neighbours, so retrieval can
+                show neighbour context without fetching the neighbours.
+        """
+        self.context_chars = context_chars
+
+    def build_chunk(self, content: str, i: int, doc_id: int, doc_title: str, lease_type: str, is_last: bool,
+                    prev_content: Optional[str] = None, next_content: Optional[str] = None) -> Dict:
+        prechunk_id = "" if i == 0 else f"{doc_id}#{i-1}"
+        postchunk_id = "" if is_last else f"{doc_id}#{i+1}"
+
+        metadata = {
+            "doc_id" : f"{doc_id}",
+            "id" : f"{doc_id}#{i}",
+            "title" : doc_title,
+            "lease_type" : lease_type,
+            "content" : content,
+            "content_hash" : content_hash(content),
+            "prechunk_id" : prechunk_id,
+            "postchunk_id" : postchunk_id
+        }
+        if self.context_chars:
+            metadata["prechunk_context"] = prev_content[-self.context_chars:] if prev_content else ""
+            metadata["postchunk_context"] = next_content[:self.context_chars] if next_content else ""
+        return metadata
 
     def build(self, chunks: List, doc_id: int, doc_title: str, lease_type: str):
         metadata = []
 
         for i, content in enumerate(chunks):
-            prechunk_id = "" if i == 0 else f"{doc_id}#{i-1}"
-            postchunk_id = "" if i + 1 == len(chunks) else f"{doc_id}#{i+1}"
-
-            metadata.append({
-                "doc_id" : f"{doc_id}",
-                "id" : f"{doc_id}#{i}",
-                "title" : doc_title,
-                "lease_type" : lease_type,
-                "content" : content,
-                "prechunk_id" : prechunk_id,
-                "postchunk_id" : postchunk_id
-            })
-
-        return metadata
\ No newline at end of file
+            metadata.append(
+                self.build_chunk(content, i, doc_id, doc_title, lease_type, is_last=i + 1 == len(chunks),
+                                 prev_content=chunks[i - 1] if i > 0 else None,
+                                 next_content=chunks[i + 1] if i + 1 < len(chunks) else None)
+            )
+
+        return metadata
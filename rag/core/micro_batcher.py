@@ -0,0 +1,153 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("texts", "options", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str], options: Dict[str, Any]):
+        self.texts = texts
+        # encode() keyword arguments; only requests with equal options share a batch
+        self.options = options
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchingEncoder:
+    """
+    Encoder wrapper that coalesces concurrent encode() calls into shared
+    batches. Callers block while a background thread collects requests for
+    up to max_wait_ms after the first one arrives, or until max_batch_size
+    texts are waiting, encodes them in one call and hands each caller its
+    slice of the result. Requests are only batched with others passing the
+    same encode options (normalize_embeddings and any other keyword
+    arguments, which are handed to the wrapped encoder).
+    """
+
+    def __init__(self, encoder, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._lock = threading.Lock()
+        self._pid = None
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.encoder, name)
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive fork, so a forked worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._held = deque()
+            thread = threading.Thread(target=self._run, daemon=True, name="encode-batcher")
+            thread.start()
+            self._pid = os.getpid()
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               convert_to_tensor: bool = False, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        # batch_size is the batcher's to choose; everything else is passed on
+        options = dict(kwargs, normalize_embeddings=normalize_embeddings)
+        if not texts:
+            return self.encoder.encode(texts, convert_to_numpy=True, **options)
+
+        self._ensure_started()
+        request = _Request(texts, options)
+        self._queue.put(request)
+        result = request.future.result()
+
+        if single:
+            result = result[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(result)
+        return result
+
+    def _collect(self) -> List[_Request]:
+        """Block for the next request, then gather compatible ones until the batch is full or the wait is up"""
+        first = self._held.popleft() if self._held else self._queue.get()
+        batch = [first]
+        size = len(first.texts)
+        # Requests deferred from earlier batches have waited longest
+        for request in list(self._held):
+            if request.options == first.options and size + len(request.texts) <= self.max_batch_size:
+                self._held.remove(request)
+                batch.append(request)
+                size += len(request.texts)
+
+        deadline = first.enqueued_at + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if request.options != first.options:
+                self._held.append(request)
+                continue
+            if size + len(request.texts) > self.max_batch_size:
+                # Starts the next batch instead
+                self._held.append(request)
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                embeddings = np.asarray(self.encoder.encode(texts, convert_to_numpy=True, **batch[0].options))
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(embeddings[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+            delays = [started - request.enqueued_at for request in batch]
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += len(texts)
+                self.queue_delay_total += sum(delays)
+                self.queue_delay_max = max(self.queue_delay_max, max(delays))
+
+    def stats(self) -> Dict[str, float]:
+        """Batch fill rate and queueing delay since startup"""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "fill_rate": self.texts / (self.batches * self.max_batch_size) if self.batches else 0.0,
+                "queue_delay_ms_avg": 1000 * self.queue_delay_total / self.requests if self.requests else 0.0,
+                "queue_delay_ms_max": 1000 * self.queue_delay_max,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": 1000 * self.max_wait,
+            }
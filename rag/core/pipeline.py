@@ -0,0 +1,177 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .metadata import BuildMetaData
+from .upserter import MAX_REQUEST_BYTES, ParallelUpserter
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def threaded(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Run an iterable in a background thread and hand its items over a bounded
+    queue, so the producer runs ahead of the consumer by at most maxsize items.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Unblocks the producer if the consumer stops early
+        stop.set()
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: page texts -> SemanticChunker -> batched encoding ->
+    vector upserts. Each stage runs in its own thread with a bounded queue in
+    between, so embedding and upserting overlap with extraction and memory
+    stays flat as documents get longer. Upserts are sized by payload bytes
+    and sent upsert_workers at a time.
+
+    With reuse_chunk_embeddings the chunker hands back chunk embeddings along
+    with the chunks, and the encoding stage only builds metadata. With a
+    lexical_index, the document's BM25 index is built from the same chunks
+    once all of them are upserted.
+    """
+
+    def __init__(self, chunker, encoder, index, metadata_builder: Optional[BuildMetaData] = None,
+                 encode_batch_size: int = 32, upsert_workers: int = 4, upsert_batch_bytes: int = MAX_REQUEST_BYTES // 2,
+                 queue_size: int = 4, reuse_chunk_embeddings: bool = True, lexical_index=None):
+        self.chunker = chunker
+        self.encoder = encoder
+        self.index = index
+        self.lexical_index = lexical_index
+        self.reuse_chunk_embeddings = reuse_chunk_embeddings
+        self.metadata_builder = metadata_builder or BuildMetaData()
+        self.encode_batch_size = encode_batch_size
+        self.upsert_workers = upsert_workers
+        self.upsert_batch_bytes = upsert_batch_bytes
+        self.queue_size = queue_size
+        # Chunks handed to the upserter by the current run, so a failed run
+        # knows which ids (<doc_id>#0 .. #n-1) it may have written
+        self.chunks_submitted = 0
+
+    def _numbered_chunks(self, chunks: Iterable) -> Iterator[Tuple[int, Any, Any, Any]]:
+        """
+        Yield (position, previous chunk, chunk, next chunk), looking one chunk
+        ahead; the neighbours are None at either end of the document
+        """
+        before = None
+        current = None
+        i = 0
+        for chunk in chunks:
+            if current is not None:
+                yield i, before, current, chunk
+                before = current
+                i += 1
+            current = chunk
+        if current is not None:
+            yield i, before, current, None
+
+    def _text(self, chunk) -> Optional[str]:
+        if chunk is None or not self.reuse_chunk_embeddings:
+            return chunk
+        return chunk[0]
+
+    def _encode(self, chunks: Iterable[Tuple[int, Any, Any, Any]], doc_id, doc_title: str,
+                lease_type: str) -> Iterator[List[Tuple[str, List[float], dict]]]:
+        """Encode chunks in batches (unless the chunker already did) and pair them with their metadata"""
+        batch = []
+        chunk_embeds = []
+        for i, before, chunk, after in chunks:
+            is_last = after is None
+            if self.reuse_chunk_embeddings:
+                chunk, embed = chunk
+                chunk_embeds.append(embed)
+            batch.append(
+                self.metadata_builder.build_chunk(chunk, i, doc_id, doc_title, lease_type, is_last=is_last,
+                                                  prev_content=self._text(before), next_content=self._text(after))
+            )
+            if len(batch) >= self.encode_batch_size or is_last:
+                embeds = chunk_embeds if self.reuse_chunk_embeddings else self.encoder.encode([m["content"] for m in batch])
+                yield [(m["id"], embed.tolist(), m) for m, embed in zip(batch, embeds)]
+                batch = []
+                chunk_embeds = []
+
+    def run(self, pages: Iterable[str], doc_id, doc_title: str, lease_type: str = "lease",
+            progress: Optional[Callable[..., None]] = None) -> int:
+        """
+        Ingest a document streamed as page texts
+
+        Args:
+            pages: Page texts in document order
+            doc_id: Contract id used for vector ids and filtering
+            doc_title: Contract title stored in the metadata
+            lease_type: Lease type stored in the metadata
+            progress: Optional callback, called as progress("indexing", submitted=n)
+                before every batch is handed to the upserter and as
+                progress("indexing", chunks=n) after every upsert request
+        Returns:
+            int: Number of chunks upserted
+        """
+        pages = threaded(pages, self.queue_size)
+        chunk_stream = self.chunker.chunk_stream(pages, return_embeddings=self.reuse_chunk_embeddings)
+        chunks = threaded(self._numbered_chunks(chunk_stream), self.queue_size)
+        encoded = threaded(self._encode(chunks, doc_id, doc_title, lease_type), self.queue_size)
+
+        count = 0
+        self.chunks_submitted = 0
+        texts: List[str] = []
+        upserter = ParallelUpserter(self.index, max_workers=self.upsert_workers, max_batch_bytes=self.upsert_batch_bytes,
+                                    on_upserted=(lambda n: progress("indexing", chunks=n)) if progress else None)
+        try:
+            for vectors in encoded:
+                self.chunks_submitted += len(vectors)
+                if progress:
+                    # Recorded first, so a crash leaves a bound on the ids written
+                    progress("indexing", submitted=self.chunks_submitted)
+                upserter.add(vectors)
+                if self.lexical_index is not None:
+                    texts.extend(m["content"] for _, _, m in vectors)
+                count += len(vectors)
+            upserter.flush()
+        finally:
+            upserter.close()
+        if self.lexical_index is not None:
+            self.lexical_index.add(doc_id, doc_title, texts)
+
+        logger.info(f"Ingested {count} chunks for doc {doc_id}")
+        return count
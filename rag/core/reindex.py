@@ -0,0 +1,116 @@
+import difflib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .metadata import BuildMetaData, content_hash
+from .upserter import MAX_REQUEST_BYTES, ParallelUpserter
+from .vector_store import fetch_document_vectors
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalReindexer:
+    """
+    Re-index a revised contract in place, under its existing doc_id.
+
+    The new chunk list is aligned with the stored one by content hash. Only
+    chunks whose text is new get embedded; unchanged chunks that moved to a
+    different position are re-upserted under their new id with their stored
+    vector, chunks whose neighbour links changed get their metadata
+    rewritten, and ids past the new end are deleted. The lexical index, if
+    given, is rebuilt from the new chunks (it is cheap next to embedding).
+    """
+
+    def __init__(self, chunker, encoder, index, metadata_builder: Optional[BuildMetaData] = None,
+                 upsert_workers: int = 4, upsert_batch_bytes: int = MAX_REQUEST_BYTES // 2,
+                 reuse_chunk_embeddings: bool = True, lexical_index=None):
+        self.chunker = chunker
+        self.encoder = encoder
+        self.index = index
+        self.lexical_index = lexical_index
+        self.metadata_builder = metadata_builder or BuildMetaData()
+        self.upsert_workers = upsert_workers
+        self.upsert_batch_bytes = upsert_batch_bytes
+        self.reuse_chunk_embeddings = reuse_chunk_embeddings
+
+    @staticmethod
+    def _align(old_hashes: List[str], new_hashes: List[str]) -> Dict[int, int]:
+        """Map each new chunk position to the old position holding the same text"""
+        matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+        source = {}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for k in range(i2 - i1):
+                    source[j1 + k] = i1 + k
+        return source
+
+    def run(self, pages: Iterable[str], doc_id, doc_title: str, lease_type: str = "lease",
+            progress: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+        """
+        Re-index a document from the page texts of its new revision
+
+        Args:
+            pages: Page texts of the new revision, in document order
+            doc_id: Contract id whose vectors are updated
+            doc_title: Contract title stored in the metadata
+            lease_type: Lease type stored in the metadata
+            progress: Optional callback, called as progress(stage, **counts)
+        Returns:
+            dict: Counts of chunks embedded, re-linked or moved, unchanged and deleted
+        """
+        if self.reuse_chunk_embeddings:
+            chunked = list(self.chunker.chunk_stream(pages, return_embeddings=True))
+            chunks = [chunk for chunk, _ in chunked]
+            chunk_embeds = [embed for _, embed in chunked]
+        else:
+            chunks = list(self.chunker.chunk_stream(pages))
+            chunk_embeds = None
+        metadata = self.metadata_builder.build(chunks=chunks, doc_id=doc_id, doc_title=doc_title,
+                                               lease_type=lease_type)
+
+        if progress:
+            progress("diffing", chunks=len(chunks))
+        stored = list(fetch_document_vectors(self.index, doc_id))
+        # Vectors ingested before content hashes were stored are hashed here
+        old_hashes = [m.get("content_hash") or content_hash(m["content"]) for _, _, m in stored]
+        source = self._align(old_hashes, [m["content_hash"] for m in metadata])
+
+        changed = [j for j in range(len(chunks)) if j not in source]
+        if chunk_embeds is not None:
+            embeds = {j: chunk_embeds[j] for j in changed}
+        else:
+            embeds = dict(zip(changed, self.encoder.encode([chunks[j] for j in changed]))) if changed else {}
+
+        vectors = []
+        unchanged = 0
+        for j, m in enumerate(metadata):
+            i = source.get(j)
+            if i is None:
+                vectors.append((m["id"], embeds[j].tolist(), m))
+            elif i != j or stored[i][2] != m:
+                # Same text, but a new position or new neighbour links
+                vectors.append((m["id"], stored[i][1], m))
+            else:
+                unchanged += 1
+
+        with ParallelUpserter(self.index, max_workers=self.upsert_workers, max_batch_bytes=self.upsert_batch_bytes,
+                              on_upserted=(lambda n: progress("indexing", chunks=n)) if progress else None) as upserter:
+            upserter.add(vectors)
+            upserter.flush()
+
+        # Delete only after the upserts, so the document stays queryable throughout
+        stale = [f"{doc_id}#{k}" for k in range(len(metadata), len(stored))]
+        for start in range(0, len(stale), 1000):
+            self.index.delete(ids=stale[start:start + 1000])
+        if self.lexical_index is not None:
+            self.lexical_index.add(doc_id, doc_title, chunks)
+
+        counts = {
+            "chunks": len(metadata),
+            "embedded": len(changed),
+            "rewritten": len(vectors) - len(changed),
+            "unchanged": unchanged,
+            "deleted": len(stale),
+        }
+        logger.info(f"Re-indexed doc {doc_id}: {counts}")
+        return counts
@@ -0,0 +1,120 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Case, spacing and trailing punctuation don't change what is retrieved"""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip("?!. ")
+
+
+class RetrievalCache:
+    """
+    Bounded TTL/LRU cache of retrieved chunks per (doc_id, normalized query),
+    plus an LRU of query embeddings shared across documents.
+
+    Entries are tagged with the document's version, kept in a small SQLite
+    file shared by every process on the host. Re-indexing a document (in the
+    worker) bumps its version, which makes the web workers' entries for it
+    stale without any messaging between processes.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 1024, ttl_seconds: float = 600,
+                 max_embeddings: int = 2048):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_embeddings = max_embeddings
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[Tuple[str, str], Tuple[float, int, List[str]]]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stale": 0, "evicted": 0,
+                       "embedding_hits": 0, "embedding_misses": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS doc_versions (doc_id TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def version(self, doc_id) -> int:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT version FROM doc_versions WHERE doc_id = ?", (str(doc_id),)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, doc_id) -> None:
+        """Drop every cached result for a document, in this and every other process"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO doc_versions (doc_id, version) VALUES (?, 1) "
+                "ON CONFLICT(doc_id) DO UPDATE SET version = version + 1",
+                (str(doc_id),),
+            )
+        with self._lock:
+            for key in [key for key in self._results if key[0] == str(doc_id)]:
+                del self._results[key]
+
+    def get(self, doc_id, query: str, version: int) -> Optional[List[str]]:
+        key = (str(doc_id), normalize_query(query))
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, entry_version, chunks = entry
+            if entry_version != version or expires_at < time.monotonic():
+                del self._results[key]
+                self._stats["stale" if entry_version != version else "expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._results.move_to_end(key)
+            self._stats["hits"] += 1
+            return list(chunks)
+
+    def put(self, doc_id, query: str, version: int, chunks: List[str]) -> None:
+        key = (str(doc_id), normalize_query(query))
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl_seconds, version, list(chunks))
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def get_embedding(self, query: str) -> Optional[np.ndarray]:
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._embeddings.get(key)
+            if vector is None:
+                self._stats["embedding_misses"] += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self._stats["embedding_hits"] += 1
+            return vector
+
+    def put_embedding(self, query: str, vector: np.ndarray) -> None:
+        key = normalize_query(query)
+        with self._lock:
+            self._embeddings[key] = vector
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._results)
+            stats["embeddings"] = len(self._embeddings)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        embedding_lookups = stats["embedding_hits"] + stats["embedding_misses"]
+        stats["embedding_hit_rate"] = stats["embedding_hits"] / embedding_lookups if embedding_lookups else 0.0
+        return stats
@@ -0,0 +1,125 @@
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Vector = Tuple[str, Sequence[float], dict]
+
+# Pinecone rejects upsert requests over 2 MB or 1,000 vectors; stay under both
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_REQUEST_VECTORS = 1000
+
+
+def vector_bytes(vector: Vector) -> int:
+    """Approximate size of a vector in an upsert request body"""
+    vector_id, values, metadata = vector
+    # Floats serialize to ~20 characters each; ids and metadata as JSON
+    return len(vector_id) + 20 * len(values) + len(json.dumps(metadata, ensure_ascii=False)) + 32
+
+
+def payload_batches(vectors: Iterable[Vector], max_bytes: int = MAX_REQUEST_BYTES // 2,
+                    max_count: int = MAX_REQUEST_VECTORS) -> Iterator[List[Vector]]:
+    """
+    Split vectors into upsert batches by estimated request size rather than a
+    fixed count, so batches of short chunks are large and batches of long
+    chunks still fit in one request
+    """
+    batch: List[Vector] = []
+    size = 0
+    for vector in vectors:
+        nbytes = vector_bytes(vector)
+        if batch and (size + nbytes > max_bytes or len(batch) >= max_count):
+            yield batch
+            batch, size = [], 0
+        batch.append(vector)
+        size += nbytes
+    if batch:
+        yield batch
+
+
+class ParallelUpserter:
+    """
+    Upserts vectors in payload-sized batches on a thread pool, with at most
+    max_pending batches in flight so memory stays bounded. Retries of
+    transient errors are the index handle's job (see RetryingIndex); a batch
+    that still fails is re-raised from the next add() or from flush().
+    """
+
+    def __init__(self, index, max_workers: int = 4, max_batch_bytes: int = MAX_REQUEST_BYTES // 2,
+                 max_batch_count: int = MAX_REQUEST_VECTORS, max_pending: Optional[int] = None,
+                 on_upserted=None):
+        self.index = index
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_count = max_batch_count
+        self.on_upserted = on_upserted
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upsert")
+        self._slots = threading.BoundedSemaphore(max_pending or max_workers * 2)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._buffer: List[Vector] = []
+        self._buffer_bytes = 0
+        self._error: Optional[BaseException] = None
+        self.upserted = 0
+        self.requests = 0
+
+    def _done(self, future: Future, count: int) -> None:
+        self._slots.release()
+        error = future.exception()
+        with self._lock:
+            if error is not None:
+                self._error = self._error or error
+                return
+            self.upserted += count
+            self.requests += 1
+            # Under the lock, so reported counts never go backwards
+            if self.on_upserted:
+                self.on_upserted(self.upserted)
+
+    def _raise_error(self) -> None:
+        with self._lock:
+            error = self._error
+        if error is not None:
+            raise error
+
+    def _submit(self, batch: List[Vector]) -> None:
+        self._raise_error()
+        self._slots.acquire()
+        future = self._pool.submit(self.index.upsert, vectors=batch)
+        future.add_done_callback(lambda f, count=len(batch): self._done(f, count))
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()] + [future]
+
+    def add(self, vectors: Iterable[Vector]) -> None:
+        """Buffer vectors, submitting a batch whenever the buffer would outgrow one request"""
+        for vector in vectors:
+            nbytes = vector_bytes(vector)
+            if self._buffer and (self._buffer_bytes + nbytes > self.max_batch_bytes
+                                 or len(self._buffer) >= self.max_batch_count):
+                self._submit(self._buffer)
+                self._buffer, self._buffer_bytes = [], 0
+            self._buffer.append(vector)
+            self._buffer_bytes += nbytes
+
+    def flush(self) -> int:
+        """Submit what is buffered and wait for every batch; returns the number of vectors upserted"""
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer, self._buffer_bytes = [], 0
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            try:
+                future.result()
+            except BaseException:
+                pass
+        self._raise_error()
+        return self.upserted
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
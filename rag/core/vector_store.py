@@ -1,9 +1,18 @@
 from pinecone import Pinecone, ServerlessSpec
+from urllib3.exceptions import HTTPError as TransportError
 
-from typing import Literal
+from typing import Literal, Optional
+import asyncio
+import logging
+import random
+import threading
 import time
 import os 
 
+from rag.core.local_index import FetchResponse
+
+logger = logging.getLogger(__name__)
+
 PINECONE_API = os.getenv("PINECONE_API")
 pc = Pinecone(api_key=PINECONE_API)
 
@@ -28,60 +37,503 @@ def build_vectordb(index_name: str, dims: int = 384, metric: Literal["cosine", "
         time.sleep(1)
 
 
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError, TransportError)):
+        return True
+    return getattr(error, "status", None) in RETRY_STATUSES
+
+
+class RetryingIndex:
+    """
+    Index handle whose data-plane calls are retried on transient errors, with
+    exponential backoff and full jitter, capped at max_delay per wait and
+    max_retries per call. Upserts, fetches and deletes are idempotent by id, so
+    retrying them is safe. Everything else is passed through to the handle.
+    """
+
+    def __init__(self, index, max_retries: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        self._index = index
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def _call(self, name: str, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return getattr(self._index, name)(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                logger.warning(f"Vector index {name} failed ({e}), retrying in {delay:.2f}s")
+                self.retries += 1
+                time.sleep(delay)
+
+    def query(self, *args, **kwargs):
+        return self._call("query", *args, **kwargs)
+
+    def fetch(self, *args, **kwargs):
+        return self._call("fetch", *args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        return self._call("upsert", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call("delete", *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+def doc_namespace(doc_id) -> str:
+    """Namespace holding one contract's vectors in the namespaced layout"""
+    return f"contract-{doc_id}"
+
+
+def _doc_key(vector_id: str, metadata: Optional[dict] = None) -> str:
+    if metadata and "doc_id" in metadata:
+        return str(metadata["doc_id"])
+    # Chunk ids are "<doc_id>#<position>"
+    return vector_id.rsplit("#", 1)[0]
+
+
+class NamespacedIndex:
+    """
+    Index wrapper for the namespaced layout, where every contract's vectors
+    live in their own namespace (doc_namespace) instead of one shared
+    namespace filtered on doc_id. Callers keep using ids and doc_id filters:
+    upserts, fetches and deletes are routed by the "<doc_id>#" id prefix, and
+    a query's doc_id filter becomes the namespace, so a chat query only
+    scans the one contract's vectors however many contracts are stored.
+    """
+
+    def __init__(self, index):
+        self._index = index
+
+    def _by_doc(self, items, key):
+        grouped = {}
+        for item in items:
+            grouped.setdefault(key(item), []).append(item)
+        return grouped
+
+    def upsert(self, vectors, **kwargs):
+        def key(vector):
+            if isinstance(vector, dict):
+                return _doc_key(vector["id"], vector.get("metadata"))
+            return _doc_key(vector[0], vector[2])
+
+        upserted = 0
+        for doc_id, doc_vectors in self._by_doc(vectors, key).items():
+            self._index.upsert(vectors=doc_vectors, namespace=doc_namespace(doc_id), **kwargs)
+            upserted += len(doc_vectors)
+        return {"upserted_count": upserted}
+
+    def delete(self, ids=(), **kwargs):
+        for doc_id, doc_ids in self._by_doc(ids, _doc_key).items():
+            self._index.delete(ids=doc_ids, namespace=doc_namespace(doc_id), **kwargs)
+        return {}
+
+    def fetch(self, ids, **kwargs):
+        groups = self._by_doc(ids, _doc_key)
+        if len(groups) == 1:
+            # The usual case: neighbours of one contract's chunks
+            doc_id, doc_ids = next(iter(groups.items()))
+            return self._index.fetch(ids=doc_ids, namespace=doc_namespace(doc_id), **kwargs)
+        vectors = {}
+        for doc_id, doc_ids in groups.items():
+            vectors.update(self._index.fetch(ids=doc_ids, namespace=doc_namespace(doc_id), **kwargs).vectors)
+        return FetchResponse(vectors)
+
+    def query(self, *args, filter: Optional[dict] = None, top_k: int = 10, **kwargs):
+        condition = (filter or {}).get("doc_id")
+        if isinstance(condition, dict) and "$eq" in condition:
+            doc_ids = [condition["$eq"]]
+        elif isinstance(condition, dict) and "$in" in condition:
+            doc_ids = list(condition["$in"])
+        elif condition is not None and not isinstance(condition, dict):
+            doc_ids = [condition]
+        else:
+            raise ValueError("Queries on a namespaced index need a doc_id filter ($eq or $in)")
+
+        rest = {field: value for field, value in filter.items() if field != "doc_id"} or None
+        matches = []
+        for doc_id in doc_ids:
+            matches.extend(self._index.query(*args, filter=rest, top_k=top_k,
+                                             namespace=doc_namespace(doc_id), **kwargs)["matches"])
+        if len(doc_ids) > 1:
+            # Scores from separate namespaces are comparable (same index and metric)
+            matches = sorted(matches, key=lambda match: -match["score"])[:top_k]
+        return {"matches": matches}
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+class VectorStore:
+    """
+    Process-wide Pinecone index handle. The control-plane work (creating the
+    index if needed, waiting until it is ready, resolving its host) happens
+    once, on first use; afterwards every thread shares one handle, whose
+    HTTP connection pool holds up to pool_maxsize keep-alive connections.
+
+    reset() drops the client and handle (e.g. in a forked worker) but keeps
+    the cached host, so the new handle is built without control-plane calls.
+    """
+
+    def __init__(self, index_name: str, dims: int = 384, metric: Literal["cosine", "euclidean", "dotproduct"] = "cosine",
+                 pool_maxsize: int = 8, max_retries: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        self.index_name = index_name
+        self.dims = dims
+        self.metric = metric
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._host: Optional[str] = None
+        self._index: Optional[RetryingIndex] = None
+
+    def _ready_host(self, client: Pinecone) -> str:
+        """Create the index if it is missing and wait until it is ready, returning its host"""
+        if self.index_name not in client.list_indexes().names():
+            client.create_index(
+                name=self.index_name,
+                dimension=self.dims,
+                metric=self.metric,
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+        description = client.describe_index(self.index_name)
+        while not description.status['ready']:
+            time.sleep(1)
+            description = client.describe_index(self.index_name)
+        return description.host
+
+    def index(self) -> RetryingIndex:
+        if self._index is not None:
+            return self._index
+        with self._lock:
+            if self._index is None:
+                client = Pinecone(api_key=PINECONE_API)
+                if self._host is None:
+                    self._host = self._ready_host(client)
+                handle = client.Index(host=self._host, connection_pool_maxsize=self.pool_maxsize)
+                self._index = RetryingIndex(handle, self.max_retries, self.base_delay, self.max_delay)
+        return self._index
+
+    def reset(self) -> None:
+        with self._lock:
+            self._index = None
+
+    def stats(self) -> dict:
+        return {"ready": self._host is not None, "connected": self._index is not None,
+                "retries": self._index.retries if self._index is not None else 0}
+
+
 
 class RetrievalChunks:
-    def __init__(self, model):
+    def __init__(self, model, top_k: int = 3, context_chars: int = 400, cache=None, lexical=None,
+                 rrf_k: int = 60, fetch_concurrency: int = 1):
         self.model = model
+        self.top_k = top_k
+        self.context_chars = context_chars
+        # Optional RetrievalCache; repeated questions about a document skip the
+        # encode and the index round trips
+        self.cache = cache
+        # Optional LexicalIndex; questions whose exact terms only a few chunks
+        # contain are answered from it alone, other questions fuse its BM25
+        # ranking with the vector ranking
+        self.lexical = lexical
+        self.rrf_k = rrf_k
+        # Async path only: number of concurrent calls the neighbour ids are
+        # split across (1 = one batched fetch)
+        self.fetch_concurrency = max(1, fetch_concurrency)
+
+    @staticmethod
+    def _neighbour_ids(matches):
+        """
+        Contents already at hand (the matches themselves) and the neighbour
+        ids still to fetch. Matches stored with their neighbour context, and
+        neighbours that are matches themselves, need no fetching.
+        """
+        contents = {m["id"]: m["metadata"]["content"] for m in matches}
+        wanted = set()
+        for m in matches:
+            if "prechunk_context" in m["metadata"]:
+                continue
+            for key in ("prechunk_id", "postchunk_id"):
+                neighbour = m["metadata"].get(key, "")
+                if neighbour and neighbour not in contents:
+                    wanted.add(neighbour)
+        return contents, sorted(wanted)
+
+    @staticmethod
+    def _fetch_contents(index, ids) -> Optional[dict]:
+        """Contents of the given chunks, or None if the fetch failed"""
+        try:
+            fetched = index.fetch(ids=ids).vectors
+            return {neighbour: vector["metadata"]["content"] for neighbour, vector in fetched.items()}
+        except Exception as e:
+            print(f"Error fetching neighbour chunks: {e}")
+            return None
+
+    def _neighbour_contents(self, index, matches):
+        """
+        Content of every neighbour the matches link to, in one fetch, and
+        whether it was fetched; without it chunks are rendered without
+        their neighbours
+        """
+        contents, wanted = self._neighbour_ids(matches)
+        if not wanted:
+            return contents, True
+        fetched = self._fetch_contents(index, wanted)
+        contents.update(fetched or {})
+        return contents, fetched is not None
+
+    def _query_vector(self, text):
+        if self.cache is not None:
+            vector = self.cache.get_embedding(text)
+            if vector is not None:
+                return vector
+        vector = self.model.encode([text])[0].tolist()
+        if self.cache is not None:
+            self.cache.put_embedding(text, vector)
+        return vector
+
+    @staticmethod
+    def _format_chunk(title, prechunk_text, content, postchunk_text) -> str:
+        return f"""# {title}
+
+            {prechunk_text}
+            {content}
+            {postchunk_text}"""
+
+    def _vector_chunk(self, m, contents) -> str:
+        metadata = m["metadata"]
+        if "prechunk_context" in metadata:
+            # Trimmed neighbour context stored at ingest time
+            prechunk_text = metadata["prechunk_context"]
+            postchunk_text = metadata.get("postchunk_context", "")
+        else:
+            prechunk = contents.get(metadata.get("prechunk_id", ""), "")
+            postchunk = contents.get(metadata.get("postchunk_id", ""), "")
+            prechunk_text = prechunk[-self.context_chars:] if prechunk else ""
+            postchunk_text = postchunk[:self.context_chars] if postchunk else ""
+        return self._format_chunk(metadata["title"], prechunk_text, metadata["content"], postchunk_text)
+
+    def _lexical_chunk(self, doc_id, i) -> str:
+        """A lexical hit rendered from the lexical index's copy of the chunks, like _vector_chunk"""
+        prechunk = self.lexical.chunk(doc_id, i - 1) if i > 0 else None
+        postchunk = self.lexical.chunk(doc_id, i + 1)
+        return self._format_chunk(
+            self.lexical.title(doc_id),
+            prechunk[-self.context_chars:] if prechunk else "",
+            self.lexical.chunk(doc_id, i),
+            postchunk[:self.context_chars] if postchunk else "",
+        )
+
+    def _cached(self, doc_id, text):
+        """The document's cache version and the cached result for text, if any"""
+        if self.cache is None:
+            return None, None
+        # Read the version before querying, so a re-index that lands
+        # mid-query leaves a stale entry rather than a wrong one
+        version = self.cache.version(doc_id)
+        return version, self.cache.get(doc_id, text, version)
+
+    def _lexical_search(self, doc_id, text):
+        return self.lexical.search(doc_id, text, self.top_k) if self.lexical is not None else ([], [])
+
+    def _exact_only(self, exact) -> bool:
+        """
+        Whether the chunks containing every exact term of the question
+        ("section 4.2", "$1,500") are a complete answer on their own: there
+        are some, and no more than top_k
+        """
+        return 0 < len(exact) <= self.top_k
+
+    def _lexical_chunks(self, doc_id, positions):
+        return [self._lexical_chunk(doc_id, i) for i in positions]
 
     def retreive_chunks(self, text, index, doc_id):
-        xq = self.model.encode([text])[0].tolist()
+        version, cached = self._cached(doc_id, text)
+        if cached is not None:
+            return cached
+
+        lexical_hits, exact = self._lexical_search(doc_id, text)
+        complete = True
+        if self._exact_only(exact):
+            # Exact-term lookup: no embedding or vector query
+            chunks = self._lexical_chunks(doc_id, exact)
+        else:
+            chunks, complete = self._vector_chunks(text, index, doc_id, lexical_hits, exact)
+        self._cache_put(doc_id, text, version, chunks, complete)
+        return chunks
+
+    def _cache_put(self, doc_id, text, version, chunks, complete):
+        # Chunks rendered without their neighbours (failed fetch), or nothing
+        # at all (a document still being ingested), are not worth keeping
+        if self.cache is not None and complete and chunks:
+            self.cache.put(doc_id, text, version, chunks)
+
+    def _vector_matches(self, text, index, doc_id, lexical_hits):
+        xq = self._query_vector(text)
 
-        matches = index.query(
+        return index.query(
             vector=xq,
-            top_k=3,
+            top_k=self.top_k * 2 if lexical_hits else self.top_k,
             include_metadata=True, 
             filter={
                 "doc_id": {"$eq": f"{doc_id}"}
             }
-        )
+        )["matches"]
 
-        chunks = []
-        for m in matches["matches"]:
-            content = m["metadata"]["content"]
-            title = m["metadata"]["title"]
-            pre = m["metadata"].get("prechunk_id", "")
-            post = m["metadata"].get("postchunk_id", "")
-            
-            prechunk_text = ""
-            postchunk_text = ""
-            
-            # Fetch pre-chunk if it exists and is not empty
-            if pre:
-                try:
-                    pre_fetch = index.fetch(ids=[pre])
-                    if pre in pre_fetch.vectors:
-                        prechunk = pre_fetch.vectors[pre]["metadata"]["content"]
-                        prechunk_text = prechunk[-400:] if prechunk else ""
-                except Exception as e:
-                    print(f"Error fetching pre-chunk: {e}")
-            
-            # Fetch post-chunk if it exists and is not empty
-            if post:
-                try:
-                    post_fetch = index.fetch(ids=[post])
-                    if post in post_fetch.vectors:
-                        postchunk = post_fetch.vectors[post]["metadata"]["content"]
-                        postchunk_text = postchunk[:400] if postchunk else ""
-                except Exception as e:
-                    print(f"Error fetching post-chunk: {e}")
-                
-            chunk = f"""# {title}
+    def _fuse(self, matches, lexical_hits, exact, doc_id):
+        """
+        Chunk ids to return, best first, and the vector matches among them.
+        With lexical hits, the vector and BM25 rankings are merged by
+        reciprocal rank fusion; chunks containing every exact term of the
+        question, when too many do for the exact-term lookup, count as a
+        third ranking, which lifts them without dropping the vector matches.
+        """
+        by_id = {m["id"]: m for m in matches}
+        if not lexical_hits:
+            return [m["id"] for m in matches], matches
 
-            {prechunk_text}
-            {content}
-            {postchunk_text}"""
-       
-            chunks.append(chunk)
+        fused = {}
+        rankings = ([m["id"] for m in matches],
+                    [f"{doc_id}#{i}" for i, _ in lexical_hits],
+                    [f"{doc_id}#{i}" for i in exact])
+        for ranking in rankings:
+            for rank, chunk_id in enumerate(ranking):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1 / (self.rrf_k + rank + 1)
+        top = sorted(fused, key=lambda chunk_id: -fused[chunk_id])[:self.top_k]
+        return top, [by_id[chunk_id] for chunk_id in top if chunk_id in by_id]
+
+    def _render(self, doc_id, top, vector_matches, contents):
+        by_id = {m["id"]: m for m in vector_matches}
+        return [
+            self._vector_chunk(by_id[chunk_id], contents) if chunk_id in by_id
+            else self._lexical_chunk(doc_id, int(chunk_id.rsplit("#", 1)[1]))
+            for chunk_id in top
+        ]
+
+    def _vector_chunks(self, text, index, doc_id, lexical_hits, exact):
+        matches = self._vector_matches(text, index, doc_id, lexical_hits)
+        top, vector_matches = self._fuse(matches, lexical_hits, exact, doc_id)
+        contents, complete = self._neighbour_contents(index, vector_matches)
+        return self._render(doc_id, top, vector_matches, contents), complete
+
+    async def aretreive_chunks(self, text, index, doc_id):
+        """
+        retreive_chunks for the async chat path. Everything that blocks (the
+        cache version read, BM25 scoring and lexical chunk loads, encode,
+        query and fetch) runs in worker threads, so the event loop keeps
+        serving other chats meanwhile; neighbour fetches are split across
+        fetch_concurrency concurrent calls.
+        """
+        version, cached = await asyncio.to_thread(self._cached, doc_id, text)
+        if cached is not None:
+            return cached
+
+        lexical_hits, exact = await asyncio.to_thread(self._lexical_search, doc_id, text)
+        complete = True
+        if self._exact_only(exact):
+            chunks = await asyncio.to_thread(self._lexical_chunks, doc_id, exact)
+        else:
+            matches = await asyncio.to_thread(self._vector_matches, text, index, doc_id, lexical_hits)
+            top, vector_matches = self._fuse(matches, lexical_hits, exact, doc_id)
+            contents, wanted = self._neighbour_ids(vector_matches)
+            if wanted:
+                size = -(-len(wanted) // self.fetch_concurrency)
+                fetched = await asyncio.gather(*(
+                    asyncio.to_thread(self._fetch_contents, index, wanted[start:start + size])
+                    for start in range(0, len(wanted), size)
+                ))
+                for part in fetched:
+                    contents.update(part or {})
+                complete = all(part is not None for part in fetched)
+            # Fused lexical-only hits are read from the lexical index
+            chunks = await asyncio.to_thread(self._render, doc_id, top, vector_matches, contents)
+
+        self._cache_put(doc_id, text, version, chunks, complete)
         return chunks
 
 
+def fetch_document_vectors(index, doc_id, batch_size: int = 100):
+    """
+    Yield (id, values, metadata) for every chunk vector of a document, in
+    chunk order. Chunk ids are sequential (doc_id#0, doc_id#1, ...), so they
+    are fetched in runs until one comes back short.
+    """
+    fetched_count = 0
+    while True:
+        ids = [f"{doc_id}#{i}" for i in range(fetched_count, fetched_count + batch_size)]
+        fetched = index.fetch(ids=ids).vectors
+        for vector_id in ids:
+            if vector_id not in fetched:
+                return
+            yield vector_id, list(fetched[vector_id]["values"]), dict(fetched[vector_id]["metadata"])
+        fetched_count += batch_size
+
+
+def clone_document_vectors(index, src_doc_id, dst_doc_id, dst_title: str, batch_size: int = 100) -> int:
+    """
+    Copy every chunk vector of one document under a new doc_id and title,
+    rewriting the ids and neighbour links.
+    """
+    copied = 0
+    vectors = []
+    for i, (_, values, metadata) in enumerate(fetch_document_vectors(index, src_doc_id, batch_size)):
+        metadata.update({
+            "doc_id": f"{dst_doc_id}",
+            "id": f"{dst_doc_id}#{i}",
+            "title": dst_title,
+            "prechunk_id": f"{dst_doc_id}#{i-1}" if metadata.get("prechunk_id") else "",
+            "postchunk_id": f"{dst_doc_id}#{i+1}" if metadata.get("postchunk_id") else "",
+        })
+        vectors.append((metadata["id"], values, metadata))
+        if len(vectors) == batch_size:
+            index.upsert(vectors=vectors)
+            copied += len(vectors)
+            vectors = []
+
+    if vectors:
+        index.upsert(vectors=vectors)
+        copied += len(vectors)
+    return copied
+
+
+def migrate_document_vectors(source, target, doc_id, batch_size: int = 100) -> int:
+    """
+    Copy every chunk vector of a document from one index (or layout) to
+    another under the same ids, then delete chunks past the copied ones that
+    the target still holds from an earlier copy. Returns the number copied.
+    """
+    copied = 0
+    vectors = []
+    for vector in fetch_document_vectors(source, doc_id, batch_size):
+        vectors.append(vector)
+        if len(vectors) == batch_size:
+            target.upsert(vectors=vectors)
+            copied += len(vectors)
+            vectors = []
+    if vectors:
+        target.upsert(vectors=vectors)
+        copied += len(vectors)
+    if not copied:
+        # Nothing to migrate; leave whatever the target holds alone
+        return 0
+
+    start = copied
+    while True:
+        ids = [f"{doc_id}#{i}" for i in range(start, start + batch_size)]
+        leftover = [vector_id for vector_id in ids if vector_id in target.fetch(ids=ids).vectors]
+        if not leftover:
+            return copied
+        target.delete(ids=leftover)
+        start += batch_size
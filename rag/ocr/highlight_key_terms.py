@@ -2,7 +2,6 @@ import fitz
 import time
 import re
 import logging
-import tempfile
 from pathlib import Path
 from typing import List, Set, Union
 
@@ -16,6 +15,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+STOPWORDS_DIR = Path(__file__).parent / "stopwords"
+
+
+def load_stopwords(language: str = "english") -> Set[str]:
+    """Stopword list bundled with the package (NLTK's list), so nothing is downloaded at startup"""
+    return set((STOPWORDS_DIR / language).read_text(encoding="utf-8").split())
+
 
 class PDFHighlighter:
     """Unified class for processing and highlighting PDFs based on semantic similarity."""
@@ -125,19 +131,15 @@ class PDFHighlighter:
             # Get embeddings
             summary_embeddings = self.model.encode(
                 summary_sentences_proc,
-                convert_to_tensor=True,
+                convert_to_numpy=True,
                 normalize_embeddings=True
             )
             sentence_embeddings = self.model.encode(
                 processed_sentences,
-                convert_to_tensor=True,
+                convert_to_numpy=True,
                 normalize_embeddings=True
             )
 
-            # Convert tensor embeddings to numpy arrays
-            summary_embeddings = summary_embeddings.cpu().numpy()
-            sentence_embeddings = sentence_embeddings.cpu().numpy()
-
             # Weight summary sentences by their length
             weights = np.array([len(sent.split()) for sent in summary_sentences_proc], dtype=np.float32)
             weights /= weights.sum()
@@ -173,16 +175,11 @@ class PDFHighlighter:
                     for inst in page.search_for(phrase):
                         page.add_highlight_annot(inst)
                         
-            # Save the updated PDF to a temporary file, then read its bytes
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_file:
-                temp_filename = tmp_file.name
-                
+            # Serialize the updated PDF straight to bytes
             try:
-                doc.save(temp_filename)
-                with open(temp_filename, "rb") as f:
-                    highlighted_pdf_bytes = f.read()
+                highlighted_pdf_bytes = doc.tobytes()
             finally:
-                Path(temp_filename).unlink(missing_ok=True)
+                doc.close()
                 
             logger.debug("Highlighted PDF generated successfully.")
             return highlighted_pdf_bytes
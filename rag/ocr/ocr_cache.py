@@ -0,0 +1,119 @@
+"""
+Description: Disk cache for OCR output keyed by the hash of the rendered page image
+
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OCR_CACHE_DIR = os.path.join(Path.home(), ".cache", "covenant-ai", "ocr")
+# Fraction of max_bytes the cache is pruned down to once it outgrows it
+PRUNE_TO = 0.8
+
+
+class OCRCache:
+    def __init__(self, cache_dir: Union[str, Path, None] = None, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the OCR cache
+
+        Args:
+            cache_dir: Directory holding cached OCR text. Defaults to
+                ~/.cache/covenant-ai/ocr
+            max_bytes: Size the cached text may grow to before the least
+                recently used entries are deleted
+        """
+        self.cache_dir = Path(cache_dir or DEFAULT_OCR_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Bytes on disk as seen by this process; scanned on the first write
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def make_key(image_bytes: bytes, width: int, height: int, lang: str) -> str:
+        """
+        Build the cache key for a rendered page image
+
+        Args:
+            image_bytes: Raw pixel samples of the rendered page
+            width: Image width in pixels
+            height: Image height in pixels
+            lang: Tesseract language the text was recognised with
+        Returns:
+            str: Hex digest identifying the image
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{lang}:{width}x{height}:".encode())
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        # Shard by prefix so a single directory never holds every page
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached OCR text for the key, or None on a miss"""
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+            # The modification time doubles as the last use for pruning
+            os.utime(path)
+            return text
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Could not read OCR cache entry {key}: {str(e)}")
+            return None
+
+    def set(self, key: str, text: str) -> None:
+        """Store OCR text atomically so concurrent workers never see partial files"""
+        path = self._path(key)
+        data = text.encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write OCR cache entry {key}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._prune()
+
+    def _entries(self):
+        """(path, size, last use) of every cached entry"""
+        for path in self.cache_dir.glob("*/*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Pruned by another process meanwhile
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+    def _prune(self) -> None:
+        """Delete the least recently used entries until the cache is below PRUNE_TO of max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes * PRUNE_TO:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
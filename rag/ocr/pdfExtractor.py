@@ -7,14 +7,24 @@ Description: Extract text and tables from PDF files using PyMuPDF and pdfplumber
 import pdfplumber
 import pandas as pd
 from pathlib import Path
+import io
 import logging
-from typing import Dict, List, Tuple
+import multiprocessing
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import re
 from dataclasses import dataclass
 import fitz  # PyMuPDF
+import numpy as np
 from PIL import Image
 import pytesseract
 
+from rag.ocr.ocr_cache import OCRCache
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -22,6 +32,22 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# A PDF given either as a path or as its bytes
+PDFSource = Union[str, Path, bytes]
+
+# Mirrors pdfplumber's default edge_min_length table setting
+TABLE_EDGE_MIN_LENGTH = 3
+
+# OCR rendering: pages are rendered so a text line is roughly OCR_TARGET_LINE_PX
+# tall, which lets large-font pages use a lower resolution than small print
+OCR_LANG = "eng"
+OCR_PROBE_DPI = 72
+OCR_TARGET_LINE_PX = 32
+OCR_MIN_DPI = 150
+OCR_MAX_DPI = 300
+# Scanned pages OCRed at once by default; each tesseract process then uses one core
+DEFAULT_OCR_WORKERS = 2
+
 
 @dataclass
 class TableData:
@@ -31,16 +57,62 @@ class TableData:
     location: Tuple[float, float, float, float]
 
 
+class _LazyPlumber:
+    """pdfplumber handle that is only opened once a page needs the table pass"""
+
+    def __init__(self, source: PDFSource):
+        self.source = source
+        self._pdf = None
+
+    def page(self, page_num: int):
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(_as_file(self.source))
+        return self._pdf.pages[page_num]
+
+    def close(self) -> None:
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+
 class PDFTextExtractor:
-    def __init__(self, pdf_path: str):
+    def __init__(
+        self,
+        pdf_path: PDFSource,
+        workers: Optional[int] = 1,
+        extract_tables: bool = True,
+        table_prescreen: bool = True,
+        ocr_workers: int = DEFAULT_OCR_WORKERS,
+        ocr_cache: Optional[OCRCache] = None,
+    ):
         """
         Initialize the PDF text extractor
 
         Args:
-            pdf_path: Path to the PDF file
-            output_dir: Directory to store output files
+            pdf_path: Path to the PDF file, or the PDF bytes
+            workers: Number of processes used to extract pages in parallel.
+                1 keeps the serial path, None uses every available core.
+            extract_tables: Run table extraction at all. Disable to skip
+                pdfplumber entirely during ingest.
+            table_prescreen: Only send pages with ruling lines to pdfplumber
+            ocr_workers: Threads running tesseract on scanned pages concurrently.
+                1 OCRs pages one at a time.
+            ocr_cache: Disk cache of OCR output keyed by the page image hash.
+                None OCRs every scanned page.
         """
-        self.pdf_path = Path(pdf_path)
+        if isinstance(pdf_path, bytes):
+            # In-memory PDF: fitz and pdfplumber read the same buffer
+            self.pdf_path = None
+            self.source: PDFSource = pdf_path
+        else:
+            self.pdf_path = Path(pdf_path)
+            self.source = str(self.pdf_path)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.extract_tables = extract_tables
+        self.table_prescreen = table_prescreen
+        self.ocr_workers = max(1, ocr_workers)
+        self.ocr_cache = ocr_cache
+        self._ocr_pool: Optional[ThreadPoolExecutor] = None
         self.extracted_text = []
         self.tables = []
 
@@ -58,6 +130,69 @@ class PDFTextExtractor:
             return True
         return False
 
+    def _estimate_line_height(self, page) -> Optional[float]:
+        """
+        Estimate the typical text line height of a scanned page from a cheap
+        low-resolution render, using the runs of rows that contain ink
+
+        Args:
+            page: PDF page object
+        Returns:
+            Optional[float]: Median line height in points, None if no text rows were found
+        """
+        pix = page.get_pixmap(
+            matrix=fitz.Matrix(OCR_PROBE_DPI / 72, OCR_PROBE_DPI / 72), colorspace=fitz.csGRAY
+        )
+        pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+        ink_rows = (pixels[:, : pix.width] < 128).mean(axis=1) > 0.01
+        # Start/end offsets of consecutive ink rows
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], ink_rows.astype(np.int8), [0]))))
+        runs = edges[1::2] - edges[::2]
+        runs = runs[runs >= 2]
+        if not len(runs):
+            return None
+        return float(np.median(runs)) * 72 / OCR_PROBE_DPI
+
+    def _ocr_dpi(self, page) -> int:
+        """Pick the OCR render resolution for a page, lower for large fonts"""
+        line_height = self._estimate_line_height(page)
+        if not line_height:
+            return OCR_MAX_DPI
+        dpi = 72 * OCR_TARGET_LINE_PX / line_height
+        return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, dpi)))
+
+    def _render_for_ocr(self, page) -> Tuple[Image.Image, str]:
+        """
+        Render a page in grayscale at its adaptive DPI
+
+        Args:
+            page: PDF page object
+        Returns:
+            Tuple[Image.Image, str]: Rendered image and its OCR cache key
+        """
+        dpi = self._ocr_dpi(page)
+        pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY)
+        samples = pix.samples
+        key = OCRCache.make_key(samples, pix.width, pix.height, OCR_LANG)
+        img = Image.frombytes("L", [pix.width, pix.height], samples, "raw", "L", pix.stride)
+        return img, key
+
+    def _ocr_image(self, img: Image.Image, key: str) -> str:
+        """Run tesseract on a rendered page, reusing cached output for identical images"""
+        try:
+            if self.ocr_cache is not None:
+                cached = self.ocr_cache.get(key)
+                if cached is not None:
+                    return cached
+            # Concurrent tesseract processes should use one core each
+            text = _run_tesseract(img, omp_thread_limit=1 if self._ocr_pool is not None else None)
+            if self.ocr_cache is not None:
+                self.ocr_cache.set(key, text)
+            return text
+        except Exception as e:
+            logger.error(f"Error in OCR processing: {str(e)}")
+            return ""
+
     def _process_scanned_page(self, page) -> str:
         """
         Process scanned pages using OCR
@@ -68,13 +203,69 @@ class PDFTextExtractor:
             str: Extracted text from the scanned page
         """
         try:
-            pix = page.get_pixmap(matrix=fitz.Matrix(300 / 72, 300 / 72))
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            text = pytesseract.image_to_string(img, lang="eng")
-            return text
+            img, key = self._render_for_ocr(page)
         except Exception as e:
             logger.error(f"Error in OCR processing: {str(e)}")
             return ""
+        return self._ocr_image(img, key)
+
+    def _submit_scanned_page(self, page) -> Union[str, Future]:
+        """
+        OCR a scanned page, on the OCR pool when one is running. Rendering
+        stays on the calling thread because fitz documents are not thread-safe;
+        tesseract runs as a subprocess so the pool gives real parallelism.
+
+        Args:
+            page: PDF page object
+        Returns:
+            Union[str, Future]: Cleaned text, or a future resolving to it
+        """
+        if self._ocr_pool is None:
+            return self._clean_text(self._process_scanned_page(page))
+        try:
+            img, key = self._render_for_ocr(page)
+        except Exception as e:
+            logger.error(f"Error in OCR processing: {str(e)}")
+            return ""
+        return self._ocr_pool.submit(lambda: self._clean_text(self._ocr_image(img, key)))
+
+    def _has_table_candidates(self, page) -> bool:
+        """
+        Cheap pre-screen for the pdfplumber table pass. pdfplumber's default
+        table finder builds cells out of ruling lines and drops single-cell
+        tables, so a page needs at least two edges in each direction and
+        five overall before the expensive pass can find anything.
+
+        Args:
+            page: PyMuPDF page object
+        Returns:
+            bool: True if the page may contain a table
+        """
+        horizontal = vertical = 0
+        for path in page.get_drawings():
+            for item in path["items"]:
+                kind = item[0]
+                if kind == "re":
+                    # Thin filled rectangles are used as rules; pdfplumber drops
+                    # their short sides (edge_min_length), so do the same here
+                    rect = item[1]
+                    if rect.width >= TABLE_EDGE_MIN_LENGTH:
+                        horizontal += 2
+                    if rect.height >= TABLE_EDGE_MIN_LENGTH:
+                        vertical += 2
+                elif kind == "qu":
+                    horizontal += 2
+                    vertical += 2
+                elif kind in ("l", "c"):
+                    # Short segments may still be joined into a longer edge
+                    start, end = item[1], item[-1]
+                    if kind == "c" or abs(start.y - end.y) <= 1:
+                        horizontal += 1
+                    if kind == "c" or abs(start.x - end.x) <= 1:
+                        vertical += 1
+                if horizontal >= 2 and vertical >= 2 and horizontal + vertical >= 5:
+                    return True
+        return False
 
     def _extract_tables(self, page) -> List[TableData]:
         """
@@ -128,6 +319,119 @@ class PDFTextExtractor:
         text = re.sub(r"\n\s*\n", "\n\n", text)
         return text.strip()
 
+    def _process_page(self, mupdf_page, plumber: _LazyPlumber) -> Tuple[Dict, List[TableData]]:
+        """
+        Extract text and tables from a single page
+
+        Args:
+            mupdf_page: PyMuPDF page object
+            plumber: Lazily opened pdfplumber handle for the same document
+        Returns:
+            Tuple[Dict, List[TableData]]: Page record and the tables found on it
+        """
+        # Extract text using PyMuPDF; scanned pages may come back as an OCR future
+        if self._check_for_scanned_content(mupdf_page):
+            text = self._submit_scanned_page(mupdf_page)
+        else:
+            text = self._clean_text(mupdf_page.get_text())
+
+        # Extract tables using pdfplumber, skipping pages without ruling lines
+        page_tables = []
+        if self.extract_tables and (
+            not self.table_prescreen or self._has_table_candidates(mupdf_page)
+        ):
+            page_tables = self._extract_tables(plumber.page(mupdf_page.number))
+
+        page_record = {
+            "page_number": mupdf_page.number + 1,
+            "text": text,
+            "tables": [table.content for table in page_tables],
+        }
+        return page_record, page_tables
+
+    def _iter_serial(self, doc) -> Iterator[Tuple[Dict, List[TableData]]]:
+        """
+        Extract pages in the current process, in order. Scanned pages are OCRed
+        concurrently; a page is yielded as soon as it and every earlier page
+        are done, with a bounded number of OCR pages in flight.
+        """
+        plumber = _LazyPlumber(self.source)
+        if self.ocr_workers > 1:
+            ocr_pool = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="ocr")
+        else:
+            ocr_pool = nullcontext()
+        max_pending = max(1, 2 * self.ocr_workers)
+        try:
+            with ocr_pool as self._ocr_pool:
+                pending = deque()
+                for page in doc:
+                    pending.append(self._process_page(page, plumber))
+                    while pending and (
+                        len(pending) > max_pending or not _is_pending(pending[0][0])
+                    ):
+                        yield _resolve_page(pending.popleft())
+                while pending:
+                    yield _resolve_page(pending.popleft())
+        finally:
+            self._ocr_pool = None
+            plumber.close()
+
+    def _iter_parallel(self, page_count: int) -> Iterator[Tuple[Dict, List[TableData]]]:
+        """
+        Fan pages out over a process pool. Each worker opens its own
+        fitz/pdfplumber handles once and results come back in page order.
+        """
+        workers = min(self.workers, page_count)
+        # Hand out pages in a few contiguous runs per worker to keep IPC low
+        chunksize = max(1, page_count // (workers * 4))
+        # spawn avoids forking a parent that already holds torch/gunicorn threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_page_worker,
+            initargs=(
+                self.source, self.extract_tables, self.table_prescreen,
+                (self.ocr_cache.cache_dir, self.ocr_cache.max_bytes) if self.ocr_cache is not None else None,
+            ),
+        ) as pool:
+            yield from pool.map(_extract_page_in_worker, range(page_count), chunksize=chunksize)
+
+    def _iter_results(self) -> Iterator[Tuple[Dict, List[TableData]]]:
+        """Yield (page record, tables) pairs in page order"""
+        # PyMuPDF handles text; pdfplumber is only opened for table pages
+        doc = _open_fitz(self.source)
+        page_count = len(doc)
+        try:
+            if self.workers > 1 and page_count > 1:
+                doc.close()
+                yield from self._iter_parallel(page_count)
+            else:
+                yield from self._iter_serial(doc)
+        finally:
+            if not doc.is_closed:
+                doc.close()
+
+    def page_count(self) -> int:
+        """Return the number of pages without extracting anything"""
+        with _open_fitz(self.source) as doc:
+            return len(doc)
+
+    def iter_pages(self) -> Iterator[Dict]:
+        """
+        Stream page records in order without keeping them on the extractor,
+        so downstream stages can start before the whole document is read
+
+        Yields:
+            Dict: Page record with page_number, text and tables
+        """
+        try:
+            for page_record, _ in self._iter_results():
+                yield page_record
+        except Exception as e:
+            logger.error(f"Error processing PDF: {str(e)}")
+            raise
+
     def extract_text(self) -> Dict:
         """
         Main method to extract text and tables from PDF
@@ -136,38 +440,10 @@ class PDFTextExtractor:
             Dict: Extracted content including text and tables
         """
         try:
-            # Use both PyMuPDF and pdfplumber for optimal extraction
-            doc = fitz.open(self.pdf_path)
-
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for page_num in range(len(doc)):
-                    # Get PyMuPDF page for text extraction
-                    mupdf_page = doc[page_num]
-
-                    # Get pdfplumber page for table extraction
-                    plumber_page = pdf.pages[page_num]
-
-                    # Extract text using PyMuPDF
-                    if self._check_for_scanned_content(mupdf_page):
-                        text = self._process_scanned_page(mupdf_page)
-                    else:
-                        text = mupdf_page.get_text()
-
-                    # Extract tables using pdfplumber
-                    page_tables = self._extract_tables(plumber_page)
-                    self.tables.extend(page_tables)
-
-                    # Clean and store text
-                    cleaned_text = self._clean_text(text)
-                    self.extracted_text.append(
-                        {
-                            "page_number": page_num + 1,
-                            "text": cleaned_text,
-                            "tables": [table.content for table in page_tables],
-                        }
-                    )
-
-            doc.close()
+            for page_record, page_tables in self._iter_results():
+                self.tables.extend(page_tables)
+                self.extracted_text.append(page_record)
+
             return {"text": self.extracted_text, "tables": self.tables}
 
         except Exception as e:
@@ -194,4 +470,77 @@ class PDFTextExtractor:
 
         except Exception as e:
             logger.error(f"Error saving to file: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+
+def _open_fitz(source: PDFSource) -> fitz.Document:
+    """Open a PyMuPDF document from a path or from bytes without touching disk"""
+    if isinstance(source, bytes):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _as_file(source: PDFSource):
+    """pdfplumber accepts a path or a file object; wrap bytes without copying them to disk"""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _run_tesseract(img: Image.Image, omp_thread_limit: Optional[int] = None) -> str:
+    """
+    OCR an image with the tesseract binary pytesseract is configured with.
+    OMP_THREAD_LIMIT is set in the environment of that subprocess only, never
+    in this process.
+    """
+    env = None
+    if omp_thread_limit:
+        env = {**os.environ, "OMP_THREAD_LIMIT": str(omp_thread_limit)}
+    png = io.BytesIO()
+    img.save(png, format="PNG")
+    result = subprocess.run(
+        [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", OCR_LANG],
+        input=png.getvalue(), capture_output=True, env=env, check=True,
+    )
+    return result.stdout.decode("utf-8")
+
+
+def _is_pending(page_record: Dict) -> bool:
+    """True while the page text is an OCR future that has not finished"""
+    return isinstance(page_record["text"], Future) and not page_record["text"].done()
+
+
+def _resolve_page(result: Tuple[Dict, List[TableData]]) -> Tuple[Dict, List[TableData]]:
+    """Replace an OCR future in the page record with its text"""
+    page_record, _ = result
+    if isinstance(page_record["text"], Future):
+        page_record["text"] = page_record["text"].result()
+    return result
+
+
+# Per-process state for the page-parallel extraction mode
+_worker_extractor: Optional[PDFTextExtractor] = None
+_worker_doc = None
+_worker_plumber: Optional[_LazyPlumber] = None
+
+
+def _init_page_worker(source: PDFSource, extract_tables: bool, table_prescreen: bool,
+                      ocr_cache: Optional[Tuple[Path, int]]) -> None:
+    """Open the fitz and pdfplumber handles owned by this worker process"""
+    global _worker_extractor, _worker_doc, _worker_plumber
+    # Pages are already spread across processes, so OCR runs inline here and
+    # each tesseract it starts (inheriting this spawned process's environment)
+    # should use one core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    _worker_extractor = PDFTextExtractor(
+        source,
+        extract_tables=extract_tables,
+        table_prescreen=table_prescreen,
+        ocr_workers=1,
+        ocr_cache=OCRCache(*ocr_cache) if ocr_cache is not None else None,
+    )
+    _worker_doc = _open_fitz(source)
+    _worker_plumber = _LazyPlumber(source)
+
+
+def _extract_page_in_worker(page_num: int) -> Tuple[Dict, List[TableData]]:
+    """Extract a single page using the handles opened by _init_page_worker"""
+    return _worker_extractor._process_page(_worker_doc[page_num], _worker_plumber)
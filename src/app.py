@@ -5,74 +5,238 @@ import asyncio
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(project_root)
 
-from sentence_transformers import SentenceTransformer
 from rag.core.chunking import SemanticChunker
 from rag.ocr.pdfExtractor import PDFTextExtractor
-from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify, Response
+from rag.ocr.ocr_cache import OCRCache
+from flask import Flask, Request, render_template, request, redirect, url_for, send_file, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from supabase import create_client, Client
 from rag.core.stuffing_summarizer import SummarizerAgent
 import google.generativeai as genai
 import tempfile
+import io
+import json
+import hashlib
+import uuid
 from datetime import datetime
-from rag.ocr.highlight_key_terms import PDFHighlighter
+from rag.ocr.highlight_key_terms import PDFHighlighter, load_stopwords
 from dotenv import load_dotenv
-from nltk.corpus import stopwords
-from rag.core.metadata import BuildMetaData as MetadataBuilder
-from rag.core.vector_store import build_vectordb, pc as Pinecone, RetrievalChunks
-from rag.core.chat import RAGChatbot
-import nltk
+from rag.core.pipeline import IngestionPipeline
+from rag.core.metadata import BuildMetaData
+from rag.core.reindex import IncrementalReindexer
+from rag.core.embedding_cache import CachedEncoder, EmbeddingCache
+from rag.core.encoders import load_encoder
+from rag.core.micro_batcher import BatchingEncoder
+from rag.core.jobs import JobQueue
+from rag.core.lazy import Lazy
+from rag.core.local_index import LocalIndex
+from rag.core.content_store import ContentStore, ContentStoreIndex
+from rag.core.lexical_index import LexicalIndex
+from rag.core.retrieval_cache import RetrievalCache
+from rag.core.vector_store import NamespacedIndex, VectorStore, clone_document_vectors
+from rag.core.chat import ChatLatency, RAGChatbot
 import time
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-stopwords_set = set(stopwords.words('english'))
 
 load_dotenv()   
+
+# Uploads up to this size stay in memory end to end; larger ones spill to disk
+UPLOAD_SPILL_BYTES = int(os.getenv('UPLOAD_SPILL_BYTES', str(20 * 1024 * 1024)))
+
+class SpooledRequest(Request):
+    """Keeps uploaded files in memory until they exceed UPLOAD_SPILL_BYTES"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPILL_BYTES, mode='rb+')
+
 app = Flask(__name__)
+app.request_class = SpooledRequest
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-supabase: Client = create_client(
+# Components are created on first use (or by /warmup), so importing the app
+# is cheap and an unreachable service only fails the requests that need it
+supabase: Client = Lazy("supabase", lambda: create_client(
     os.getenv('SERVICE_KEY'),
     os.getenv('ROLE_KEY')
-)
-
-
+))
 
 BUCKET_NAME = 'contract-files'  # Changed bucket name to be more specific
 
-# Initialize models and services only once at the start
-print("Initializing SentenceTransformer - This should happen only once")
-encoder = SentenceTransformer("all-MiniLM-L6-v2") 
-
-# Initialize Gemini for summarization
-genai.configure(api_key=os.getenv('GEMINI_API'))
-model = genai.GenerativeModel("gemini-1.5-flash")
-summarizer = SummarizerAgent(llm=model)
+# Uploads are processed by src/worker.py through this queue
+job_queue = JobQueue(os.getenv('JOB_DB_PATH', os.path.join(app.config['UPLOAD_FOLDER'], 'jobs.sqlite3')))
+
+# Number of processes used to extract PDF pages (1 = serial)
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', '1'))
+# Set to false to skip the pdfplumber table pass during ingest
+PDF_EXTRACT_TABLES = os.getenv('PDF_EXTRACT_TABLES', 'true').lower() == 'true'
+# Scanned pages OCRed concurrently by the serial extraction path
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '2'))
+# OCR output is cached on disk by page image, shared by every process on the
+# host (OCR_CACHE_MB=0 disables it)
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'covenant-ai', 'ocr'))
+OCR_CACHE_MB = int(os.getenv('OCR_CACHE_MB', '256'))
+ocr_cache = OCRCache(OCR_CACHE_DIR, max_bytes=OCR_CACHE_MB * 1024 * 1024) if OCR_CACHE_MB > 0 else None
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# CPU inference backend: "torch" (float32), "int8" (dynamic quantization) or "onnx"
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+# Embeddings are cached on disk by model + text, shared by every process on the host
+EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'covenant-ai', 'embeddings'))
+EMBEDDING_CACHE_MB = int(os.getenv('EMBEDDING_CACHE_MB', '512'))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv('EMBEDDING_CACHE_MEMORY_ITEMS', '4096'))
+# Concurrent encode calls are coalesced into batches of up to this many texts,
+# waiting at most EMBEDDING_MAX_WAIT_MS for company
+EMBEDDING_MAX_BATCH = int(os.getenv('EMBEDDING_MAX_BATCH', '64'))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv('EMBEDDING_MAX_WAIT_MS', '5'))
+# Where chunk vectors live: "pinecone" (remote) or "local" (memory-mapped
+# per-document matrices under LOCAL_INDEX_DIR, shared by every process on the host)
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'pinecone')
+LOCAL_INDEX_DIR = os.getenv('LOCAL_INDEX_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'covenant-ai', 'vectors'))
+# Layout of the Pinecone index: "filtered" (every contract in one namespace,
+# queries filtered on doc_id) or "namespaced" (one namespace per contract, so
+# queries scan only that contract). Move existing vectors with
+# src/migrate_namespaces.py. The local backend already keeps documents apart.
+VECTOR_LAYOUT = os.getenv('VECTOR_LAYOUT', 'filtered')
+# Chat endpoint the contract page posts to: this app's /chat by default, or
+# the async chat server (src/chat_server.py). Answers are streamed from
+# <CHAT_URL>/stream
+CHAT_URL = os.getenv('CHAT_URL', '')
+# Async chat path: neighbour chunk fetches are split across this many concurrent calls
+CHAT_FETCH_CONCURRENCY = int(os.getenv('CHAT_FETCH_CONCURRENCY', '2'))
+# Where chunk text lives: "metadata" (in the vector metadata) or "local" (a
+# compressed SQLite store keyed by vector id; vectors then carry only ids and
+# filter fields, and retrieval fills the text back in from the store)
+CONTENT_STORE = os.getenv('CONTENT_STORE', 'metadata')
+CONTENT_STORE_DB = os.getenv('CONTENT_STORE_DB', os.path.join(os.path.expanduser('~'), '.cache', 'covenant-ai', 'content.sqlite3'))
+# Keep-alive connections per process, and retries of transient Pinecone errors
+VECTOR_STORE_POOL_SIZE = int(os.getenv('VECTOR_STORE_POOL_SIZE', '8'))
+VECTOR_STORE_RETRIES = int(os.getenv('VECTOR_STORE_RETRIES', '3'))
+# Chat retrieval results per (document, normalized question); re-indexing a
+# document invalidates its entries in every process via RETRIEVAL_CACHE_DB
+RETRIEVAL_CACHE_ENTRIES = int(os.getenv('RETRIEVAL_CACHE_ENTRIES', '1024'))
+RETRIEVAL_CACHE_TTL = float(os.getenv('RETRIEVAL_CACHE_TTL', '600'))
+RETRIEVAL_CACHE_DB = os.getenv('RETRIEVAL_CACHE_DB', os.path.join(os.path.expanduser('~'), '.cache', 'covenant-ai', 'retrieval.sqlite3'))
+
+def _load_embedding_cache():
+    # Backends give slightly different vectors, so each gets its own cache
+    return EmbeddingCache(
+        EMBEDDING_CACHE_DIR, f"{EMBEDDING_MODEL}-{EMBEDDING_BACKEND}", sentence_model.get_sentence_embedding_dimension(),
+        max_bytes=EMBEDDING_CACHE_MB * 1024 * 1024, memory_items=EMBEDDING_CACHE_MEMORY_ITEMS
+    )
+
+def _load_vector_index():
+    if VECTOR_BACKEND == "local":
+        index = LocalIndex(LOCAL_INDEX_DIR, dim=sentence_model.get_sentence_embedding_dimension())
+    elif VECTOR_LAYOUT == "namespaced":
+        index = NamespacedIndex(vector_store.index())
+    else:
+        index = vector_store.index()
+    if CONTENT_STORE == "local":
+        return ContentStoreIndex(index, ContentStore(CONTENT_STORE_DB))
+    return index
+
+def _load_gemini():
+    genai.configure(api_key=os.getenv('GEMINI_API'))
+    return genai.GenerativeModel("gemini-1.5-flash")
+
+sentence_model = Lazy("embedding_model", lambda: load_encoder(EMBEDDING_MODEL, backend=EMBEDDING_BACKEND))
+embedding_cache = Lazy("embedding_cache", _load_embedding_cache)
+# Chunker, highlighter, ingestion and retrieval all encode through the same
+# cache; cache misses from concurrent requests share encoder batches
+encode_batcher = BatchingEncoder(sentence_model, max_batch_size=EMBEDDING_MAX_BATCH, max_wait_ms=EMBEDDING_MAX_WAIT_MS)
+encoder = CachedEncoder(encode_batcher, embedding_cache)
+
+# Gemini for summarization
+model = Lazy("gemini", _load_gemini)
+summarizer = Lazy("summarizer", lambda: SummarizerAgent(llm=model.get()))
 
 # Create chunker with the encoder
-chunker = SemanticChunker(model=encoder, min_tokens=100, max_tokens=1024)
+# "encode" (default) encodes every final chunk in the same pass that chunks it;
+# "pooled" reuses the chunking-time window embeddings for the stored vectors,
+# an approximation to switch to only once benchmarks/bench_chunk_embeddings.py
+# shows retrieval agrees on the sample contracts. Chunks are at most CHUNK_MAX_TOKENS,
+# and never longer than the embedding model reads (all-MiniLM-L6-v2 truncates
+# at 256 tokens, so longer chunks would be embedded by their start only)
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '256'))
+chunker = SemanticChunker(
+    model=encoder, min_tokens=100, max_tokens=CHUNK_MAX_TOKENS,
+    chunk_embeddings=os.getenv('CHUNK_EMBEDDINGS', 'encode')
+)
+
+# Characters of neighbour context stored with every chunk at ingest, so chat
+# retrieval needs only the query call (0 = fetch neighbours at query time)
+NEIGHBOR_CONTEXT_CHARS = int(os.getenv('NEIGHBOR_CONTEXT_CHARS', '400'))
+metadata_builder = BuildMetaData(context_chars=NEIGHBOR_CONTEXT_CHARS)
 
-pdf_highlighter = PDFHighlighter(
+pdf_highlighter = Lazy("pdf_highlighter", lambda: PDFHighlighter(
     model=encoder,
-    stopwords_set=stopwords_set,
+    stopwords_set=load_stopwords('english'),
     similarity_threshold=0.63,
     min_sentence_length=10
-)
+))
 
-# Setup Pinecone Index as global
+# Vector index handle (see VECTOR_BACKEND). The Pinecone one is created once
+# per process and shared by every request; chat turns make no control-plane calls
 index_name = "covenant-ai"
-build_vectordb(index_name=index_name)
-pc_index = Pinecone.Index(index_name)
+vector_store = VectorStore(index_name, pool_maxsize=VECTOR_STORE_POOL_SIZE, max_retries=VECTOR_STORE_RETRIES)
+pc_index = Lazy("vector_index", _load_vector_index)
+
+# Per-document BM25 indexes built at ingest; exact-term questions skip the
+# vector store, others fuse both rankings
+LEXICAL_INDEX_DIR = os.getenv('LEXICAL_INDEX_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'covenant-ai', 'lexical'))
+lexical_index = LexicalIndex(LEXICAL_INDEX_DIR, stopwords=load_stopwords('english'))
 
-# Initialize global chatbot variable
-# Initialize Chatbot
-chatbot = RAGChatbot(
+retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_DB, max_entries=RETRIEVAL_CACHE_ENTRIES, ttl_seconds=RETRIEVAL_CACHE_TTL)
+
+chatbot = Lazy("chatbot", lambda: RAGChatbot(
     api_key=os.getenv('GEMINI_API'),
-    model=encoder
-)
+    model=encoder,
+    retrieval_cache=retrieval_cache,
+    lexical_index=lexical_index,
+    fetch_concurrency=CHAT_FETCH_CONCURRENCY
+))
+
+# Everything /warmup loads and /readyz checks, in load order. Local
+# components come first: they are what gunicorn preloads in the master.
+LOCAL_COMPONENTS = [sentence_model, embedding_cache, pdf_highlighter]
+NETWORK_COMPONENTS = [supabase, pc_index, model, summarizer, chatbot]
+COMPONENTS = LOCAL_COMPONENTS + NETWORK_COMPONENTS
+
+def warm_up(components=COMPONENTS):
+    """Load the given components, returning each one's status"""
+    for component in components:
+        try:
+            component.get()
+        except Exception as e:
+            print(f"Failed to initialize {component.name}: {e}")
+    return {component.name: component.status() for component in components}
+
+def reinit_after_fork():
+    """
+    Reset network clients in a forked gunicorn worker (see gunicorn_config.py).
+    The embedding model and cache are inherited from the preloaded master;
+    sockets and gRPC channels are not safe to share, so every worker creates
+    its own clients on first use. A Pinecone host already resolved before the
+    fork is kept, so those workers skip the control-plane calls.
+    """
+    vector_store.reset()
+    for component in NETWORK_COMPONENTS:
+        component.reset()
+
+    if EMBEDDING_BACKEND == "onnx":
+        # ONNX Runtime sessions own thread pools that do not survive fork
+        sentence_model.reset()
+
+# Time to first token and total time of streamed chat answers (GET /stats/chat)
+chat_latency = ChatLatency()
+
+def sse_event(data, event=None):
+    """One Server-Sent Events message carrying data as JSON"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.context_processor
+def inject_chat_url():
+    return {'chat_stream_url': f"{CHAT_URL}/stream" if CHAT_URL else url_for('chat_stream')}
 
 # Custom filter for datetime formatting
 @app.template_filter('format_datetime')
@@ -92,82 +256,408 @@ def index():
     contracts = response.data
     return render_template('index.html', contracts=contracts)
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    global chatbot  # Make chatbot accessible outside function
-    global pc_index
-
-    if 'contract' not in request.files:
-        return redirect(request.url)
-    
-    file = request.files['contract']
-    contract_title = request.form.get('contract_title')
+def reuse_duplicate_upload(content_hash, contract_title):
+    """
+    Look for a contract uploaded with the same SHA-256. The same title reuses
+    the existing contract; a new title clones its summary, storage object and
+    vectors into a new contract. Returns the contract id to show, or None.
+    """
+    response = supabase.table('Contract').select('*').eq('content_hash', content_hash) \
+        .order('created_at', desc=True).limit(1).execute()
+    if not response.data:
+        return None
+
+    existing = response.data[0]
+    if not existing.get('contract_summary'):
+        # The earlier ingestion has not finished
+        return None
+    if not contract_title or contract_title == existing['title']:
+        return existing['id']
+
+    insert_result = supabase.table('Contract').insert({
+        'title': contract_title,
+        'created_at': datetime.now().isoformat(),
+        'contract_pdf': existing['contract_pdf'],
+        'contract_summary': existing['contract_summary'],
+        'highlight_pdf': existing.get('highlight_pdf'),
+        'content_hash': content_hash
+    }).execute()
+    clone = insert_result.data[0]
 
-    if file.filename == '' or not file.filename.lower().endswith('.pdf'):
-        return redirect(request.url)
-    
     try:
-        # Save PDF Temporarily
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, secure_filename(file.filename))
-        file.save(temp_path)
+        clone_document_vectors(pc_index, existing['id'], clone['id'], clone['title'])
+        lexical_index.copy(existing['id'], clone['id'], clone['title'])
+        retrieval_cache.invalidate(clone['id'])
+    except Exception:
+        supabase.table('Contract').delete().eq('id', clone['id']).execute()
+        raise
+    return clone['id']
+
+def discard_contract(contract_id, chunks, file_name=None):
+    """
+    Remove what a failed or interrupted ingestion left behind: the Contract
+    row, the first `chunks` chunk vectors (with their content-store rows),
+    the BM25 index, cached retrievals and, if given, the stored PDF.
+    """
+    # The row goes first, so the contract is no longer listed even if a later step fails
+    supabase.table('Contract').delete().eq('id', contract_id).execute()
+    ids = [f"{contract_id}#{i}" for i in range(chunks)]
+    for i in range(0, len(ids), 1000):
+        pc_index.delete(ids=ids[i:i + 1000])
+    lexical_index.delete(contract_id)
+    retrieval_cache.invalidate(contract_id)
+    if file_name:
+        supabase.storage.from_(BUCKET_NAME).remove([file_name])
+
+def discard_previous_attempt(job):
+    """
+    Remove what an earlier run of a requeued upload job left behind (its
+    worker died or stalled mid-ingestion). process_upload records the stored
+    file name, the contract id and the chunks submitted in the job's progress
+    as soon as they exist.
+    """
+    previous = job.get('progress') or {}
+    file_name = previous.get('file_name')
+    if file_name is None:
+        return
+    contract_id = previous.get('contract_id')
+    if contract_id is None:
+        # The run may have stopped between inserting the row and recording its id
+        rows = supabase.table('Contract').select('id').eq('contract_pdf', file_name).execute().data
+        contract_id = rows[0]['id'] if rows else None
+    print(f"Discarding contract {contract_id} ({file_name}) left by an earlier run of job {job['id']}")
+    if contract_id is None:
+        supabase.storage.from_(BUCKET_NAME).remove([file_name])
+    else:
+        discard_contract(contract_id, previous.get('submitted', 0), file_name)
+
+def process_upload(job, report):
+    """
+    Run the ingestion pipeline for a queued upload. Called by the worker
+    process (src/worker.py); report(stage, **counts) records progress.
+    """
+    payload = job['payload']
+    pdf_path = payload.get('path')
+    # Small uploads travel in the job itself; Supabase and the extractor
+    # share that one buffer. Spilled uploads are read from disk instead.
+    pdf_source = job['data'] if job.get('data') is not None else pdf_path
 
-        # Process text extraction, summarization, and chunking
-        extractor = PDFTextExtractor(temp_path)
-        all_text = "\n".join([page['text'] for page in extractor.extract_text()['text']])
-        summary = summarizer._run(text=all_text)
-        chunked_text = chunker.chunk_text(text=all_text)
+    try:
+        discard_previous_attempt(job)
 
         # Generate a unique filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_name = f"{timestamp}_{secure_filename(file.filename)}"
+        file_name = f"{timestamp}_{payload['filename']}"
+        # Recorded before anything is written, so a retry can clean up after this run
+        report('uploading', file_name=file_name, submitted=0)
 
         # Upload PDF to Supabase
-        with open(temp_path, 'rb') as f:
-            supabase.storage.from_(BUCKET_NAME).upload(file_name, f.read(), file_options={"content-type": "application/pdf"})
+        supabase.storage.from_(BUCKET_NAME).upload(file_name, pdf_source, file_options={"content-type": "application/pdf"})
 
-        # Insert Contract into Database
+        # Insert Contract first so its id is known while vectors stream in;
+        # the summary is filled in once the whole text has been seen
         insert_result = supabase.table('Contract').insert({
-            'title': contract_title,
+            'title': payload['title'],
             'created_at': datetime.now().isoformat(),
             'contract_pdf': file_name,
-            'contract_summary': summary
+            'content_hash': payload['content_hash']
         }).execute()
 
-        # Fetch Latest Contract ID
-        response = supabase.table('Contract').select('id, title').order('created_at', desc=True).limit(1).execute()
-        if not response.data:
-            return "No contracts found", 404
-
-        latest_contract = response.data[0]
+        latest_contract = insert_result.data[0]
         latest_id, latest_title = latest_contract['id'], latest_contract['title']
+        report('uploading', contract_id=latest_id)
 
-        # Build Metadata
-        metadata_builder = MetadataBuilder()
-        metadata = metadata_builder.build(chunks=chunked_text, doc_id=latest_id, doc_title=latest_title, lease_type='lease')
-
-        # Encode and Upsert Metadata
-        ids = [m["id"] for m in metadata]
-        embeds = encoder.encode([m["content"] for m in metadata])
-        batch_size = 128
+        # Stream pages through chunking, encoding and upserting, keeping the
+        # page texts for the summarizer
+        extractor = PDFTextExtractor(pdf_source, workers=PDF_EXTRACT_WORKERS, extract_tables=PDF_EXTRACT_TABLES,
+                                     ocr_workers=OCR_WORKERS, ocr_cache=ocr_cache)
+        page_texts = []
 
-        for i in range(0, len(metadata), batch_size):
-            i_end = min(i + batch_size, len(metadata))
-            batch_ids = ids[i:i_end]
-            batch_embeds = embeds[i:i_end]
-            batch_metadata = metadata[i:i_end]
+        def pages():
+            for page in extractor.iter_pages():
+                page_texts.append(page['text'])
+                report('extracting', pages=len(page_texts))
+                yield page['text']
 
-            pc_index.upsert(vectors=zip(batch_ids, batch_embeds, batch_metadata))
+        pipeline = None
+        try:
+            report('extracting', pages=0, total_pages=extractor.page_count())
+            pipeline = IngestionPipeline(chunker=chunker, encoder=encoder, index=pc_index, metadata_builder=metadata_builder,
+                                         lexical_index=lexical_index)
+            pipeline.run(pages(), doc_id=latest_id, doc_title=latest_title, lease_type='lease', progress=report)
+            # The contract was listed (and could be chatted with) while its
+            # vectors streamed in; drop anything cached from that window
+            retrieval_cache.invalidate(latest_id)
+
+            report('summarizing')
+            summary = summarizer._run(text="\n".join(page_texts))
+            supabase.table('Contract').update({'contract_summary': summary}).eq('id', latest_id).execute()
+        except Exception:
+            # Leave nothing behind for a new upload of the same file
+            try:
+                discard_contract(latest_id, pipeline.chunks_submitted if pipeline else 0, file_name)
+            except Exception as cleanup_error:
+                print(f"Cleaning up contract {latest_id} failed: {cleanup_error}")
+            raise
+
+        return {'contract_id': latest_id}
 
+    finally:
         # Cleanup
-        os.remove(temp_path)
-        os.rmdir(temp_dir)
+        if pdf_path and os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+def remove_unreferenced_files(file_names):
+    """
+    Delete stored PDFs no Contract row points to any more. Rows cloned from
+    a duplicate upload share their source's files, so those are kept.
+    """
+    for file_name in set(filter(None, file_names)):
+        referenced = any(
+            supabase.table('Contract').select('id').eq(column, file_name).limit(1).execute().data
+            for column in ('contract_pdf', 'highlight_pdf')
+        )
+        if not referenced:
+            supabase.storage.from_(BUCKET_NAME).remove([file_name])
+
+def process_revision(job, report):
+    """
+    Re-index a new revision of an existing contract in place: only changed
+    chunks are embedded and upserted, and the contract keeps its id.
+    """
+    payload = job['payload']
+    pdf_path = payload.get('path')
+    pdf_source = job['data'] if job.get('data') is not None else pdf_path
+    contract_id = payload['contract_id']
+
+    try:
+        contract = supabase.table('Contract').select('title, contract_pdf, highlight_pdf').eq('id', contract_id).single().execute().data
+        # An earlier run of a requeued job may have uploaded its copy already
+        remove_unreferenced_files([(job.get('progress') or {}).get('file_name')])
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        file_name = f"{timestamp}_{payload['filename']}"
+        report('uploading', file_name=file_name)
+        supabase.storage.from_(BUCKET_NAME).upload(file_name, pdf_source, file_options={"content-type": "application/pdf"})
+
+        extractor = PDFTextExtractor(pdf_source, workers=PDF_EXTRACT_WORKERS, extract_tables=PDF_EXTRACT_TABLES,
+                                     ocr_workers=OCR_WORKERS, ocr_cache=ocr_cache)
+        report('extracting', pages=0, total_pages=extractor.page_count())
+        page_texts = []
+        for page in extractor.iter_pages():
+            page_texts.append(page['text'])
+            report('extracting', pages=len(page_texts))
+
+        reindexer = IncrementalReindexer(chunker=chunker, encoder=encoder, index=pc_index, metadata_builder=metadata_builder,
+                                         reuse_chunk_embeddings=chunker.chunk_embeddings == "pooled",
+                                         lexical_index=lexical_index)
+        counts = reindexer.run(page_texts, doc_id=contract_id, doc_title=contract['title'],
+                               lease_type='lease', progress=report)
+        # Answers cached from the previous revision's chunks are now wrong
+        retrieval_cache.invalidate(contract_id)
+
+        report('summarizing')
+        summary = summarizer._run(text="\n".join(page_texts))
+        # The highlighted copy belongs to the previous revision
+        supabase.table('Contract').update({
+            'contract_pdf': file_name,
+            'content_hash': payload['content_hash'],
+            'contract_summary': summary,
+            'highlight_pdf': None
+        }).eq('id', contract_id).execute()
 
-        return redirect(url_for('view_contract', id=latest_id))
+        # The previous revision's PDF and highlighted copy are no longer used
+        try:
+            remove_unreferenced_files([contract.get('contract_pdf'), contract.get('highlight_pdf')])
+        except Exception as e:
+            print(f"Removing the previous revision of contract {contract_id} failed: {e}")
+
+        return {'contract_id': contract_id, **counts}
+
+    finally:
+        if pdf_path and os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+def hash_upload(file):
+    """SHA-256 of an uploaded file, read straight from the upload stream"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+        digest.update(block)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+def enqueue_pdf(kind, file, payload):
+    """Queue a job for an uploaded PDF and return the job id"""
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    if size <= UPLOAD_SPILL_BYTES:
+        # Hand the bytes to the worker with the job, no temp file involved
+        return job_queue.enqueue(kind, payload, data=stream.read())
+    # Large uploads are kept on disk until the worker has processed them
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{payload['filename']}")
+    file.save(pdf_path)
+    payload['path'] = os.path.abspath(pdf_path)
+    return job_queue.enqueue(kind, payload)
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    if 'contract' not in request.files:
+        return redirect(request.url)
+    
+    file = request.files['contract']
+    contract_title = request.form.get('contract_title')
+
+    if file.filename == '' or not file.filename.lower().endswith('.pdf'):
+        return redirect(request.url)
+    
+    try:
+        filename = secure_filename(file.filename)
+        content_hash = hash_upload(file)
+
+        # Reuse a previous ingestion of the exact same file if there is one
+        duplicate_id = reuse_duplicate_upload(content_hash, contract_title)
+        if duplicate_id is not None:
+            return redirect(url_for('view_contract', id=duplicate_id))
+
+        payload = {
+            'filename': filename,
+            'title': contract_title,
+            'content_hash': content_hash
+        }
+        job_id = enqueue_pdf('ingest_contract', file, payload)
+        return redirect(url_for('view_job', job_id=job_id))
 
     except Exception as e:
         return f"Error: {str(e)}", 500
 
+@app.route('/contract/<int:id>/revise', methods=['POST'])
+def revise_contract(id):
+    """Upload a new revision of an existing contract"""
+    file = request.files.get('contract')
+    if file is None or file.filename == '' or not file.filename.lower().endswith('.pdf'):
+        return redirect(url_for('view_contract', id=id))
+
+    try:
+        contract = supabase.table('Contract').select('id, title, content_hash').eq('id', id).single().execute().data
+        content_hash = hash_upload(file)
+        if content_hash == contract.get('content_hash'):
+            # Same file as the current revision, nothing to re-index
+            return redirect(url_for('view_contract', id=id))
+
+        payload = {
+            'contract_id': id,
+            'title': contract['title'],
+            'filename': secure_filename(file.filename),
+            'content_hash': content_hash
+        }
+        job_id = enqueue_pdf('revise_contract', file, payload)
+        return redirect(url_for('view_job', job_id=job_id))
+
+    except Exception as e:
+        return f"Error: {str(e)}", 500
+
+@app.route('/jobs/<int:job_id>')
+def view_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return "Job not found", 404
+    return render_template('job.html', job=job)
+
+@app.route('/jobs/<int:job_id>/status')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    status = {
+        "id": job['id'],
+        "status": job['status'],
+        "stage": job['stage'],
+        "progress": job['progress'],
+        "error": job['error']
+    }
+    if job['result'] and job['result'].get('contract_id'):
+        status['contract_url'] = url_for('view_contract', id=job['result']['contract_id'])
+    return jsonify(status)
+
+@app.route('/healthz')
+def healthz():
+    # Liveness only: the process is up and serving
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    components = {component.name: component.status() for component in COMPONENTS}
+    ready = all(status['loaded'] for status in components.values())
+    return jsonify({"ready": ready, "components": components}), 200 if ready else 503
+
+@app.route('/warmup', methods=['GET', 'POST'])
+def warmup():
+    components = warm_up()
+    ready = all(status['loaded'] for status in components.values())
+    return jsonify({"ready": ready, "components": components}), 200 if ready else 503
+
+@app.route('/stats/embeddings')
+def embedding_stats():
+    return jsonify({
+        "cache": embedding_cache.stats(),
+        "batcher": encode_batcher.stats()
+    })
+
+@app.route('/stats/retrieval')
+def retrieval_stats():
+    return jsonify({
+        "cache": retrieval_cache.stats(),
+        "vector_store": vector_store.stats()
+    })
+
+@app.route('/stats/chat')
+def chat_stats():
+    return jsonify(chat_latency.stats())
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming /chat. The answer is sent as Server-Sent Events while Gemini
+    writes it: "data" events carry {"text": ...} pieces, then a "done" event
+    reports the time to first token and the total time (or an "error" event
+    the error). The full answer is added to the chat history once complete.
+    """
+    data = request.get_json()
+    user_input = data.get("prompt", "")
+    doc_id = data.get("doc_id")
+    start = time.perf_counter()
+
+    def events():
+        if not user_input:
+            yield sse_event({"text": "Please enter a message."})
+            yield sse_event({}, event="done")
+            return
+
+        first_token = None
+        try:
+            for text in chatbot.generate_response_stream(user_input, pc_index, doc_id):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                yield sse_event({"text": text})
+        except Exception as e:
+            import traceback
+            print(traceback.format_exc())
+            yield sse_event({"error": str(e)}, event="error")
+            return
+
+        total = time.perf_counter() - start
+        first_token = total if first_token is None else first_token
+        chat_latency.record(first_token, total)
+        print(f"Chat answer streamed: first token {first_token * 1000:.0f} ms, total {total * 1000:.0f} ms")
+        yield sse_event({"first_token_ms": round(first_token * 1000, 1), "total_ms": round(total * 1000, 1)}, event="done")
+
+    # No caching or proxy buffering, so every piece reaches the browser as it is written
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     global chatbot  # Access the global chatbot instance
@@ -180,10 +670,6 @@ def chat():
     doc_id = data.get("doc_id")
     print(f"DEBUG PRINT {doc_id} -- {type(doc_id)}")
 
-    index_name = "covenant-ai"
-    build_vectordb(index_name=index_name)
-    pc_index = Pinecone.Index(index_name)
-
     if not user_input:
         return jsonify({"response": "Please enter a message."})
 
@@ -295,18 +781,11 @@ def download_contract(contract_id):
         
         contract = response.data[0]
         
-        # Create a temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        
-        # Download the file data
+        # Download the file data and serve it straight from memory
         data = supabase.storage.from_(BUCKET_NAME).download(contract['contract_pdf'])
         
-        # Write to temporary file
-        with open(temp_file.name, 'wb') as f:
-            f.write(data)
-        
         return send_file(
-            temp_file.name,
+            io.BytesIO(data),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=os.path.basename(contract['contract_pdf'])
@@ -314,10 +793,6 @@ def download_contract(contract_id):
     except Exception as e:
         print(f"Error downloading contract: {str(e)}")
         return f"Error downloading contract: {str(e)}", 500
-    finally:
-        # Cleanup temp file
-        if 'temp_file' in locals() and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 10000))
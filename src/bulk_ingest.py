@@ -0,0 +1,274 @@
+"""
+Bulk ingestion of a directory of contracts.
+
+Documents are extracted and chunked in a background thread while the main
+thread queues their vectors for upsert, which runs concurrently on a thread
+pool. With CHUNK_EMBEDDINGS=encode (the default) the main thread encodes
+chunks in batches that span documents; with pooled embeddings the chunker
+already produced them. Progress is kept in a manifest file so an interrupted run can
+be restarted and picks up where it stopped.
+
+Usage:
+    python src/bulk_ingest.py "sample lease contracts/" --batch-size 256 --upsert-workers 4
+"""
+
+import sys
+import os
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from werkzeug.utils import secure_filename
+
+from rag.core.pipeline import threaded
+from rag.core.upserter import payload_batches
+from rag.ocr.pdfExtractor import PDFTextExtractor
+from src.app import (
+    BUCKET_NAME, OCR_WORKERS, PDF_EXTRACT_TABLES, PDF_EXTRACT_WORKERS, chunker, discard_contract, encoder,
+    lexical_index, metadata_builder, ocr_cache, pc_index, retrieval_cache, reuse_duplicate_upload, summarizer,
+    supabase
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Manifest:
+    """JSON file recording the state of every document, keyed by content hash"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = json.loads(path.read_text()) if path.exists() else {}
+
+    def get(self, content_hash):
+        with self.lock:
+            return self.entries.get(content_hash)
+
+    def set(self, content_hash, **entry):
+        with self.lock:
+            self.entries[content_hash] = entry
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(self.entries, indent=2))
+            os.replace(tmp_path, self.path)
+
+
+class BulkIngester:
+    def __init__(self, manifest: Manifest, batch_size: int = 256, upsert_workers: int = 4,
+                 summary_workers: int = 2):
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.metadata_builder = metadata_builder
+        # Pooled chunk embeddings come free with chunking; otherwise chunks are
+        # encoded here in batches that span documents
+        self.reuse_chunk_embeddings = chunker.chunk_embeddings == "pooled"
+        self.upsert_pool = ThreadPoolExecutor(max_workers=upsert_workers, thread_name_prefix="upsert")
+        # Upsert batches queued or running at once; encoding waits for a free
+        # slot instead of buffering the whole corpus in the pool's queue
+        self.upsert_slots = threading.BoundedSemaphore(2 * upsert_workers)
+        self.summary_pool = ThreadPoolExecutor(max_workers=summary_workers, thread_name_prefix="summary")
+        self.lock = threading.Lock()
+        self.outstanding = {}  # content hash -> unfinished upsert batches + summary
+        self.completed = 0
+        self.failed = 0
+
+    def _discard_partial(self, entry):
+        """Remove the contract row, vectors, BM25 index and stored PDF left by an interrupted or failed run"""
+        doc_id = entry['contract_id']
+        file_name = entry.get('file_name')
+        if file_name is None:
+            # Manifests written before the file name was recorded
+            rows = supabase.table('Contract').select('contract_pdf').eq('id', doc_id).execute().data
+            file_name = rows[0]['contract_pdf'] if rows else None
+        discard_contract(doc_id, entry['chunks'], file_name)
+
+    def prepare(self, path: Path):
+        """Extract, chunk and register one document. Returns None when it is skipped."""
+        pdf_bytes = path.read_bytes()
+        content_hash = hashlib.sha256(pdf_bytes).hexdigest()
+
+        entry = self.manifest.get(content_hash)
+        if entry and entry['status'] == 'done':
+            return None
+        if entry and entry['status'] == 'indexing':
+            logger.info(f"Discarding partial ingestion of {path.name}")
+            self._discard_partial(entry)
+
+        title = path.stem
+        duplicate_id = reuse_duplicate_upload(content_hash, title)
+        if duplicate_id is not None:
+            self.manifest.set(content_hash, path=str(path), contract_id=duplicate_id, status='done')
+            return None
+
+        # One buffer serves hashing, extraction and the storage upload
+        extractor = PDFTextExtractor(pdf_bytes, workers=PDF_EXTRACT_WORKERS, extract_tables=PDF_EXTRACT_TABLES,
+                                     ocr_workers=OCR_WORKERS, ocr_cache=ocr_cache)
+        page_texts = [page['text'] for page in extractor.iter_pages()]
+        if self.reuse_chunk_embeddings:
+            chunked = list(chunker.chunk_stream(page_texts, return_embeddings=True))
+            chunks = [chunk for chunk, _ in chunked]
+            embeds = [embed for _, embed in chunked]
+        else:
+            chunks = list(chunker.chunk_stream(page_texts))
+            embeds = [None] * len(chunks)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        file_name = f"{timestamp}_{secure_filename(path.name)}"
+        supabase.storage.from_(BUCKET_NAME).upload(file_name, pdf_bytes, file_options={"content-type": "application/pdf"})
+        insert_result = supabase.table('Contract').insert({
+            'title': title,
+            'created_at': datetime.now().isoformat(),
+            'contract_pdf': file_name,
+            'content_hash': content_hash
+        }).execute()
+        doc_id = insert_result.data[0]['id']
+
+        self.manifest.set(content_hash, path=str(path), contract_id=doc_id, chunks=len(chunks), file_name=file_name,
+                          status='indexing')
+        metadata = self.metadata_builder.build(chunks=chunks, doc_id=doc_id, doc_title=title, lease_type='lease')
+        lexical_index.add(doc_id, title, chunks)
+        return path, content_hash, doc_id, "\n".join(page_texts), list(zip(metadata, embeds))
+
+    def _finish_part(self, content_hash, future):
+        """Called when one upsert batch or the summary of a document completes"""
+        with self.lock:
+            state = self.outstanding[content_hash]
+            if future.exception() is not None:
+                logger.error(f"Ingestion of {state['path']} failed: {future.exception()}")
+                state['failed'] = True
+            state['remaining'] -= 1
+        self._maybe_complete(content_hash)
+
+    def _mark_queued(self, content_hash):
+        """Every upsert of the document has been submitted"""
+        with self.lock:
+            self.outstanding[content_hash]['queued'] = True
+        self._maybe_complete(content_hash)
+
+    def _maybe_complete(self, content_hash):
+        with self.lock:
+            state = self.outstanding.get(content_hash)
+            if state is None or state['remaining'] or not state['queued']:
+                return
+            del self.outstanding[content_hash]
+            if state['failed']:
+                # Left as 'indexing' in the manifest so the next run retries it
+                self.failed += 1
+                return
+            self.completed += 1
+
+        # Chats during ingestion may have cached results from a partial document
+        retrieval_cache.invalidate(state['doc_id'])
+        self.manifest.set(content_hash, path=state['path'], contract_id=state['doc_id'],
+                          chunks=state['chunks'], status='done')
+
+    def _add_part(self, content_hash, fn, *args):
+        with self.lock:
+            self.outstanding[content_hash]['remaining'] += 1
+        future = fn(*args)
+        future.add_done_callback(lambda f: self._finish_part(content_hash, f))
+
+    def _submit_upsert(self, batch):
+        self.upsert_slots.acquire()
+        try:
+            future = self.upsert_pool.submit(pc_index.upsert, batch)
+        except BaseException:
+            self.upsert_slots.release()
+            raise
+        future.add_done_callback(lambda _: self.upsert_slots.release())
+        return future
+
+    def _summarize(self, doc_id, text):
+        summary = summarizer._run(text=text)
+        supabase.table('Contract').update({'contract_summary': summary}).eq('id', doc_id).execute()
+
+    def _flush(self, pending):
+        """Encode one cross-document batch and queue its upserts"""
+        missing = [m["content"] for _, m, _, embed in pending if embed is None]
+        encoded = iter(encoder.encode(missing)) if missing else iter(())
+        by_doc = {}
+        for content_hash, m, _, embed in pending:
+            embed = next(encoded) if embed is None else embed
+            by_doc.setdefault(content_hash, []).append((m["id"], embed.tolist(), m))
+        for content_hash, vectors in by_doc.items():
+            # Batches sized by request payload rather than vector count
+            for batch in payload_batches(vectors):
+                self._add_part(content_hash, self._submit_upsert, batch)
+        # Documents whose last chunk was in this batch are now fully queued
+        for content_hash, _, is_last, _ in pending:
+            if is_last:
+                self._mark_queued(content_hash)
+
+    def _prepare_all(self, paths):
+        for path in paths:
+            try:
+                doc = self.prepare(path)
+            except Exception as e:
+                logger.error(f"Preparing {path.name} failed: {e}")
+                with self.lock:
+                    self.failed += 1
+                continue
+            if doc is not None:
+                yield doc
+
+    def run(self, paths):
+        start = time.perf_counter()
+        pending = []
+
+        # Extraction and chunking of upcoming documents overlaps with encoding
+        for path, content_hash, doc_id, text, chunks in threaded(self._prepare_all(paths), maxsize=2):
+            with self.lock:
+                self.outstanding[content_hash] = {
+                    'path': str(path), 'doc_id': doc_id,
+                    'chunks': len(chunks), 'remaining': 0, 'queued': False, 'failed': False
+                }
+            self._add_part(content_hash, self.summary_pool.submit, self._summarize, doc_id, text)
+            if not chunks:
+                self._mark_queued(content_hash)
+            for i, (m, embed) in enumerate(chunks):
+                pending.append((content_hash, m, i + 1 == len(chunks), embed))
+                if len(pending) >= self.batch_size:
+                    self._flush(pending)
+                    pending = []
+            self._report(start)
+
+        if pending:
+            self._flush(pending)
+        self.upsert_pool.shutdown(wait=True)
+        self.summary_pool.shutdown(wait=True)
+        self._report(start)
+
+    def _report(self, start):
+        minutes = (time.perf_counter() - start) / 60
+        logger.info(f"{self.completed} docs done, {self.failed} failed, "
+                    f"{self.completed / minutes if minutes else 0.0:.1f} docs/min")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Directory containing PDF contracts")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per encoder call, across documents")
+    parser.add_argument("--upsert-workers", type=int, default=4, help="Concurrent upsert requests")
+    parser.add_argument("--summary-workers", type=int, default=2, help="Concurrent summarization requests")
+    parser.add_argument("--manifest", help="Progress file (default: <directory>/.ingest_manifest.json)")
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    manifest = Manifest(Path(args.manifest) if args.manifest else directory / ".ingest_manifest.json")
+    paths = sorted(p for p in directory.iterdir() if p.suffix.lower() == ".pdf")
+    logger.info(f"Ingesting {len(paths)} PDF(s) from {directory}")
+
+    BulkIngester(manifest, args.batch_size, args.upsert_workers, args.summary_workers).run(paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Async chat server. Serves the same POST /chat and /chat/stream as the Flask
+app, but on an asyncio event loop, so one process holds many chats that are
+waiting on the vector store or Gemini instead of one per worker thread.
+
+Run next to the web app and point the contract page at it with CHAT_URL
+(e.g. CHAT_URL=http://localhost:10001/chat; the web app's origin must then
+be listed in CHAT_ALLOWED_ORIGINS):
+    python src/chat_server.py
+or, with several processes sharing a preloaded model:
+    gunicorn -c gunicorn_config.py --worker-class aiohttp.GunicornWebWorker --bind 0.0.0.0:10001 src.chat_server:application
+"""
+
+import sys
+import os
+import asyncio
+import logging
+import time
+import traceback
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from aiohttp import web
+
+from src.app import COMPONENTS, chat_latency, chatbot, pc_index, sse_event, warm_up
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_ORIGINS = {origin for origin in os.getenv('CHAT_ALLOWED_ORIGINS', '').split(',') if origin}
+
+
+def cors_headers(request):
+    origin = request.headers.get('Origin')
+    if origin not in ALLOWED_ORIGINS:
+        return {}
+    return {
+        'Access-Control-Allow-Origin': origin,
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Vary': 'Origin',
+    }
+
+
+async def chat(request):
+    headers = cors_headers(request)
+    data = await request.json()
+    user_input = data.get("prompt", "")
+    doc_id = data.get("doc_id")
+
+    if not user_input:
+        return web.json_response({"response": "Please enter a message."}, headers=headers)
+
+    try:
+        # First use creates the chatbot and index handle; keep that off the loop
+        bot = await asyncio.to_thread(chatbot.get)
+        index = await asyncio.to_thread(pc_index.get)
+        response = await bot.agenerate_response(user_input, index, doc_id)
+        return web.json_response({"response": response}, headers=headers)
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        return web.json_response({"response": f"Error: {str(e)}"}, status=500, headers=headers)
+
+
+async def chat_stream(request):
+    """Streaming /chat: the answer as Server-Sent Events, as in the Flask app's /chat/stream"""
+    start = time.perf_counter()
+    data = await request.json()
+    user_input = data.get("prompt", "")
+    doc_id = data.get("doc_id")
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+        **cors_headers(request)
+    })
+    await response.prepare(request)
+
+    if not user_input:
+        await response.write(sse_event({"text": "Please enter a message."}).encode())
+        await response.write(sse_event({}, event="done").encode())
+        return response
+
+    first_token = None
+    try:
+        bot = await asyncio.to_thread(chatbot.get)
+        index = await asyncio.to_thread(pc_index.get)
+        async for text in bot.agenerate_response_stream(user_input, index, doc_id):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            await response.write(sse_event({"text": text}).encode())
+    except ConnectionResetError:
+        # The client went away mid-answer (aiohttp's ClientConnectionResetError
+        # is a ConnectionResetError); nobody is left to tell
+        logger.info("Chat stream closed by the client")
+        return response
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        try:
+            await response.write(sse_event({"error": str(e)}, event="error").encode())
+        except ConnectionResetError:
+            pass
+        return response
+
+    total = time.perf_counter() - start
+    first_token = total if first_token is None else first_token
+    chat_latency.record(first_token, total)
+    logger.info(f"Chat answer streamed: first token {first_token * 1000:.0f} ms, total {total * 1000:.0f} ms")
+    try:
+        await response.write(sse_event({"first_token_ms": round(first_token * 1000, 1),
+                                        "total_ms": round(total * 1000, 1)}, event="done").encode())
+    except ConnectionResetError:
+        pass
+    return response
+
+
+async def chat_stats(request):
+    return web.json_response(chat_latency.stats())
+
+
+async def preflight(request):
+    return web.Response(headers=cors_headers(request))
+
+
+async def readyz(request):
+    statuses = {component.name: component.status() for component in COMPONENTS}
+    ready = all(status['loaded'] for status in statuses.values())
+    return web.json_response({"ready": ready, "components": statuses}, status=200 if ready else 503)
+
+
+async def start_warm_up(app):
+    # Load everything in the background; /readyz reports when it is done
+    app['warm_up'] = asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_post('/chat', chat)
+    app.router.add_route('OPTIONS', '/chat', preflight)
+    app.router.add_post('/chat/stream', chat_stream)
+    app.router.add_route('OPTIONS', '/chat/stream', preflight)
+    app.router.add_get('/stats/chat', chat_stats)
+    app.router.add_get('/readyz', readyz)
+    app.on_startup.append(start_warm_up)
+    return app
+
+
+application = create_app()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(application, port=int(os.getenv('CHAT_PORT', '10001')))
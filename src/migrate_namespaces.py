@@ -0,0 +1,107 @@
+"""
+Move contracts from the filtered layout of the Pinecone index (every
+contract in one namespace, chat queries filtered on doc_id) to the
+namespaced layout (one namespace per contract, see VECTOR_LAYOUT).
+
+Vectors are copied under the same ids, so the content store, lexical index
+and retrieval cache need no changes. Progress is kept in a manifest file;
+an interrupted run can be restarted and skips contracts already copied.
+Contracts whose namespace was written after the switch are never overwritten.
+
+Rollout:
+    1. stop the worker (uploads wait in the job queue) and any bulk ingest
+    2. python src/migrate_namespaces.py
+    3. restart the web app, chat server and worker with VECTOR_LAYOUT=namespaced
+    4. python src/migrate_namespaces.py            # copies contracts cloned meanwhile
+       python src/migrate_namespaces.py --delete-source
+
+Usage:
+    python src/migrate_namespaces.py --workers 4
+    python src/migrate_namespaces.py --doc-ids 12 34 56
+"""
+
+import sys
+import os
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from rag.core.vector_store import NamespacedIndex, fetch_document_vectors, migrate_document_vectors
+from src.app import supabase, vector_store
+from src.bulk_ingest import Manifest
+
+logger = logging.getLogger(__name__)
+
+
+def contract_ids():
+    response = supabase.table('Contract').select('id').order('id').execute()
+    return [row['id'] for row in response.data]
+
+
+def copy_contract(manifest, source, target, doc_id):
+    entry = manifest.get(str(doc_id))
+    if entry and entry['status'] != 'copying':
+        return 0
+    if entry is None and target.fetch(ids=[f"{doc_id}#0"]).vectors:
+        # Written in the namespaced layout since the switch, so that copy is current
+        manifest.set(str(doc_id), status='copied', vectors=0)
+        return 0
+    manifest.set(str(doc_id), status='copying')
+    start = time.perf_counter()
+    copied = migrate_document_vectors(source, target, doc_id)
+    manifest.set(str(doc_id), status='copied', vectors=copied)
+    logger.info(f"Contract {doc_id}: copied {copied} vectors in {time.perf_counter() - start:.1f}s")
+    return copied
+
+
+def delete_source(manifest, source, doc_id):
+    entry = manifest.get(str(doc_id))
+    if not entry or entry['status'] != 'copied':
+        if (entry is None or entry['status'] == 'copying') and next(fetch_document_vectors(source, doc_id, batch_size=1), None) is not None:
+            logger.warning(f"Contract {doc_id} has not been copied yet; keeping its vectors")
+        return 0
+    ids = [vector_id for vector_id, _, _ in fetch_document_vectors(source, doc_id)]
+    for i in range(0, len(ids), 1000):
+        source.delete(ids=ids[i:i + 1000])
+    manifest.set(str(doc_id), status='deleted', vectors=entry['vectors'])
+    logger.info(f"Contract {doc_id}: deleted {len(ids)} vectors from the shared namespace")
+    return len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doc-ids", nargs="+", help="Contracts to migrate (default: every contract in Supabase)")
+    parser.add_argument("--workers", type=int, default=4, help="Contracts migrated concurrently")
+    parser.add_argument("--delete-source", action="store_true",
+                        help="Delete the filtered-layout vectors of contracts already copied")
+    parser.add_argument("--manifest", default=os.path.join(project_root, ".namespace_manifest.json"),
+                        help="Progress file")
+    args = parser.parse_args()
+
+    manifest = Manifest(Path(args.manifest))
+    source = vector_store.index()
+    target = NamespacedIndex(source)
+    doc_ids = args.doc_ids or contract_ids()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="migrate") as pool:
+        if args.delete_source:
+            counts = list(pool.map(lambda doc_id: delete_source(manifest, source, doc_id), doc_ids))
+            verb = "deleted"
+        else:
+            counts = list(pool.map(lambda doc_id: copy_contract(manifest, source, target, doc_id), doc_ids))
+            verb = "copied"
+    elapsed = time.perf_counter() - start
+    logger.info(f"{sum(counts)} vectors of {sum(1 for count in counts if count)} contract(s) {verb} "
+                f"in {elapsed:.1f}s ({len(doc_ids)} checked)")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
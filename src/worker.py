@@ -0,0 +1,88 @@
+"""
+Background worker that runs queued uploads outside the web process.
+
+Run next to the web app, sharing its upload folder / JOB_DB_PATH:
+    python src/worker.py
+"""
+
+import sys
+import os
+import time
+import logging
+import threading
+import traceback
+
+# Add the project root directory to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from src.app import job_queue, process_revision, process_upload
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+# A running job's worker records a heartbeat this often; a job with no
+# heartbeat for JOB_STALE_AFTER seconds is taken to have lost its worker
+HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '10'))
+STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', '120'))
+
+HANDLERS = {
+    'ingest_contract': process_upload,
+    'revise_contract': process_revision,
+}
+
+
+def run_job(job):
+    progress = {}
+    progress_lock = threading.Lock()
+
+    def report(stage, **counts):
+        # Extraction and indexing overlap, so keep every counter seen so far;
+        # they report from different threads
+        with progress_lock:
+            progress.update(counts)
+            job_queue.update_progress(job['id'], stage, **progress)
+
+    # Keep the job's lease alive through long stages that report no progress
+    # (e.g. summarizing), so other workers don't requeue it
+    finished = threading.Event()
+
+    def heartbeat():
+        while not finished.wait(HEARTBEAT_INTERVAL):
+            job_queue.heartbeat(job['id'])
+
+    threading.Thread(target=heartbeat, name=f"heartbeat-{job['id']}", daemon=True).start()
+
+    try:
+        result = HANDLERS[job['kind']](job, report)
+        job_queue.complete(job['id'], result)
+        logger.info(f"Job {job['id']} finished: {result}")
+    except Exception as e:
+        logger.error(f"Job {job['id']} failed: {traceback.format_exc()}")
+        job_queue.fail(job['id'], str(e))
+    finally:
+        finished.set()
+
+
+def requeue_stale():
+    requeued = job_queue.requeue_stale(STALE_AFTER)
+    if requeued:
+        logger.info(f"Requeued {requeued} job(s) whose worker stopped sending heartbeats")
+
+
+def main():
+    requeue_stale()
+
+    logger.info("Worker waiting for jobs")
+    while True:
+        # Also while running: picks up the jobs of a worker that died meanwhile
+        requeue_stale()
+        job = job_queue.claim()
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(job)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the project packages the way the scripts do
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
@@ -0,0 +1,72 @@
+import threading
+
+from rag.core.content_store import ContentStore, ContentStoreIndex
+from rag.core.local_index import LocalIndex
+
+
+def fields(doc_id, i):
+    return {"content": f"chunk {i} of {doc_id}", "title": f"Lease {doc_id}", "prechunk_context": "",
+            "postchunk_context": f"chunk {i + 1} of {doc_id}"}
+
+
+def test_round_trip_across_instances(tmp_path):
+    db_path = str(tmp_path / "content.db")
+    ContentStore(db_path).put_many([(f"1#{i}", 1, fields(1, i)) for i in range(3)])
+
+    store = ContentStore(db_path)
+    assert store.get_many(["1#0", "1#2", "1#9"]) == {"1#0": fields(1, 0), "1#2": fields(1, 2)}
+    store.put_many([("1#0", 1, {"content": "rewritten"})])
+    store.delete_many(["1#2"])
+    assert store.get_many(["1#0", "1#1", "1#2"]) == {"1#0": {"content": "rewritten"}, "1#1": fields(1, 1)}
+    # Reads and deletes are split to stay under SQLite's parameter limit
+    assert store.get_many([f"2#{i}" for i in range(1200)]) == {}
+    store.delete_many([f"1#{i}" for i in range(1200)])
+    assert store.get_many(["1#0", "1#1"]) == {}
+
+
+def test_index_keeps_text_out_of_the_vectors(tmp_path):
+    vectors = LocalIndex(tmp_path / "vectors", dim=2)
+    index = ContentStoreIndex(vectors, ContentStore(str(tmp_path / "content.db")))
+    index.upsert([(f"1#{i}", [1.0, float(i)], {"doc_id": 1, "position": i, **fields(1, i)}) for i in range(3)])
+
+    assert vectors.fetch(["1#1"]).vectors["1#1"]["metadata"] == {"doc_id": 1, "position": 1}
+    assert index.fetch(["1#1"]).vectors["1#1"]["metadata"] == {"doc_id": 1, "position": 1, **fields(1, 1)}
+    match = index.query([1.0, 0.0], top_k=1, include_metadata=True, filter={"doc_id": {"$eq": 1}})["matches"][0]
+    assert match["id"] == "1#0"
+    assert match["metadata"]["content"] == "chunk 0 of 1"
+
+    index.delete(ids=["1#0"])
+    assert index.store.get_many(["1#0"]) == {}
+    assert "1#0" not in index.fetch(["1#0"]).vectors
+
+
+def test_vectors_stored_with_their_text_are_returned_as_is(tmp_path):
+    vectors = LocalIndex(tmp_path / "vectors", dim=2)
+    vectors.upsert([("1#0", [1.0, 0.0], {"doc_id": 1, "content": "inline"})])
+    index = ContentStoreIndex(vectors, ContentStore(str(tmp_path / "content.db")))
+    assert index.fetch(["1#0"]).vectors["1#0"]["metadata"]["content"] == "inline"
+
+
+def test_concurrent_writers_and_readers(tmp_path):
+    db_path = str(tmp_path / "content.db")
+    ContentStore(db_path)
+    errors = []
+
+    def write(doc_id):
+        store = ContentStore(db_path)
+        try:
+            for start in range(0, 200, 20):
+                store.put_many([(f"{doc_id}#{i}", doc_id, fields(doc_id, i)) for i in range(start, start + 20)])
+                found = store.get_many([f"{doc_id}#{i}" for i in range(start + 20)])
+                if found != {f"{doc_id}#{i}": fields(doc_id, i) for i in range(start + 20)}:
+                    errors.append(doc_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(doc_id,)) for doc_id in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(ContentStore(db_path).get_many([f"{d}#{i}" for d in range(4) for i in range(200)])) == 800
@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+
+from rag.core.embedding_cache import KEY_BYTES, CachedEncoder, EmbeddingCache
+
+DIM = 8
+
+
+def make_cache(tmp_path, rows=16, memory_items=4):
+    return EmbeddingCache(tmp_path, "test-model", DIM, max_bytes=rows * (DIM * 4 + KEY_BYTES), memory_items=memory_items)
+
+
+def vectors_for(keys):
+    # Derived from the key, so a vector returned for the wrong key is detectable
+    return np.stack([np.frombuffer(key[:DIM], dtype=np.uint8).astype(np.float32) for key in keys])
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        self.encoded.extend(texts)
+        return np.stack([np.full(DIM, len(text), dtype=np.float32) for text in texts])
+
+
+def test_round_trip_across_instances(tmp_path):
+    cache = make_cache(tmp_path)
+    keys = [cache.key(f"text {i}") for i in range(10)]
+    cache.put_many(keys, vectors_for(keys))
+
+    # A second instance (another process) reads the same store from disk
+    other = make_cache(tmp_path)
+    found = other.get_many(keys + [other.key("never stored")])
+    for key, vector in zip(keys, found):
+        np.testing.assert_array_equal(vector, vectors_for([key])[0])
+    assert found[-1] is None
+    assert other.stats()["disk_hits"] == 10
+    assert other.stats()["misses"] == 1
+
+
+def test_normalized_and_raw_keys_differ(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.key("text") != cache.key("text", normalized=True)
+
+
+def test_full_store_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, rows=4, memory_items=1)
+    keys = [cache.key(f"text {i}") for i in range(4)]
+    cache.put_many(keys, vectors_for(keys))
+
+    reader = make_cache(tmp_path, rows=4, memory_items=1)
+    reader.get_many(keys[:1])
+    # Recency updates are batched; the next write applies them before evicting
+    new = [cache.key("new 0"), cache.key("new 1")]
+    reader.put_many(new, vectors_for(new))
+
+    fresh = make_cache(tmp_path, rows=4, memory_items=1)
+    present = [vector is not None for vector in fresh.get_many(keys)]
+    assert present == [True, False, False, True]
+    for key, vector in zip(new, fresh.get_many(new)):
+        np.testing.assert_array_equal(vector, vectors_for([key])[0])
+
+
+def test_read_slot_rejects_a_slot_being_rewritten(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.key("text")
+    cache.put_many([key], vectors_for([key]))
+    slot = 0
+    assert cache._read_slot(key, slot) is not None
+    # A writer in another process has cleared the key before writing the new vector
+    cache._keys[slot] = 0
+    assert cache._read_slot(key, slot) is None
+
+
+def test_concurrent_writers_never_return_another_texts_vector(tmp_path):
+    caches = [make_cache(tmp_path, rows=32, memory_items=1) for _ in range(4)]
+    errors = []
+
+    def work(cache, worker):
+        try:
+            for round_ in range(30):
+                keys = [cache.key(f"{worker} {round_} {i}") for i in range(8)]
+                cache.put_many(keys, vectors_for(keys))
+                for key, vector in zip(keys, cache.get_many(keys)):
+                    if vector is not None and not np.array_equal(vector, vectors_for([key])[0]):
+                        errors.append(key)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(cache, worker)) for worker, cache in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_cached_encoder_encodes_each_text_once(tmp_path):
+    model = CountingEncoder()
+    encoder = CachedEncoder(model, make_cache(tmp_path))
+
+    first = encoder.encode(["a", "bb", "a"])
+    second = encoder.encode(["bb", "ccc"])
+    assert model.encoded == ["a", "bb", "ccc"]
+    np.testing.assert_array_equal(first[:, 0], [1, 2, 1])
+    np.testing.assert_array_equal(second[:, 0], [2, 3])
+    assert encoder.encode("a").shape == (DIM,)
@@ -0,0 +1,87 @@
+import threading
+import time
+from contextlib import closing
+
+from rag.core.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def test_round_trip_across_instances(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    job_id = JobQueue(db_path).enqueue("ingest_contract", {"title": "Lease A"}, data=b"%PDF")
+
+    queue = JobQueue(db_path)
+    job = queue.claim()
+    assert (job["id"], job["status"], job["payload"], job["data"]) == (job_id, RUNNING, {"title": "Lease A"}, b"%PDF")
+    assert queue.claim() is None
+
+    queue.update_progress(job_id, "indexing", pages=3, submitted=10)
+    job = queue.get(job_id)
+    assert (job["stage"], job["progress"]) == ("indexing", {"pages": 3, "submitted": 10})
+    # Status reads leave the data out
+    assert "data" not in job
+
+    queue.complete(job_id, {"contract_id": 5})
+    job = queue.get(job_id)
+    assert (job["status"], job["result"]) == (DONE, {"contract_id": 5})
+    assert queue.get(job_id + 1) is None
+
+
+def test_finished_jobs_drop_their_data(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    done_id = queue.enqueue("ingest_contract", {}, data=b"done")
+    failed_id = queue.enqueue("ingest_contract", {}, data=b"failed")
+    queue.claim()
+    queue.claim()
+    queue.complete(done_id)
+    queue.fail(failed_id, "no text found")
+
+    assert (queue.get(failed_id)["status"], queue.get(failed_id)["error"]) == (FAILED, "no text found")
+    with closing(queue._connect()) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM jobs WHERE data IS NOT NULL").fetchone()[0] == 0
+
+
+def test_only_jobs_without_heartbeats_are_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    stalled_id = queue.enqueue("ingest_contract", {})
+    alive_id = queue.enqueue("ingest_contract", {})
+    queue.claim()
+    queue.claim()
+    queue.update_progress(stalled_id, "uploading", file_name="a.pdf")
+    time.sleep(0.2)
+    queue.heartbeat(alive_id)
+
+    assert queue.requeue_stale(0.1) == 1
+    assert queue.get(alive_id)["status"] == RUNNING
+    assert queue.get(stalled_id)["status"] == QUEUED
+    # The rerun sees what the stalled run recorded, to clean it up
+    job = queue.claim()
+    assert (job["id"], job["progress"]) == (stalled_id, {"file_name": "a.pdf"})
+
+
+def test_concurrent_workers_claim_each_job_once(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    queue = JobQueue(db_path)
+    job_ids = [queue.enqueue("ingest_contract", {"n": n}) for n in range(60)]
+    claimed = []
+    errors = []
+
+    def work():
+        worker_queue = JobQueue(db_path)
+        try:
+            while True:
+                job = worker_queue.claim()
+                if job is None:
+                    return
+                claimed.append(job["id"])
+                worker_queue.complete(job["id"])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(claimed) == job_ids
+    assert all(queue.get(job_id)["status"] == DONE for job_id in job_ids)
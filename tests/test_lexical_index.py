@@ -0,0 +1,84 @@
+import threading
+
+from rag.core.lexical_index import LexicalIndex, exact_terms
+
+CHUNKS = [
+    "The Tenant shall pay a monthly rent of $1,500.00 on the first day of each month.",
+    "Section 4.2 Maintenance. The Landlord shall keep the roof and structure in good repair.",
+    "The security deposit of $3,000 is returned within 30 days after the lease ends.",
+    "Pets are not allowed on the premises without written consent.",
+]
+
+
+def test_exact_terms():
+    assert exact_terms('What does "good repair" mean in section 4.2?') == ["good repair", "4.2"]
+    assert exact_terms("Is the rent $1,500?") == ["1500"]
+    assert exact_terms("Who pays for repairs?") == []
+
+
+def test_round_trip_across_instances(tmp_path):
+    LexicalIndex(tmp_path).add(7, "Lease A", CHUNKS)
+
+    index = LexicalIndex(tmp_path)
+    assert index.title(7) == "Lease A"
+    assert index.chunk(7, 3) == CHUNKS[3]
+    assert index.chunk(7, 4) is None
+
+    hits, exact = index.search(7, "Are pets allowed?", top_k=2)
+    assert hits[0][0] == 3
+    assert exact == []
+    # Amounts match however they are written
+    hits, exact = index.search(7, "Is the rent 1500 dollars?")
+    assert exact == [0]
+    assert index.search(8, "rent") == ([], [])
+
+
+def test_copy_and_delete(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.add(1, "Lease A", CHUNKS)
+    assert index.copy(1, 2, "Lease A (copy)")
+    assert not index.copy(3, 4, "missing")
+
+    index.delete(1)
+    assert index.search(1, "section 4.2") == ([], [])
+    assert index.title(2) == "Lease A (copy)"
+    assert index.search(2, "section 4.2")[1] == [1]
+
+
+def test_rewrite_replaces_the_loaded_document(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.add(1, "Lease A", CHUNKS)
+    assert index.search(1, "pets")[0]
+    LexicalIndex(tmp_path).add(1, "Lease A", CHUNKS[:2])
+    assert index.search(1, "pets") == ([], [])
+    assert index.chunk(1, 2) is None
+
+
+def test_searches_during_rewrites_see_whole_documents(tmp_path):
+    writer = LexicalIndex(tmp_path)
+    writer.add(1, "v0", CHUNKS)
+    done = threading.Event()
+    errors = []
+
+    def read():
+        index = LexicalIndex(tmp_path, max_loaded=1)
+        while not done.is_set():
+            try:
+                hits, exact = index.search(1, '"security deposit" of $3,000', top_k=4)
+                # Whichever version was read, its chunks are all there
+                if exact != [2] or index.chunk(1, hits[0][0]) not in CHUNKS:
+                    errors.append((hits, exact))
+                index.search(2, "rent")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for version in range(1, 30):
+        writer.add(1, f"v{version}", CHUNKS)
+        writer.add(2, f"v{version}", CHUNKS[:1])
+    done.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
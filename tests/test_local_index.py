@@ -0,0 +1,117 @@
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from rag.core.local_index import LocalIndex
+
+DIM = 4
+
+
+def chunk(doc_id, i, values=None, **metadata):
+    if values is None:
+        values = np.eye(DIM, dtype=np.float32)[i % DIM] + i * 0.01
+    return (f"{doc_id}#{i}", list(values), {"doc_id": doc_id, "position": i, **metadata})
+
+
+def doc_filter(doc_id):
+    return {"doc_id": {"$eq": doc_id}}
+
+
+def test_round_trip_across_instances(tmp_path):
+    index = LocalIndex(tmp_path, dim=DIM)
+    index.upsert([chunk("a", i) for i in range(6)] + [chunk("b", 0)])
+
+    other = LocalIndex(tmp_path, dim=DIM)
+    fetched = other.fetch(["a#1", "a#9", "b#0"]).vectors
+    assert set(fetched) == {"a#1", "b#0"}
+    assert fetched["a#1"]["metadata"] == {"doc_id": "a", "position": 1}
+    np.testing.assert_allclose(fetched["a#1"]["values"], chunk("a", 1)[1])
+
+    matches = other.query(chunk("a", 2)[1], top_k=2, include_metadata=True, filter=doc_filter("a"))["matches"]
+    assert [match["id"] for match in matches][0] == "a#2"
+    assert all(match["metadata"]["doc_id"] == "a" for match in matches)
+    assert len(matches) == 2
+
+
+def test_overwrite_and_delete(tmp_path):
+    index = LocalIndex(tmp_path, dim=DIM)
+    index.upsert([chunk("a", i) for i in range(4)])
+    index.upsert([chunk("a", 1, values=[0, 0, 0, 1], label="new"), {"id": "a#4", "values": [1, 1, 0, 0],
+                                                                      "metadata": {"doc_id": "a"}}])
+    index.delete(["a#0", "a#3"])
+
+    reader = LocalIndex(tmp_path, dim=DIM)
+    assert set(reader.fetch([f"a#{i}" for i in range(5)]).vectors) == {"a#1", "a#2", "a#4"}
+    top = reader.query([0, 0, 0, 1], top_k=1, include_metadata=True, filter=doc_filter("a"))["matches"][0]
+    assert top["id"] == "a#1"
+    assert top["metadata"]["label"] == "new"
+
+
+def test_rejects_wrong_dimension(tmp_path):
+    with pytest.raises(ValueError):
+        LocalIndex(tmp_path, dim=DIM).upsert([("a#0", [1.0, 0.0], {"doc_id": "a"})])
+
+
+def test_least_recently_used_documents_are_closed(tmp_path):
+    index = LocalIndex(tmp_path, dim=DIM, max_open_documents=2)
+    for doc_id in ("a", "b", "c"):
+        index.upsert([chunk(doc_id, 0), chunk(doc_id, 1)])
+    assert list(index._docs) == ["b", "c"]
+
+    # An evicted document is reopened from disk
+    assert set(index.fetch(["a#0", "a#1"]).vectors) == {"a#0", "a#1"}
+    assert list(index._docs) == ["c", "a"]
+
+
+def test_readers_see_consistent_snapshots_during_writes(tmp_path):
+    writer = LocalIndex(tmp_path, dim=DIM)
+    reader = LocalIndex(tmp_path, dim=DIM, max_open_documents=1)
+    writer.upsert([chunk("a", 0)])
+    done = threading.Event()
+    errors = []
+
+    def read():
+        while not done.is_set():
+            try:
+                for match in reader.query([1, 0, 0, 0], top_k=50, include_metadata=True,
+                                          filter=doc_filter("a"))["matches"]:
+                    # Every row's id, metadata and vector belong together
+                    if match["id"] != f"a#{match['metadata']['position']}":
+                        errors.append(match)
+                # Also switch documents, so the reader's handle is evicted and reopened
+                reader.fetch(["b#0"])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for i in range(1, 40):
+        writer.upsert([chunk("a", i)])
+        if i % 5 == 0:
+            # Overwrites and deletes write a new generation
+            writer.upsert([chunk("a", i - 1, values=[0, 1, 0, 0])])
+            writer.delete([f"a#{i - 2}"])
+    done.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def _append(root, worker):
+    LocalIndex(root, dim=DIM).upsert([chunk("a", worker * 100 + i) for i in range(20)])
+
+
+def test_concurrent_writer_processes_keep_every_row(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_append, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    ids = [f"a#{worker * 100 + i}" for worker in range(4) for i in range(20)]
+    assert set(LocalIndex(tmp_path, dim=DIM).fetch(ids).vectors) == set(ids)
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pytest
+
+from rag.core.micro_batcher import BatchingEncoder
+
+
+class RecordingEncoder:
+    """Encodes "t<n>" as [n, normalize_embeddings] and records every call"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.max_seq_length = 256
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        with self.lock:
+            self.calls.append((list(texts), dict(kwargs, normalize_embeddings=normalize_embeddings)))
+        if "boom" in texts:
+            raise RuntimeError("encoder failed")
+        return np.array([[float(text[1:]), float(normalize_embeddings)] for text in texts], dtype=np.float32)
+
+
+def encode_concurrently(encoder, requests):
+    """Run encoder.encode(texts, **options) for every request at once; returns results in request order"""
+    results = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def call(i, texts, options):
+        start.wait()
+        try:
+            results[i] = encoder.encode(texts, **options)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, texts, options)) for i, (texts, options) in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_calls_round_trip():
+    encoder = BatchingEncoder(RecordingEncoder(), max_wait_ms=1)
+    np.testing.assert_array_equal(encoder.encode(["t1", "t2"]), [[1, 0], [2, 0]])
+    np.testing.assert_array_equal(encoder.encode("t3", normalize_embeddings=True), [3, 1])
+    assert encoder.encode([]).shape[0] == 0
+    # Attributes of the wrapped encoder stay reachable
+    assert encoder.max_seq_length == 256
+
+
+def test_concurrent_calls_share_batches():
+    model = RecordingEncoder()
+    encoder = BatchingEncoder(model, max_batch_size=64, max_wait_ms=100)
+    requests = [([f"t{2 * i}", f"t{2 * i + 1}"], {}) for i in range(16)]
+
+    results = encode_concurrently(encoder, requests)
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result[:, 0], [2 * i, 2 * i + 1])
+    assert len(model.calls) < len(requests)
+    stats = encoder.stats()
+    assert (stats["requests"], stats["texts"]) == (16, 32)
+    assert stats["batches"] == len(model.calls)
+
+
+def test_batches_respect_size_and_options():
+    model = RecordingEncoder()
+    encoder = BatchingEncoder(model, max_batch_size=8, max_wait_ms=100)
+    requests = [([f"t{3 * i + j}" for j in range(3)], {"normalize_embeddings": i % 2 == 1}) for i in range(12)]
+
+    results = encode_concurrently(encoder, requests)
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, [[3 * i + j, i % 2] for j in range(3)])
+    for texts, options in model.calls:
+        assert len(texts) <= 8
+        # Every text of a batch was requested with that batch's options
+        assert all(int(text[1:]) // 3 % 2 == options["normalize_embeddings"] for text in texts)
+
+
+def test_encoder_errors_reach_the_caller():
+    encoder = BatchingEncoder(RecordingEncoder(), max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        encoder.encode(["t1", "boom"])
+    # The batching thread keeps running
+    np.testing.assert_array_equal(encoder.encode(["t2"]), [[2, 0]])
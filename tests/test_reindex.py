@@ -0,0 +1,106 @@
+import hashlib
+import threading
+
+import numpy as np
+import pytest
+
+# The re-indexer shares fetch_document_vectors with the Pinecone-backed store
+pytest.importorskip("pinecone")
+pytest.importorskip("urllib3")
+
+from rag.core.lexical_index import LexicalIndex
+from rag.core.local_index import LocalIndex
+from rag.core.reindex import IncrementalReindexer
+
+DIM = 4
+
+
+def embed(text):
+    return np.frombuffer(hashlib.sha256(text.encode("utf-8")).digest()[:DIM], dtype=np.uint8).astype(np.float32) + 1
+
+
+class PageChunker:
+    """One chunk per page, embedded from its text"""
+
+    def chunk_stream(self, pages, return_embeddings=False):
+        for page in pages:
+            yield (page, embed(page)) if return_embeddings else page
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.stack([embed(text) for text in texts])
+
+
+def stored_chunks(index, doc_id, n=20):
+    vectors = index.fetch([f"{doc_id}#{i}" for i in range(n)]).vectors
+    return [vectors[f"{doc_id}#{i}"] for i in range(len(vectors))]
+
+
+def make_reindexer(tmp_path, index, **kwargs):
+    return IncrementalReindexer(PageChunker(), CountingEncoder(), index, upsert_workers=2,
+                                lexical_index=LexicalIndex(tmp_path / "lexical"), **kwargs)
+
+
+PAGES = [f"Clause {i}. The tenant agrees to term {i}." for i in range(6)]
+
+
+def test_revision_round_trip(tmp_path):
+    index = LocalIndex(tmp_path / "vectors", dim=DIM)
+    reindexer = make_reindexer(tmp_path, index)
+    assert reindexer.run(PAGES, 1, "Lease") == {"chunks": 6, "embedded": 6, "rewritten": 0, "unchanged": 0,
+                                                "deleted": 0}
+    assert reindexer.run(PAGES, 1, "Lease")["unchanged"] == 6
+
+    # Insert a clause after the first and drop the last two
+    revised = PAGES[:1] + ["Clause 0a. A new clause."] + PAGES[1:4]
+    counts = reindexer.run(revised, 1, "Lease")
+    # Clause 0 keeps its id and links; clauses 1-3 move down one position
+    assert counts == {"chunks": 5, "embedded": 1, "rewritten": 3, "unchanged": 1, "deleted": 1}
+
+    chunks = stored_chunks(index, 1)
+    assert [chunk["metadata"]["content"] for chunk in chunks] == revised
+    for chunk, text in zip(chunks, revised):
+        np.testing.assert_allclose(chunk["values"], embed(text))
+    assert chunks[-1]["metadata"]["postchunk_id"] == ""
+    assert reindexer.lexical_index.chunk(1, 1) == "Clause 0a. A new clause."
+
+
+def test_encodes_only_new_chunks_when_not_reusing_chunk_embeddings(tmp_path):
+    index = LocalIndex(tmp_path / "vectors", dim=DIM)
+    reindexer = make_reindexer(tmp_path, index, reuse_chunk_embeddings=False)
+    reindexer.run(PAGES, 1, "Lease")
+    reindexer.encoder.encoded.clear()
+
+    reindexer.run(PAGES[:3] + ["Clause 3. Amended."] + PAGES[4:], 1, "Lease")
+    assert reindexer.encoder.encoded == ["Clause 3. Amended."]
+
+
+def test_document_stays_readable_during_reindex(tmp_path):
+    index = LocalIndex(tmp_path / "vectors", dim=DIM)
+    pages = [f"Clause {i}." for i in range(60)]
+    make_reindexer(tmp_path, index).run(pages, 1, "Lease")
+    done = threading.Event()
+    errors = []
+
+    def read():
+        reader = LocalIndex(tmp_path / "vectors", dim=DIM)
+        while not done.is_set():
+            # Both revisions have at least 50 chunks; none of them may go missing midway
+            found = reader.fetch([f"1#{i}" for i in range(50)]).vectors
+            if len(found) != 50:
+                errors.append(sorted(set(f"1#{i}" for i in range(50)) - set(found)))
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    # Reorders most chunks and drops the last ten
+    revised = [f"Clause {i}." for i in range(0, 60, 6)] + [f"Clause {i}." for i in range(60) if i % 6][:40]
+    make_reindexer(tmp_path, index, upsert_batch_bytes=2000).run(revised, 1, "Lease")
+    done.set()
+    thread.join()
+    assert errors == []
+    assert [chunk["metadata"]["content"] for chunk in stored_chunks(index, 1, 100)] == revised